@@ -1,27 +1,82 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import (Flask, Blueprint, render_template, request, jsonify, session, redirect,
+                   url_for, Response, stream_with_context)
+from database.db import init_app, get_db
+from telemetry.metrics import init_metrics, render_metrics
 from database.models import (init_db, create_test_user, create_research_session, 
                             update_session_consent, set_session_first_method,
-                            complete_session, get_session_info, clear_all_data)
-from auth.password import verify_credentials
-from auth.crypto import verify_signature, get_user_by_wallet
+                            complete_session, get_session_info, clear_all_data, rotate_study)
+from database.seed import seed_database, parse_count
+from auth.password import verify_credentials, calibrate_hash_method
+from auth.nonce import issue_nonce, consume_nonce, NONCE_INVALID, NONCE_EXPIRED
+from auth.crypto import verify_signature, get_user_by_wallet, warm_up_signature_verification
+from auth.sessions import SQLiteSessionInterface
 from telemetry.logger import (
     log_auth_attempt,
     log_education_view,
     save_feedback,
     get_analytics,
-    get_all_sessions
+    get_all_sessions,
+    get_data_version,
+    flush_telemetry,
+    get_writer_stats,
+    rebuild_analytics
 )
-import uuid
-import time
+from telemetry.retention import compact_telemetry
+from telemetry.cache import cached
+from telemetry.events import bus, stream_events
+from telemetry.export import EXPORT_TABLES, EXPORT_FORMATS, export_table, get_export_watermark
+import hashlib
+import os
 import secrets
+import sys
+import time
+import click
+import config
 
-app = Flask(__name__)
-app.secret_key = secrets.token_hex(32)
+# Routes and CLI commands live on a blueprint so that each process (or
+# test) can build its own app with create_app()
+bp = Blueprint('research', __name__, cli_group=None)
 
-# Session configuration
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['PERMANENT_SESSION_LIFETIME'] = 7200  # 2 hours
+def load_secret_key(path):
+    """Return the key stored at `path`, generating it first if it is missing.
+    
+    The key is written to a temporary file and hard-linked into place, so
+    workers starting at the same time all end up reading the same key.
+    """
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(secrets.token_hex(32))
+            os.link(temp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp)
+    with open(path) as f:
+        return f.read().strip()
+
+def create_app(overrides=None):
+    """Create the research app, configured from config.py plus `overrides`."""
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY=config.SECRET_KEY or load_secret_key(
+            config.SECRET_KEY_FILE or os.path.join(app.instance_path, 'secret_key')),
+        SESSION_COOKIE_SECURE=config.SESSION_COOKIE_SECURE,
+        SESSION_COOKIE_HTTPONLY=config.SESSION_COOKIE_HTTPONLY,
+        SESSION_COOKIE_SAMESITE=config.SESSION_COOKIE_SAMESITE,
+        PERMANENT_SESSION_LIFETIME=config.PERMANENT_SESSION_LIFETIME
+    )
+    if overrides:
+        app.config.update(overrides)
+    if config.SESSION_STORE == 'sqlite':
+        app.session_interface = SQLiteSessionInterface()
+    init_app(app)
+    init_metrics(app)
+    app.register_blueprint(bp)
+    return app
 
 # Admin password (change this!)
 ADMIN_PASSWORD = "admin123"
@@ -34,6 +89,15 @@ def get_or_create_research_session():
         session['current_step'] = 'intro'
     return session['research_session_id']
 
+def get_nonce_owner():
+    """Return the key DID nonces are bound to: the research session if there
+    is one, otherwise an opaque per-client key, so no study rows are created."""
+    if 'research_session_id' in session:
+        return session['research_session_id']
+    if 'nonce_owner' not in session:
+        session['nonce_owner'] = secrets.token_urlsafe(16)
+    return session['nonce_owner']
+
 def determine_next_method():
     """Determine which auth method to show next based on what's been completed."""
     completed = session.get('methods_completed', [])
@@ -45,7 +109,7 @@ def determine_next_method():
     else:
         return None
 
-@app.route('/')
+@bp.route('/')
 def index():
     """Entry point - show introduction."""
     # Create new research session
@@ -55,7 +119,7 @@ def index():
     session['current_step'] = 'intro'
     return render_template('intro.html')
 
-@app.route('/consent', methods=['POST'])
+@bp.route('/consent', methods=['POST'])
 def consent():
     """Handle consent submission."""
     consent_given = request.form.get('consent') == 'yes'
@@ -65,21 +129,21 @@ def consent():
     
     if consent_given:
         session['current_step'] = 'auth'
-        return redirect(url_for('authenticate'))
+        return redirect(url_for('.authenticate'))
     else:
         return render_template('no_consent.html')
 
-@app.route('/authenticate')
+@bp.route('/authenticate')
 def authenticate():
     """Show authentication page with assigned method."""
     if session.get('current_step') != 'auth':
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     next_method = determine_next_method()
     
     if next_method is None:
         # Both methods completed, go to final feedback
-        return redirect(url_for('final_feedback'))
+        return redirect(url_for('.final_feedback'))
     
     research_session_id = get_or_create_research_session()
     session_info = get_session_info(research_session_id)
@@ -93,15 +157,13 @@ def authenticate():
     
     return render_template('authenticate.html', method=next_method)
 
-@app.route('/api/nonce')
+@bp.route('/api/nonce')
 def get_nonce():
     """Generate and return a nonce for DID authentication."""
-    nonce = str(uuid.uuid4())
-    session['nonce'] = nonce
-    session['nonce_timestamp'] = time.time()
+    nonce = issue_nonce(get_nonce_owner())
     return jsonify({'nonce': nonce})
 
-@app.route('/api/login/traditional', methods=['POST'])
+@bp.route('/api/login/traditional', methods=['POST'])
 def login_traditional():
     """Handle traditional username/password login."""
     start_time = time.time()
@@ -133,7 +195,7 @@ def login_traditional():
                         request.user_agent.string)
         return jsonify({'success': False, 'error': error_message}), 401
 
-@app.route('/api/login/did', methods=['POST'])
+@bp.route('/api/login/did', methods=['POST'])
 def login_did():
     """Handle DID authentication via signature verification."""
     start_time = time.time()
@@ -142,6 +204,8 @@ def login_did():
     address = data.get('address')
     signature = data.get('signature')
     message = data.get('message')
+    # Read before a research session may be created for this attempt
+    nonce_owner = session.get('research_session_id') or session.get('nonce_owner')
     research_session_id = get_or_create_research_session()
     attempt_number = session.get('auth_attempt', 1)
     
@@ -152,15 +216,16 @@ def login_did():
                         request.user_agent.string)
         return jsonify({'success': False, 'error': 'Missing parameters'}), 400
     
-    # Verify nonce
-    if 'nonce' not in session or session['nonce'] != message:
+    # Verify and consume the nonce (single use, bound to whoever requested it)
+    nonce_status = consume_nonce(message, nonce_owner)
+    if nonce_status == NONCE_INVALID:
         log_auth_attempt(research_session_id, None, 'DID', attempt_number,
                         start_time, False, 'INVALID_NONCE', 
                         'Nonce mismatch or expired', request.user_agent.string)
         return jsonify({'success': False, 'error': 'Invalid or expired nonce'}), 401
     
-    # Check nonce age (max 5 minutes)
-    if time.time() - session.get('nonce_timestamp', 0) > 300:
+    # Check nonce age (NONCE_TTL_SECONDS)
+    if nonce_status == NONCE_EXPIRED:
         log_auth_attempt(research_session_id, None, 'DID', attempt_number,
                         start_time, False, 'NONCE_EXPIRED', 
                         'Nonce expired', request.user_agent.string)
@@ -175,8 +240,6 @@ def login_did():
                         start_time, True, None, None, request.user_agent.string)
         session['authenticated_user_id'] = user_id
         session['last_auth_method'] = 'DID'
-        session.pop('nonce', None)
-        session.pop('nonce_timestamp', None)
         return jsonify({'success': True, 'redirect': '/education/DID', 'is_new_user': is_new})
     else:
         log_auth_attempt(research_session_id, None, 'DID', attempt_number,
@@ -184,16 +247,16 @@ def login_did():
                         request.user_agent.string)
         return jsonify({'success': False, 'error': error_message}), 401
 
-@app.route('/education/<method>')
+@bp.route('/education/<method>')
 def education(method):
     """Show educational content about the method just used."""
     if session.get('last_auth_method') != method:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     session['education_start'] = time.time()
     return render_template('education.html', method=method)
 
-@app.route('/api/education/complete', methods=['POST'])
+@bp.route('/api/education/complete', methods=['POST'])
 def complete_education():
     """Log education view completion."""
     data = request.get_json()
@@ -205,15 +268,15 @@ def complete_education():
     
     return jsonify({'success': True, 'redirect': f'/feedback/{method}'})
 
-@app.route('/feedback/<method>')
+@bp.route('/feedback/<method>')
 def feedback_page(method):
     """Show feedback form for the method just used."""
     if session.get('last_auth_method') != method:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     return render_template('feedback.html', method=method)
 
-@app.route('/api/feedback/submit', methods=['POST'])
+@bp.route('/api/feedback/submit', methods=['POST'])
 def submit_feedback():
     """Handle feedback submission."""
     data = request.get_json()
@@ -246,15 +309,15 @@ def submit_feedback():
     else:
         return jsonify({'success': True, 'redirect': '/final-feedback'})
 
-@app.route('/final-feedback')
+@bp.route('/final-feedback')
 def final_feedback():
     """Show final comparative feedback."""
     if len(session.get('methods_completed', [])) < 2:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     return render_template('final_feedback.html')
 
-@app.route('/api/final-feedback/submit', methods=['POST'])
+@bp.route('/api/final-feedback/submit', methods=['POST'])
 def submit_final_feedback():
     """Handle final feedback submission."""
     research_session_id = get_or_create_research_session()
@@ -262,7 +325,7 @@ def submit_final_feedback():
     
     return jsonify({'success': True, 'redirect': '/thank-you'})
 
-@app.route('/thank-you')
+@bp.route('/thank-you')
 def thank_you():
     """Thank you page."""
     return render_template('thank_you.html')
@@ -271,52 +334,242 @@ def thank_you():
 # ADMIN PANEL
 # =============================================================================
 
-@app.route('/admin/login')
+@bp.route('/admin/login')
 def admin_login():
     """Admin login page."""
     return render_template('admin_login.html')
 
-@app.route('/admin/auth', methods=['POST'])
+@bp.route('/admin/auth', methods=['POST'])
 def admin_auth():
     """Authenticate admin."""
     password = request.form.get('password')
     if password == ADMIN_PASSWORD:
+        # A new session id, so an id planted before login cannot be reused
+        if hasattr(session, 'rotate'):
+            session.rotate()
         session['is_admin'] = True
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('.admin_dashboard'))
     else:
         return render_template('admin_login.html', error='Invalid password')
 
-@app.route('/admin')
+@bp.route('/admin')
 def admin_dashboard():
     """Admin dashboard with analytics."""
     if not session.get('is_admin'):
-        return redirect(url_for('admin_login'))
-    
-    analytics = get_analytics()
-    sessions = get_all_sessions()
+        return redirect(url_for('.admin_login'))
+    
+    # The ETag comes from database state every worker sees, so a browser that
+    # already has this version gets a 304 before any analytics query runs
+    version = get_data_version()
+    etag = dashboard_etag(version)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        html = cached(('dashboard', etag), lambda: render_admin_dashboard(version))
+        response = Response(html, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def dashboard_etag(version):
+    """Return the dashboard ETag for the current query string and data `version`.
+    Session lifecycle updates do not change the version, so the ETag also
+    rolls over every DASHBOARD_CACHE_TTL_SECONDS to pick them up."""
+    window = int(time.time() // max(config.DASHBOARD_CACHE_TTL_SECONDS, 1))
+    return hashlib.sha1(f'{request.full_path}|{version}|{window}'.encode('utf-8')).hexdigest()
+
+def render_admin_dashboard(version):
+    """Render the dashboard for the current query string from data at `version`."""
+    filters = {
+        'status': request.args.get('status') or None,
+        'first_method': request.args.get('first_method') or None
+    }
+    cursor = request.args.get('cursor')
+    analytics = cached(('analytics', version), get_analytics)
+    sessions, next_cursor = cached(('sessions', version, cursor, filters['status'],
+                                    filters['first_method']),
+                                   lambda: get_all_sessions(cursor=cursor, **filters))
+    # Live events pick up where the panels' data ends: now, or when the
+    # snapshot they were read from was taken (events follow their commit)
+    events_since = bus.last_event_id(before=analytics['snapshot_time'])
     
     return render_template('admin_dashboard.html', 
                          analytics=analytics,
-                         sessions=sessions)
+                         sessions=sessions,
+                         next_cursor=next_cursor,
+                         filters=filters,
+                         is_first_page=not cursor,
+                         export_tables=sorted(EXPORT_TABLES),
+                         export_formats=EXPORT_FORMATS,
+                         events_since=events_since)
 
-@app.route('/admin/clear-data', methods=['POST'])
+@bp.route('/admin/clear-data', methods=['POST'])
 def admin_clear_data():
     """Clear all research data."""
     if not session.get('is_admin'):
         return jsonify({'error': 'Unauthorized'}), 401
     
+    flush_telemetry()
     clear_all_data()
     return jsonify({'success': True, 'message': 'All research data cleared'})
 
-@app.route('/admin/logout')
+@bp.route('/admin/rotate-study', methods=['POST'])
+def admin_rotate_study():
+    """Archive the current study to a file, then reset the research data."""
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    path = rotate_study()
+    return jsonify({'success': True, 'archive': os.path.basename(path),
+                    'message': f'Study archived to {os.path.basename(path)} and reset'})
+
+@bp.route('/admin/export/<table>.<fmt>')
+def admin_export(table, fmt):
+    """Stream a research table as CSV or JSONL.
+    ?since=<id> returns only rows added after a previous export's watermark."""
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    if table not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Unknown table or format'}), 404
+    
+    since = request.args.get('since', 0, type=int)
+    flush_telemetry()
+    watermark = get_export_watermark(table)
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(export_table(table, fmt, since, watermark)),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={table}-{since}-{watermark}.{fmt}',
+            'X-Export-Watermark': str(watermark)
+        }
+    )
+
+@bp.route('/admin/telemetry/status')
+def admin_telemetry_status():
+    """Telemetry writer queue depth and flush latency counters."""
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(dict(get_writer_stats(), event_listeners=bus.listener_count()))
+
+@bp.route('/admin/events')
+def admin_events():
+    """Server-Sent Events stream of attempts, feedback and completed sessions.
+    Resumes after the Last-Event-ID header, or ?since=<id> on first connect."""
+    if not session.get('is_admin'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    response = Response(stream_events(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus metrics: request counts and latency, phase timings, writer state."""
+    if config.METRICS_TOKEN:
+        if request.headers.get('Authorization') != f'Bearer {config.METRICS_TOKEN}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    
+    stats = get_writer_stats()
+    gauges = [
+        ('telemetry_queue_depth', 'Rows waiting for the telemetry writer.', stats['queue_depth']),
+        ('telemetry_rows_written', 'Telemetry rows written since start.', stats['written']),
+        ('telemetry_rows_failed', 'Telemetry rows that failed to write.', stats['failed']),
+        ('dashboard_event_listeners', 'Open live dashboard streams.', bus.listener_count()),
+    ]
+    return Response(render_metrics(gauges), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/admin/logout')
 def admin_logout():
     """Logout admin."""
     session.pop('is_admin', None)
-    return redirect(url_for('admin_login'))
+    return redirect(url_for('.admin_login'))
+
+@bp.cli.command('rebuild-analytics')
+def rebuild_analytics_command():
+    """Recompute the analytics summary tables from raw telemetry."""
+    flush_telemetry()
+    rebuild_analytics()
+    print("Analytics summary tables rebuilt.")
+
+@bp.cli.command('compact-telemetry')
+@click.option('--days', type=int, help='Keep raw rows this many days (default config.RETENTION_DAYS).')
+@click.option('--batch-size', type=int, help='Rows deleted per transaction.')
+def compact_telemetry_command(days, batch_size):
+    """Fold old auth attempts and education views into daily rollups."""
+    if days is None and config.RETENTION_DAYS is None:
+        raise click.ClickException('Set RETENTION_DAYS in config.py or pass --days.')
+    flush_telemetry()
+    started = time.perf_counter()
+    removed = compact_telemetry(days, batch_size)
+    elapsed = time.perf_counter() - started
+    print(', '.join(f'{count} {table}' for table, count in removed.items())
+          + f' rolled up in {elapsed:.1f}s')
+
+@bp.cli.command('calibrate-password-hash')
+@click.option('--target-ms', default=50.0, help='Target verification time per login.')
+@click.option('--algorithm', type=click.Choice(['scrypt', 'pbkdf2']), default='scrypt')
+def calibrate_password_hash_command(target_ms, algorithm):
+    """Benchmark hash parameters and suggest PASSWORD_HASH_METHOD."""
+    method, elapsed = calibrate_hash_method(target_ms, algorithm)
+    print(f"PASSWORD_HASH_METHOD = '{method}'  # {elapsed:.1f}ms per verification")
+
+@bp.cli.command('export')
+@click.argument('table', type=click.Choice(sorted(EXPORT_TABLES)))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='csv')
+@click.option('--since', default=0, help='Only export rows with id greater than this watermark.')
+@click.option('--output', type=click.File('w'), default='-', help='File to write (default stdout).')
+def export_command(table, fmt, since, output):
+    """Stream a research table; prints the new watermark to stderr."""
+    flush_telemetry()
+    watermark = get_export_watermark(table)
+    for chunk in export_table(table, fmt, since, watermark):
+        output.write(chunk)
+    print(f"watermark={watermark}", file=sys.stderr)
+
+@bp.cli.command('rotate-study')
+@click.option('--directory', help='Directory for the archive (default config.ARCHIVE_DIR).')
+@click.option('--vacuum', is_flag=True,
+              help='Reclaim the freed pages afterwards (blocks writers while it runs).')
+def rotate_study_command(directory, vacuum):
+    """Archive the research data to a timestamped file and start a fresh study."""
+    started = time.perf_counter()
+    path = rotate_study(directory, vacuum=vacuum)
+    print(f"Archived to {path} and reset in {time.perf_counter() - started:.1f}s")
+
+@bp.cli.command('seed')
+@click.option('--attempts', default='100k', help='Auth attempts to generate, e.g. 10k, 1m.')
+@click.option('--seed', 'seed_value', default=1, help='Random seed; the same seed gives the same data.')
+@click.option('--clear', is_flag=True, help='Delete existing research data first.')
+def seed_command(attempts, seed_value, clear):
+    """Fill the database with synthetic research sessions."""
+    if clear:
+        flush_telemetry()
+        clear_all_data()
+    elif get_db().execute('SELECT 1 FROM research_sessions LIMIT 1').fetchone():
+        raise click.ClickException('Database already has research data; use --clear to replace it.')
+    
+    started = time.perf_counter()
+    counts = seed_database(parse_count(attempts), seed_value)
+    elapsed = time.perf_counter() - started
+    print(', '.join(f'{count} {table}' for table, count in counts.items()) + f' in {elapsed:.1f}s')
 
 if __name__ == '__main__':
     init_db()
     create_test_user('test', 'test123')
+    warm_up_signature_verification()
+    app = create_app()
     
     print("\n" + "="*60)
     print("🔬 AUTHENTICATION RESEARCH PLATFORM")
@@ -330,4 +583,4 @@ if __name__ == '__main__':
     print("   Password: test123")
     print("="*60 + "\n")
     
-    app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
+    app.run(debug=config.DEBUG, host='127.0.0.1', port=5000)
\ No newline at end of file
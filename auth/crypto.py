@@ -1,16 +1,106 @@
+from database import db as database_db
 from database.db import get_db
-from eth_account.messages import encode_defunct
-from eth_account import Account
+from database.models import register_clear_hook
+from telemetry.metrics import timed_call
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from functools import lru_cache
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+import config
 
+# eth_account (and the py_ecc/eth_keyfile stack behind it) takes most of a
+# second to import, so it is loaded on first use or by the background
+# warm-up rather than when the app is imported
+
+# secp256k1 recovery is CPU-bound pure Python, so it runs in worker
+# processes instead of contending for the GIL with request threads
+_recovery_pool = None
+_recovery_pool_pid = None
+_recovery_pool_lock = threading.Lock()
+
+# Bounded LRU of (database, wallet address) -> (reset generation, user_id), so
+# repeat DID logins skip the database. Another worker may reset the database,
+# so entries are only trusted while they match the reset generation last read
+# from it, which is re-read every WALLET_GENERATION_CHECK_SECONDS.
+_wallet_cache = OrderedDict()
+_wallet_cache_lock = threading.Lock()
+# database path -> (reset generation, time.monotonic() when read)
+_generations = {}
+
+def _recover_address(message_text, signature):
+    """Recover the address that signed `message_text` (EIP-191)."""
+    from eth_account.messages import encode_defunct
+    from eth_account import Account
+    message = encode_defunct(text=message_text)
+    return Account.recover_message(message, signature=signature)
+
+def _warm_up_worker():
+    """Import and exercise the recovery code once so the first login is not cold."""
+    from eth_account.messages import encode_defunct
+    from eth_account import Account
+    account = Account.from_key('0x' + '11' * 32)
+    signed = Account.sign_message(encode_defunct(text='warm-up'), private_key=account.key)
+    _recover_address('warm-up', signed.signature)
+
+def _get_recovery_pool():
+    global _recovery_pool, _recovery_pool_pid
+    if config.SIGNATURE_WORKERS <= 0:
+        return None
+    if _recovery_pool is None or _recovery_pool_pid != os.getpid():
+        with _recovery_pool_lock:
+            if _recovery_pool is None or _recovery_pool_pid != os.getpid():
+                # spawn, not fork: the parent runs writer and hashing threads
+                _recovery_pool = ProcessPoolExecutor(
+                    max_workers=config.SIGNATURE_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm_up_worker
+                )
+                _recovery_pool_pid = os.getpid()
+    return _recovery_pool
+
+def _reset_recovery_pool():
+    global _recovery_pool
+    with _recovery_pool_lock:
+        pool, _recovery_pool = _recovery_pool, None
+    if pool is not None and _recovery_pool_pid == os.getpid():
+        pool.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(_reset_recovery_pool)
+
+@lru_cache(maxsize=config.SIGNATURE_CACHE_SIZE)
+def _recover_address_cached(message_text, signature):
+    """Recover an address, memoising recent (message, signature) pairs to absorb retries."""
+    pool = _get_recovery_pool()
+    if pool is None:
+        return _recover_address(message_text, signature)
+    try:
+        return pool.submit(_recover_address, message_text, signature).result()
+    except BrokenProcessPool:
+        _reset_recovery_pool()
+        return _recover_address(message_text, signature)
+
+def warm_up_signature_verification():
+    """Start recovery workers (or warm the inline path) in the background."""
+    pool = _get_recovery_pool()
+    if pool is None:
+        threading.Thread(target=_warm_up_worker, name='signature-warm-up', daemon=True).start()
+        return
+    # Each submission may spawn a worker, which runs the warm-up initializer
+    for _ in range(config.SIGNATURE_WORKERS):
+        pool.submit(os.getpid)
+
+@timed_call('signature')
 def verify_signature(public_address, message_text, signature):
     """Verify that the signature was created by the wallet address.
     Returns (success, error_code, error_message)."""
     try:
-        # Encode the message
-        message = encode_defunct(text=message_text)
-        
         # Recover the address from the signature
-        recovered_address = Account.recover_message(message, signature=signature)
+        recovered_address = _recover_address_cached(message_text, signature)
         
         # Compare addresses (case-insensitive)
         if recovered_address.lower() == public_address.lower():
@@ -20,28 +110,80 @@ def verify_signature(public_address, message_text, signature):
     except Exception as e:
         return False, "SIGNATURE_INVALID", f"Invalid signature format: {str(e)}"
 
+def _known_generation():
+    """Return the reset generation last read from the database, or None if it is
+    due to be read again."""
+    known = _generations.get(database_db.DATABASE_PATH)
+    if known is None or time.monotonic() - known[1] >= config.WALLET_GENERATION_CHECK_SECONDS:
+        return None
+    return known[0]
+
+# Read along with the user row, so a cache miss costs no extra query
+_GENERATION = "(SELECT value FROM stats_counters WHERE name = 'reset_generation')"
+
+def _remember_generation(generation):
+    generation = generation or 0
+    _generations[database_db.DATABASE_PATH] = (generation, time.monotonic())
+    return generation
+
+def _cache_wallet_user(wallet_address, generation, user_id):
+    key = (database_db.DATABASE_PATH, wallet_address)
+    with _wallet_cache_lock:
+        _wallet_cache[key] = (generation, user_id)
+        _wallet_cache.move_to_end(key)
+        while len(_wallet_cache) > config.WALLET_CACHE_SIZE:
+            _wallet_cache.popitem(last=False)
+
+def clear_wallet_cache():
+    """Forget this process's cached wallet to user_id mappings."""
+    with _wallet_cache_lock:
+        _wallet_cache.clear()
+        _generations.clear()
+
+register_clear_hook(clear_wallet_cache)
+
 def get_user_by_wallet(wallet_address):
     """Get user by wallet address, or create new user if doesn't exist.
     Returns (user_id, is_new_user)."""
-    db = get_db()
-    cursor = db.cursor()
-    
     # Normalize address to lowercase
     wallet_address = wallet_address.lower()
     
-    # Try to find existing user
-    cursor.execute('SELECT id FROM users WHERE wallet_address = ?', (wallet_address,))
-    user = cursor.fetchone()
+    key = (database_db.DATABASE_PATH, wallet_address)
+    with _wallet_cache_lock:
+        cached = _wallet_cache.get(key)
+        if cached is not None:
+            _wallet_cache.move_to_end(key)
+    generation = _known_generation()
+    if cached is not None and cached[0] == generation:
+        return cached[1], False
     
-    if user:
-        user_id = user['id']
-        db.close()
-        return user_id, False
+    db = get_db()
+    cursor = db.cursor()
+    if generation is None and cached is not None:
+        generation = _remember_generation(db.execute(f'SELECT {_GENERATION}').fetchone()[0])
+        if cached[0] == generation:
+            return cached[1], False
     
-    # Auto-register new wallet
-    cursor.execute('INSERT INTO users (wallet_address) VALUES (?)', (wallet_address,))
-    db.commit()
-    user_id = cursor.lastrowid
-    db.close()
+    # Register the wallet unless it exists; concurrent first logins for the
+    # same address both succeed instead of tripping the UNIQUE constraint
+    try:
+        cursor.execute(f'''
+            INSERT INTO users (wallet_address) VALUES (?)
+            ON CONFLICT(wallet_address) DO NOTHING
+            RETURNING id, {_GENERATION} AS generation
+        ''', (wallet_address,))
+        row = cursor.fetchone()
+        is_new = row is not None
+        if not is_new:
+            cursor.execute(f'SELECT id, {_GENERATION} AS generation FROM users WHERE wallet_address = ?',
+                           (wallet_address,))
+            row = cursor.fetchone()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     
-    return user_id, True
\ No newline at end of file
+    if generation is None:
+        generation = _remember_generation(row['generation'])
+    _cache_wallet_user(wallet_address, generation, row['id'])
+    return row['id'], is_new
\ No newline at end of file
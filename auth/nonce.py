@@ -0,0 +1,123 @@
+from database.db import get_db
+from collections import OrderedDict
+import threading
+import time
+import uuid
+import config
+
+# Outcomes of NonceStore.consume()
+NONCE_OK = 'ok'
+NONCE_INVALID = 'invalid'
+NONCE_EXPIRED = 'expired'
+
+class MemoryNonceStore:
+    """In-process nonce store. Only safe with a single worker process.
+
+    Nonces share one TTL, so insertion order is expiry order and a sweep
+    only pops expired entries off the front.
+    """
+
+    def __init__(self, ttl_seconds):
+        self.ttl = ttl_seconds
+        self._nonces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def issue(self, owner):
+        """Create a nonce that only `owner` can consume."""
+        nonce = str(uuid.uuid4())
+        with self._lock:
+            self._nonces[nonce] = (owner, time.time() + self.ttl)
+        return nonce
+
+    def consume(self, nonce, owner):
+        """Atomically remove `nonce` if it belongs to `owner`. Returns a NONCE_* outcome."""
+        with self._lock:
+            entry = self._nonces.get(nonce)
+            if entry is None or entry[0] != owner:
+                return NONCE_INVALID
+            del self._nonces[nonce]
+        return NONCE_OK if entry[1] >= time.time() else NONCE_EXPIRED
+
+    def sweep(self):
+        """Drop expired nonces. Returns how many were removed."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            while self._nonces:
+                nonce, (_, expires_at) = next(iter(self._nonces.items()))
+                if expires_at >= now:
+                    break
+                del self._nonces[nonce]
+                removed += 1
+        return removed
+
+class SQLiteNonceStore:
+    """Nonce store backed by the auth_nonces table, shared by all workers."""
+
+    def __init__(self, ttl_seconds):
+        self.ttl = ttl_seconds
+
+    def issue(self, owner):
+        """Create a nonce that only `owner` can consume."""
+        nonce = str(uuid.uuid4())
+        db = get_db()
+        db.execute(
+            'INSERT INTO auth_nonces (nonce, owner, expires_at) VALUES (?, ?, ?)',
+            (nonce, owner, time.time() + self.ttl)
+        )
+        db.commit()
+        return nonce
+
+    def consume(self, nonce, owner):
+        """Atomically remove `nonce` if it belongs to `owner`. Returns a NONCE_* outcome."""
+        db = get_db()
+        cursor = db.execute(
+            'DELETE FROM auth_nonces WHERE nonce = ? AND owner = ? RETURNING expires_at',
+            (nonce, owner)
+        )
+        row = cursor.fetchone()
+        db.commit()
+        if row is None:
+            return NONCE_INVALID
+        return NONCE_OK if row['expires_at'] >= time.time() else NONCE_EXPIRED
+
+    def sweep(self):
+        """Drop expired nonces. Returns how many were removed."""
+        db = get_db()
+        cursor = db.execute('DELETE FROM auth_nonces WHERE expires_at < ?', (time.time(),))
+        db.commit()
+        return cursor.rowcount
+
+_STORES = {
+    'memory': MemoryNonceStore,
+    'sqlite': SQLiteNonceStore,
+}
+
+_store = None
+_last_sweep = 0.0
+_store_lock = threading.Lock()
+
+def get_nonce_store():
+    """Return the configured nonce store (config.NONCE_STORE)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _STORES[config.NONCE_STORE](config.NONCE_TTL_SECONDS)
+    return _store
+
+def issue_nonce(owner):
+    """Issue a DID challenge nonce, sweeping expired ones every sweep interval."""
+    global _last_sweep
+    store = get_nonce_store()
+    now = time.time()
+    if now - _last_sweep >= config.NONCE_SWEEP_INTERVAL_SECONDS:
+        _last_sweep = now
+        store.sweep()
+    return store.issue(owner)
+
+def consume_nonce(nonce, owner):
+    """Consume a DID challenge nonce once. Returns NONCE_OK, NONCE_INVALID or NONCE_EXPIRED."""
+    if not isinstance(nonce, str):
+        return NONCE_INVALID
+    return get_nonce_store().consume(nonce, owner)
@@ -1,6 +1,54 @@
 from werkzeug.security import generate_password_hash, check_password_hash
 from database.db import get_db
+from telemetry.metrics import timed
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import os
+import secrets
 import sqlite3
+import statistics
+import threading
+import time
+import config
+
+# hashlib releases the GIL while hashing, so a few worker threads keep
+# bursts of logins from monopolising the request threads
+_hash_pool = None
+_hash_pool_pid = None
+_hash_pool_lock = threading.Lock()
+
+def _get_hash_pool():
+    global _hash_pool, _hash_pool_pid
+    if _hash_pool is None or _hash_pool_pid != os.getpid():
+        with _hash_pool_lock:
+            if _hash_pool is None or _hash_pool_pid != os.getpid():
+                _hash_pool = ThreadPoolExecutor(max_workers=config.PASSWORD_HASH_WORKERS,
+                                                thread_name_prefix='password-hash')
+                _hash_pool_pid = os.getpid()
+    return _hash_pool
+
+def _run_hashing(fn, *args):
+    """Run a hashing call on the bounded worker pool and wait for the result."""
+    with timed('hash'):
+        return _get_hash_pool().submit(fn, *args).result()
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    """Return the canonical prefix werkzeug stores for `method`, e.g. 'scrypt:32768:8:1'."""
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+@lru_cache(maxsize=8)
+def _dummy_hash(method):
+    """Hash of a random secret, verified against on the unknown-username path."""
+    return generate_password_hash(secrets.token_hex(16), method=method)
+
+def hash_password(password):
+    """Hash a password with the configured algorithm and parameters."""
+    return _run_hashing(generate_password_hash, password, config.PASSWORD_HASH_METHOD)
+
+def needs_rehash(password_hash):
+    """Check whether a stored hash uses different parameters than configured."""
+    return password_hash.split('$', 1)[0] != _method_prefix(config.PASSWORD_HASH_METHOD)
 
 def register_user(username, password):
     """Register a new user with username and password."""
@@ -10,7 +58,7 @@ def register_user(username, password):
     if len(password) < 6:
         return False, "Password must be at least 6 characters"
     
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password(password)
     
     try:
         cursor.execute(
@@ -18,25 +66,70 @@ def register_user(username, password):
             (username, password_hash)
         )
         db.commit()
-        db.close()
         return True, "User registered successfully"
     except sqlite3.IntegrityError:
-        db.close()
+        db.rollback()
         return False, "Username already exists"
 
 def verify_credentials(username, password):
-    """Verify username and password. Returns (user_id, error_code, error_message)."""
+    """Verify username and password. Returns (user_id, error_code, error_message).
+    Hashes using outdated parameters are upgraded on successful login."""
     db = get_db()
     cursor = db.cursor()
     
     cursor.execute('SELECT id, password_hash FROM users WHERE username = ?', (username,))
     user = cursor.fetchone()
-    db.close()
     
     if not user:
+        # Pay the same hash cost as a known user so duration_ms and response
+        # time do not reveal whether the username exists
+        if config.PASSWORD_CONSTANT_TIME_MISS:
+            _run_hashing(check_password_hash, _dummy_hash(config.PASSWORD_HASH_METHOD), password)
         return None, "USER_NOT_FOUND", "Username not found"
     
-    if check_password_hash(user['password_hash'], password):
+    if _run_hashing(check_password_hash, user['password_hash'], password):
+        if needs_rehash(user['password_hash']):
+            cursor.execute(
+                'UPDATE users SET password_hash = ? WHERE id = ?',
+                (hash_password(password), user['id'])
+            )
+            db.commit()
         return user['id'], None, None
     else:
-        return None, "INVALID_PASSWORD", "Incorrect password"
\ No newline at end of file
+        return None, "INVALID_PASSWORD", "Incorrect password"
+
+def benchmark_hash_method(method, rounds=5):
+    """Return the median milliseconds to verify a password hashed with `method`."""
+    password_hash = generate_password_hash('benchmark-password', method=method)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        check_password_hash(password_hash, 'benchmark-password')
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def calibrate_hash_method(target_ms, algorithm='scrypt'):
+    """Pick the strongest parameters for `algorithm` that verify within `target_ms`.
+    Returns (method, measured_ms)."""
+    if algorithm == 'pbkdf2':
+        # Cost is linear in iterations: measure once, scale, then confirm
+        base = 10000
+        base_ms = benchmark_hash_method(f'pbkdf2:sha256:{base}')
+        iterations = max(base, int(base * target_ms / base_ms) // 1000 * 1000)
+        method = f'pbkdf2:sha256:{iterations}'
+        return method, benchmark_hash_method(method)
+    
+    if algorithm == 'scrypt':
+        # Cost doubles with n, so keep the largest power of two within target
+        n = 2 ** 10
+        best = (f'scrypt:{n}:8:1', benchmark_hash_method(f'scrypt:{n}:8:1'))
+        while n < 2 ** 20:
+            n *= 2
+            method = f'scrypt:{n}:8:1'
+            elapsed = benchmark_hash_method(method)
+            if elapsed > target_ms:
+                break
+            best = (method, elapsed)
+        return best
+    
+    raise ValueError(f"Unsupported hash algorithm '{algorithm}'")
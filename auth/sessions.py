@@ -0,0 +1,190 @@
+from database.db import get_db
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+from collections import OrderedDict
+import secrets
+import threading
+import time
+import config
+
+# Server-side sessions for the research flow. The cookie carries only an
+# opaque session id; the state lives in the web_sessions table (shared by
+# every worker) behind a per-process LRU of recently used sessions.
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session state plus the bookkeeping needed to write it back lazily."""
+
+    def __init__(self, initial=None, sid=None, version=0, expires_at=0.0):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = sid is None
+        self.version = version
+        self.expires_at = expires_at
+        self.rotated_sid = None
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def rotate(self):
+        """Move this state to a fresh session id (call after a privilege change)."""
+        if not self.new:
+            self.rotated_sid = self.sid
+        self.sid = None
+        self.new = True
+        self.modified = True
+
+class SessionCache:
+    """Bounded LRU of sid -> (version, data, expires_at), dropping idle entries."""
+
+    def __init__(self, max_entries, idle_seconds):
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            self._entries.move_to_end(sid)
+            return entry[:3]
+
+    def put(self, sid, version, data, expires_at):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[sid] = (version, data, expires_at, now)
+            self._entries.move_to_end(sid)
+            # Least recently used first, so idle entries are all at the front
+            while self._entries:
+                oldest = next(iter(self._entries.values()))
+                if len(self._entries) <= self.max_entries and now - oldest[3] < self.idle_seconds:
+                    break
+                self._entries.popitem(last=False)
+
+    def discard(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteSessionInterface(SessionInterface):
+    """Flask session interface storing session state in SQLite by opaque id."""
+
+    session_class = ServerSideSession
+    serializer = session_json_serializer
+
+    def __init__(self, cache_size=None, idle_seconds=None):
+        self.cache = SessionCache(cache_size or config.SESSION_CACHE_SIZE,
+                                  idle_seconds or config.SESSION_CACHE_IDLE_SECONDS)
+        self._last_sweep = 0.0
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        # Static files never touch the session, so skip the lookup
+        if app.static_url_path and request.path.startswith(app.static_url_path + '/'):
+            return self.make_null_session(app)
+
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return self.session_class()
+
+        # One primary-key lookup either confirms the cached copy is current
+        # (another worker may have written since) or returns the new data
+        cached = self.cache.get(sid)
+        row = get_db().execute(
+            'SELECT version, CASE WHEN version = ? THEN NULL ELSE data END AS data, expires_at '
+            'FROM web_sessions WHERE sid = ?',
+            (cached[0] if cached else None, sid)
+        ).fetchone()
+        if row is None or row['expires_at'] < time.time():
+            self.cache.discard(sid)
+            return self.session_class()
+
+        if row['data'] is None:
+            data = cached[1]
+        else:
+            data = row['data']
+        self.cache.put(sid, row['version'], data, row['expires_at'])
+        return self.session_class(self.serializer.loads(data), sid, row['version'], row['expires_at'])
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        db = get_db()
+        if session.rotated_sid:
+            db.execute('DELETE FROM web_sessions WHERE sid = ?', (session.rotated_sid,))
+            self.cache.discard(session.rotated_sid)
+
+        # Emptied sessions are deleted along with their cookie
+        if not session:
+            if session.modified:
+                if session.sid:
+                    db.execute('DELETE FROM web_sessions WHERE sid = ?', (session.sid,))
+                    self.cache.discard(session.sid)
+                db.commit()
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        # Write back only when the state changed, or to extend the expiry of
+        # a session that is past half its lifetime
+        now = time.time()
+        lifetime = self._lifetime(app)
+        data = self.serializer.dumps(dict(session))
+        cached = self.cache.get(session.sid) if session.sid else None
+        unchanged = cached is not None and cached[0] == session.version and cached[1] == data
+        if unchanged and session.expires_at - now > lifetime / 2:
+            return
+
+        if session.new:
+            session.sid = secrets.token_urlsafe(32)
+        expires_at = now + lifetime
+        version = db.execute('''
+            INSERT INTO web_sessions (sid, data, version, expires_at) VALUES (?, ?, 1, ?)
+            ON CONFLICT(sid) DO UPDATE SET data = excluded.data, version = version + 1,
+                expires_at = excluded.expires_at
+            RETURNING version
+        ''', (session.sid, data, expires_at)).fetchone()[0]
+        self._sweep(db, now)
+        db.commit()
+        self.cache.put(session.sid, version, data, expires_at)
+
+        if session.new:
+            response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=httponly, domain=domain, path=path, secure=secure,
+                                samesite=samesite)
+            response.vary.add('Cookie')
+
+    def _sweep(self, db, now):
+        """Delete expired sessions every sweep interval (inside the caller's transaction)."""
+        if now - self._last_sweep >= config.SESSION_SWEEP_INTERVAL_SECONDS:
+            self._last_sweep = now
+            db.execute('DELETE FROM web_sessions WHERE expires_at < ?', (now,))
@@ -2,12 +2,90 @@ import os
 
 # Database Configuration
 DATABASE_PATH = 'research.db'
+# Where `rotate-study` writes timestamped copies of finished studies
+ARCHIVE_DIR = 'archives'
 
 # Flask Configuration
-SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
+# Session cookies are signed with SECRET_KEY, which every worker process must
+# share. Set it in production; otherwise a random key is generated once and
+# kept in SECRET_KEY_FILE (default: <instance folder>/secret_key).
+SECRET_KEY = os.environ.get('SECRET_KEY')
+SECRET_KEY_FILE = os.environ.get('SECRET_KEY_FILE')
 DEBUG = True
 
 # Security
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
-SESSION_COOKIE_SAMESITE = 'Lax'
\ No newline at end of file
+SESSION_COOKIE_SAMESITE = 'Lax'
+PERMANENT_SESSION_LIFETIME = 7200  # 2 hours
+
+# Database connection tuning (applied once per pooled connection)
+DB_POOL_SIZE = 8
+DB_BUSY_TIMEOUT_MS = 5000
+DB_MMAP_SIZE = 64 * 1024 * 1024  # 64 MiB
+
+# Telemetry writer (background batching of auth/education/feedback rows)
+TELEMETRY_ASYNC = True
+TELEMETRY_BATCH_SIZE = 100
+TELEMETRY_FLUSH_INTERVAL_MS = 200
+TELEMETRY_QUEUE_SIZE = 10000
+TELEMETRY_ENQUEUE_TIMEOUT = 2.0  # seconds before falling back to a synchronous write
+
+# Retention: `flask --app app compact-telemetry` (run it daily, e.g. from cron)
+# folds auth attempts and education views older than RETENTION_DAYS into daily
+# per-method rollups, then deletes the raw rows RETENTION_BATCH_SIZE at a time.
+# None keeps every raw row.
+RETENTION_DAYS = None
+RETENTION_BATCH_SIZE = 5000
+
+# Admin dashboard
+SESSIONS_PAGE_SIZE = 50
+# Analytics queries use their own read-only connections, which under WAL never
+# block participant writes. Set this to have them read a copy made with the
+# online backup API instead, refreshed once it is this many seconds old.
+ANALYTICS_SNAPSHOT_SECONDS = 0
+# Cached analytics are also invalidated by every telemetry write and data reset
+DASHBOARD_CACHE_TTL_SECONDS = 5
+# Live dashboard events: replay history for reconnecting clients, per-client
+# backlog before a stalled client is dropped, and keep-alive interval
+EVENTS_HISTORY_SIZE = 500
+EVENTS_QUEUE_SIZE = 1000
+EVENTS_KEEPALIVE_SECONDS = 15
+
+# Request metrics (/metrics). Without a token, only loopback clients may scrape.
+METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Store each auth attempt's db/hash/signature time breakdown (auth_attempts.phases)
+STORE_AUTH_PHASES = False
+
+# Password hashing: any werkzeug method string, e.g. 'scrypt:32768:8:1' or
+# 'pbkdf2:sha256:600000'. Pick one with `flask --app app calibrate-password-hash`.
+# Stored hashes with other parameters are upgraded on the next successful login.
+PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+PASSWORD_HASH_WORKERS = 4
+# Verify against a dummy hash when the username is unknown, so both failure
+# paths cost the same (no timing-based enumeration, comparable duration_ms)
+PASSWORD_CONSTANT_TIME_MISS = True
+
+# DID signature verification: worker processes for address recovery
+# (0 recovers inline on the request thread) and LRU size for retried signatures
+SIGNATURE_WORKERS = 2
+SIGNATURE_CACHE_SIZE = 256
+# Wallet -> user_id LRU; each worker re-reads the database's reset generation
+# at most this often, so a reset by another worker is noticed within that time
+WALLET_CACHE_SIZE = 4096
+WALLET_GENERATION_CHECK_SECONDS = 5
+
+# Participant and admin sessions: 'sqlite' keeps the state server-side (the
+# cookie holds an opaque id) with an in-memory LRU of recently used sessions
+# in each worker; 'cookie' is Flask's signed-cookie session
+SESSION_STORE = 'sqlite'
+SESSION_CACHE_SIZE = 10000
+SESSION_CACHE_IDLE_SECONDS = 600
+SESSION_SWEEP_INTERVAL_SECONDS = 300
+
+# DID challenge nonces: 'sqlite' is shared by every worker process,
+# 'memory' is faster but only valid with a single process
+NONCE_STORE = 'sqlite'
+NONCE_TTL_SECONDS = 300
+NONCE_SWEEP_INTERVAL_SECONDS = 60
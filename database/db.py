@@ -1,9 +1,241 @@
+import atexit
+import os
 import sqlite3
+import threading
+import queue
+import time
+from flask import g, has_app_context
+from telemetry.metrics import TimedConnection
+import config
 
-DATABASE_PATH = 'research.db'
+DATABASE_PATH = config.DATABASE_PATH
 
-def get_db():
-    """Connect to SQLite database and return connection with Row factory."""
-    db = sqlite3.connect(DATABASE_PATH)
+# Idle connections per database path, shared by request threads
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Connections for code running outside a Flask app context (scripts, workers)
+_local = threading.local()
+
+# Connections inherited across fork(). SQLite handles must not be used or
+# closed in the child, so they are parked here and never finalized.
+_inherited = []
+
+# Admin analytics snapshots made by refresh_snapshot(): path -> (snapshot path, taken at)
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+def _connect(path, readonly=False):
+    """Open a connection and apply the per-connection PRAGMAs once."""
+    factory = TimedConnection if config.METRICS_ENABLED else sqlite3.Connection
+    if readonly:
+        # Opened read-only at the file level, so it can never take the write lock
+        db = sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False,
+                             timeout=config.DB_BUSY_TIMEOUT_MS / 1000, factory=factory)
+    else:
+        db = sqlite3.connect(path, timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+                             check_same_thread=False, factory=factory)
     db.row_factory = sqlite3.Row
-    return db
\ No newline at end of file
+    if not readonly:
+        db.execute('PRAGMA journal_mode = WAL')
+    db.execute('PRAGMA synchronous = NORMAL')
+    db.execute(f'PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}')
+    db.execute(f'PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}')
+    return db
+
+def _get_pool(path):
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = queue.LifoQueue(maxsize=config.DB_POOL_SIZE)
+        return pool
+
+def _acquire(path, readonly=False):
+    """Take an idle connection from the pool, or open a new one."""
+    try:
+        return _get_pool((path, readonly)).get_nowait()
+    except queue.Empty:
+        return _connect(path, readonly)
+
+def _release(path, db, readonly=False):
+    """Return a connection to the pool, closing it if the pool is full."""
+    if db.in_transaction:
+        db.rollback()
+    if readonly and path != DATABASE_PATH and path not in _current_snapshots():
+        db.close()
+        return
+    try:
+        _get_pool((path, readonly)).put_nowait(db)
+    except queue.Full:
+        db.close()
+
+def get_db():
+    """Return the SQLite connection for the current app context or thread.
+    
+    Inside a request every caller shares one pooled connection, which is
+    handed back to the pool on app-context teardown. Outside an app context
+    each thread keeps its own connection open. Callers must not close it.
+    """
+    path = DATABASE_PATH
+    if has_app_context():
+        if 'db' not in g or g.db_path != path:
+            close_db()
+            g.db = _acquire(path)
+            g.db_path = path
+        return g.db
+    
+    db = getattr(_local, 'db', None)
+    if db is None or _local.path != path:
+        close_thread_db()
+        db = _local.db = _connect(path)
+        _local.path = path
+    return db
+
+def get_read_db():
+    """Return a read-only connection for admin analytics queries.
+    
+    Under WAL its reads never block participant writes, nor wait for them.
+    When config.ANALYTICS_SNAPSHOT_SECONDS is set it reads a periodically
+    refreshed copy of the database instead (see refresh_snapshot), so long
+    scans do not hold back WAL checkpoints either. Callers must not close it.
+    """
+    path = DATABASE_PATH
+    if config.ANALYTICS_SNAPSHOT_SECONDS:
+        path = refresh_snapshot(config.ANALYTICS_SNAPSHOT_SECONDS)[0]
+    if has_app_context():
+        if 'read_db' not in g or g.read_db_path != path:
+            if 'read_db' in g:
+                _release(g.pop('read_db_path'), g.pop('read_db'), readonly=True)
+            g.read_db = _acquire(path, readonly=True)
+            g.read_db_path = path
+        return g.read_db
+    
+    db = getattr(_local, 'read_db', None)
+    if db is None or _local.read_path != path:
+        if db is not None:
+            db.close()
+        db = _local.read_db = _connect(path, readonly=True)
+        _local.read_path = path
+    return db
+
+def refresh_snapshot(max_age):
+    """Copy the database with the online backup API if the last copy is older
+    than `max_age` seconds. Returns (snapshot path, time it was taken).
+    
+    Each copy gets a new file name, so connections still reading an older
+    one are unaffected; superseded copies are removed.
+    """
+    path = DATABASE_PATH
+    with _snapshots_lock:
+        current = _snapshots.get(path)
+        now = time.time()
+        if current is not None and now - current[1] < max_age:
+            return current
+        
+        snapshot = f'{path}.snapshot-{os.getpid()}-{time.time_ns()}'
+        source = _connect(path, readonly=True)
+        target = sqlite3.connect(snapshot)
+        try:
+            # One step: the copy reads a single consistent WAL snapshot
+            source.backup(target)
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+            source.close()
+        _snapshots[path] = (snapshot, now)
+    
+    if current is not None:
+        _discard_snapshot(current[0])
+    return _snapshots[path]
+
+def _discard_snapshot(snapshot):
+    """Close pooled connections to an old snapshot and delete its file."""
+    with _pools_lock:
+        pool = _pools.pop((snapshot, True), None)
+    while pool is not None:
+        try:
+            pool.get_nowait().close()
+        except queue.Empty:
+            break
+    # Connections still in use keep reading the unlinked file until released
+    try:
+        os.remove(snapshot)
+    except FileNotFoundError:
+        pass
+
+def _current_snapshots():
+    with _snapshots_lock:
+        return [snapshot for snapshot, _ in _snapshots.values()]
+
+def _remove_snapshots():
+    """Delete this process's snapshot files (at exit)."""
+    for snapshot in _current_snapshots():
+        try:
+            os.remove(snapshot)
+        except FileNotFoundError:
+            pass
+
+def snapshot_time():
+    """Return when the snapshot get_read_db() reads was taken (seconds since the
+    epoch), or None when analytics read the live database."""
+    if not config.ANALYTICS_SNAPSHOT_SECONDS:
+        return None
+    with _snapshots_lock:
+        current = _snapshots.get(DATABASE_PATH)
+    return current[1] if current else None
+
+def close_db(e=None):
+    """Release the app context's connections back to the pool."""
+    db = g.pop('db', None)
+    path = g.pop('db_path', None)
+    if db is not None:
+        _release(path, db)
+    read_db = g.pop('read_db', None)
+    read_path = g.pop('read_db_path', None)
+    if read_db is not None:
+        _release(read_path, read_db, readonly=True)
+
+def close_thread_db():
+    """Close the current thread's out-of-context connections, if any."""
+    for name in ('db', 'read_db'):
+        db = getattr(_local, name, None)
+        if db is not None:
+            setattr(_local, name, None)
+            db.close()
+
+def close_pool():
+    """Close every idle pooled connection."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+def init_app(app):
+    """Register connection teardown with the Flask app."""
+    app.teardown_appcontext(close_db)
+
+def _after_fork_in_child():
+    """Start a forked worker (e.g. a preloaded WSGI worker) with no connections."""
+    global _pools_lock, _snapshots_lock
+    _pools_lock = threading.Lock()
+    # The parent's snapshot is not ours to replace or delete
+    _snapshots_lock = threading.Lock()
+    _snapshots.clear()
+    for pool in _pools.values():
+        _inherited.extend(pool.queue)
+    _pools.clear()
+    for name in ('db', 'read_db'):
+        db = getattr(_local, name, None)
+        if db is not None:
+            _inherited.append(db)
+            setattr(_local, name, None)
+
+atexit.register(_remove_snapshots)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,514 @@
+from telemetry.logger import rebuild_latency_sketches
+from telemetry.retention import fold_latency_rollups
+from datetime import datetime
+import sqlite3
+
+# Ordered schema migrations: (version, description, apply(cursor)).
+# Never edit a released step; append a new one instead.
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a schema migration step."""
+    def register(apply):
+        MIGRATIONS.append((version, description, apply))
+        MIGRATIONS.sort(key=lambda step: step[0])
+        return apply
+    return register
+
+@migration(1, 'Base research schema and analytics summary tables')
+def _base_schema(cursor):
+    # Users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password_hash TEXT,
+            wallet_address TEXT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Research sessions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS research_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            consent_given BOOLEAN DEFAULT 0,
+            first_method TEXT,
+            status TEXT DEFAULT 'active'
+        )
+    ''')
+    
+    # Auth attempts table (enhanced)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS auth_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            user_id INTEGER,
+            method TEXT,
+            attempt_number INTEGER,
+            duration_ms REAL,
+            success BOOLEAN,
+            error_code TEXT,
+            error_message TEXT,
+            user_agent TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES research_sessions(session_id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    
+    # Feedback table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            method TEXT,
+            ease_of_use INTEGER,
+            speed_rating INTEGER,
+            security_feeling INTEGER,
+            would_use_again BOOLEAN,
+            comments TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES research_sessions(session_id)
+        )
+    ''')
+    
+    # Method education views (track when users see pros/cons)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS education_views (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            method TEXT,
+            duration_seconds REAL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES research_sessions(session_id)
+        )
+    ''')
+    
+    # Analytics summary tables, maintained incrementally by telemetry.logger
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS method_stats (
+            method TEXT PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            successes INTEGER NOT NULL DEFAULT 0,
+            duration_sum REAL NOT NULL DEFAULT 0,
+            success_duration_sum REAL NOT NULL DEFAULT 0,
+            failure_duration_sum REAL NOT NULL DEFAULT 0,
+            unique_sessions INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS error_stats (
+            method TEXT,
+            error_code TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (method, error_code)
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS feedback_stats (
+            method TEXT PRIMARY KEY,
+            feedback_count INTEGER NOT NULL DEFAULT 0,
+            ease_sum REAL NOT NULL DEFAULT 0,
+            ease_count INTEGER NOT NULL DEFAULT 0,
+            speed_sum REAL NOT NULL DEFAULT 0,
+            speed_count INTEGER NOT NULL DEFAULT 0,
+            security_sum REAL NOT NULL DEFAULT 0,
+            security_count INTEGER NOT NULL DEFAULT 0,
+            would_use_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Distinct (session, method) pairs seen in auth_attempts, for unique session counts
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_sessions (
+            session_id TEXT NOT NULL,
+            method TEXT NOT NULL,
+            PRIMARY KEY (session_id, method)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+@migration(2, 'Secondary indexes for session, timestamp and method lookups')
+def _lookup_indexes(cursor):
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_auth_attempts_session
+        ON auth_attempts (session_id, success)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_auth_attempts_timestamp
+        ON auth_attempts (timestamp)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_auth_attempts_method_success
+        ON auth_attempts (method, success)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_feedback_session
+        ON feedback (session_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_education_views_session
+        ON education_views (session_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_research_sessions_started
+        ON research_sessions (started_at, id)
+    ''')
+
+@migration(3, 'Server-side nonce store for the DID challenge flow')
+def _auth_nonces(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS auth_nonces (
+            nonce TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_auth_nonces_expires
+        ON auth_nonces (expires_at)
+    ''')
+
+@migration(4, 'Streaming latency sketches per method and outcome')
+def _latency_sketches(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS latency_buckets (
+            method TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (method, success, bucket)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS latency_stats (
+            method TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            max_ms REAL,
+            PRIMARY KEY (method, success)
+        )
+    ''')
+    
+    # Backfill from attempts recorded before sketches existed
+    rebuild_latency_sketches(cursor)
+
+@migration(5, 'Optional per-attempt phase timings')
+def _attempt_phases(cursor):
+    # JSON object of milliseconds per phase (db, hash, signature), written
+    # when config.STORE_AUTH_PHASES is enabled
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(auth_attempts)')]
+    if 'phases' not in columns:
+        cursor.execute('ALTER TABLE auth_attempts ADD COLUMN phases TEXT')
+
+@migration(6, 'Server-side web sessions')
+def _web_sessions(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS web_sessions (
+            sid TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            expires_at REAL NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_web_sessions_expires
+        ON web_sessions (expires_at)
+    ''')
+
+# Lookup tables for the repeated strings in auth_attempts, as
+# (column in the view, id column in auth_attempt_rows, lookup table)
+ATTEMPT_LOOKUPS = [
+    ('error_code', 'error_code_id', 'error_codes'),
+    ('error_message', 'error_message_id', 'error_messages'),
+    ('user_agent', 'user_agent_id', 'user_agents'),
+]
+
+@migration(7, 'Dictionary-encoded auth attempt strings behind an auth_attempts view')
+def _attempt_lookups(cursor):
+    for column, id_column, table in ATTEMPT_LOOKUPS:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                value TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO {table} (value)
+            SELECT DISTINCT {column} FROM auth_attempts WHERE {column} IS NOT NULL
+        ''')
+    
+    cursor.execute('''
+        CREATE TABLE auth_attempt_rows (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            user_id INTEGER,
+            method TEXT,
+            attempt_number INTEGER,
+            duration_ms REAL,
+            success BOOLEAN,
+            error_code_id INTEGER REFERENCES error_codes(id),
+            error_message_id INTEGER REFERENCES error_messages(id),
+            user_agent_id INTEGER REFERENCES user_agents(id),
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            phases TEXT,
+            FOREIGN KEY (session_id) REFERENCES research_sessions(session_id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO auth_attempt_rows
+        (id, session_id, user_id, method, attempt_number, duration_ms, success,
+         error_code_id, error_message_id, user_agent_id, timestamp, phases)
+        SELECT a.id, a.session_id, a.user_id, a.method, a.attempt_number, a.duration_ms, a.success,
+               c.id, m.id, u.id, a.timestamp, a.phases
+        FROM auth_attempts a
+        LEFT JOIN error_codes c ON c.value = a.error_code
+        LEFT JOIN error_messages m ON m.value = a.error_message
+        LEFT JOIN user_agents u ON u.value = a.user_agent
+        ORDER BY a.id
+    ''')
+    # Keep AUTOINCREMENT past ids already handed out, so export watermarks stay valid
+    cursor.execute('''
+        UPDATE sqlite_sequence
+        SET seq = MAX(seq, COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'auth_attempts'), 0))
+        WHERE name = 'auth_attempt_rows'
+    ''')
+    cursor.execute('''
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'auth_attempt_rows', seq FROM sqlite_sequence
+        WHERE name = 'auth_attempts'
+        AND NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'auth_attempt_rows')
+    ''')
+    cursor.execute('DROP TABLE auth_attempts')
+    
+    cursor.execute('''
+        CREATE INDEX idx_auth_attempts_session
+        ON auth_attempt_rows (session_id, success)
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_auth_attempts_timestamp
+        ON auth_attempt_rows (timestamp)
+    ''')
+    cursor.execute('''
+        CREATE INDEX idx_auth_attempts_method_success
+        ON auth_attempt_rows (method, success)
+    ''')
+    
+    # Readers keep using auth_attempts with the original columns; writes
+    # through the view intern their strings first
+    cursor.execute('''
+        CREATE VIEW auth_attempts AS
+        SELECT a.id, a.session_id, a.user_id, a.method, a.attempt_number, a.duration_ms,
+               a.success, c.value AS error_code, m.value AS error_message,
+               u.value AS user_agent, a.timestamp, a.phases
+        FROM auth_attempt_rows a
+        LEFT JOIN error_codes c ON c.id = a.error_code_id
+        LEFT JOIN error_messages m ON m.id = a.error_message_id
+        LEFT JOIN user_agents u ON u.id = a.user_agent_id
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER auth_attempts_insert INSTEAD OF INSERT ON auth_attempts
+        BEGIN
+            INSERT OR IGNORE INTO error_codes (value) SELECT NEW.error_code WHERE NEW.error_code IS NOT NULL;
+            INSERT OR IGNORE INTO error_messages (value) SELECT NEW.error_message WHERE NEW.error_message IS NOT NULL;
+            INSERT OR IGNORE INTO user_agents (value) SELECT NEW.user_agent WHERE NEW.user_agent IS NOT NULL;
+            INSERT INTO auth_attempt_rows
+            (id, session_id, user_id, method, attempt_number, duration_ms, success,
+             error_code_id, error_message_id, user_agent_id, timestamp, phases)
+            VALUES (NEW.id, NEW.session_id, NEW.user_id, NEW.method, NEW.attempt_number,
+                    NEW.duration_ms, NEW.success,
+                    (SELECT id FROM error_codes WHERE value = NEW.error_code),
+                    (SELECT id FROM error_messages WHERE value = NEW.error_message),
+                    (SELECT id FROM user_agents WHERE value = NEW.user_agent),
+                    COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), NEW.phases);
+        END
+    ''')
+
+@migration(8, 'Daily rollups of compacted auth attempts and education views')
+def _telemetry_rollups(cursor):
+    # Written by telemetry.retention when raw rows pass config.RETENTION_DAYS
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attempt_rollups (
+            day TEXT NOT NULL,
+            method TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            attempts INTEGER NOT NULL,
+            duration_sum REAL NOT NULL,
+            max_ms REAL,
+            PRIMARY KEY (day, method, success)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attempt_latency_rollups (
+            day TEXT NOT NULL,
+            method TEXT NOT NULL,
+            success INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, method, success, bucket)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attempt_error_rollups (
+            day TEXT NOT NULL,
+            method TEXT NOT NULL,
+            error_code_id INTEGER NOT NULL REFERENCES error_codes(id),
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, method, error_code_id)
+        ) WITHOUT ROWID
+    ''')
+    # Per-session totals keep the session list and unique session counts exact
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attempt_session_rollups (
+            session_id TEXT NOT NULL,
+            method TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            successes INTEGER NOT NULL,
+            PRIMARY KEY (session_id, method)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS education_view_rollups (
+            day TEXT NOT NULL,
+            method TEXT NOT NULL,
+            views INTEGER NOT NULL,
+            duration_sum REAL NOT NULL,
+            PRIMARY KEY (day, method)
+        ) WITHOUT ROWID
+    ''')
+
+@migration(9, 'Rebuild latency sketches from auth_attempt_rows and their rollups')
+def _rebuild_latency_sketches(cursor):
+    # Step 4 built the sketches from the pre-lookup auth_attempts table;
+    # rebuild them from the rows every later write updates
+    rebuild_latency_sketches(cursor, 'auth_attempt_rows')
+    fold_latency_rollups(cursor)
+
+@migration(10, 'Keep error message detail in auth_attempt_rows.error_detail')
+def _error_details(cursor):
+    cursor.execute('ALTER TABLE auth_attempt_rows ADD COLUMN error_detail TEXT')
+    
+    # Re-point rows at the prefix of their message ('Invalid signature format'
+    # for 'Invalid signature format: odd-length string'); the full messages
+    # stay in error_messages, since lookup rows are never deleted
+    cursor.execute('''
+        INSERT OR IGNORE INTO error_messages (value)
+        SELECT substr(value, 1, instr(value, ': ') - 1) FROM error_messages
+        WHERE instr(value, ': ') > 0
+    ''')
+    cursor.execute('''
+        UPDATE auth_attempt_rows
+        SET error_detail = (SELECT substr(m.value, instr(m.value, ': ') + 2)
+                            FROM error_messages m WHERE m.id = error_message_id),
+            error_message_id = (SELECT p.id FROM error_messages m
+                                JOIN error_messages p ON p.value = substr(m.value, 1, instr(m.value, ': ') - 1)
+                                WHERE m.id = error_message_id)
+        WHERE error_message_id IN (SELECT id FROM error_messages WHERE instr(value, ': ') > 0)
+    ''')
+    
+    # Dropping the view drops its insert trigger too
+    cursor.execute('DROP VIEW auth_attempts')
+    cursor.execute('''
+        CREATE VIEW auth_attempts AS
+        SELECT a.id, a.session_id, a.user_id, a.method, a.attempt_number, a.duration_ms,
+               a.success, c.value AS error_code,
+               CASE WHEN a.error_detail IS NULL THEN m.value
+                    ELSE m.value || ': ' || a.error_detail END AS error_message,
+               u.value AS user_agent, a.timestamp, a.phases
+        FROM auth_attempt_rows a
+        LEFT JOIN error_codes c ON c.id = a.error_code_id
+        LEFT JOIN error_messages m ON m.id = a.error_message_id
+        LEFT JOIN user_agents u ON u.id = a.user_agent_id
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER auth_attempts_insert INSTEAD OF INSERT ON auth_attempts
+        BEGIN
+            INSERT OR IGNORE INTO error_codes (value) SELECT NEW.error_code WHERE NEW.error_code IS NOT NULL;
+            INSERT OR IGNORE INTO error_messages (value)
+            SELECT CASE WHEN instr(NEW.error_message, ': ') > 0
+                        THEN substr(NEW.error_message, 1, instr(NEW.error_message, ': ') - 1)
+                        ELSE NEW.error_message END
+            WHERE NEW.error_message IS NOT NULL;
+            INSERT OR IGNORE INTO user_agents (value) SELECT NEW.user_agent WHERE NEW.user_agent IS NOT NULL;
+            INSERT INTO auth_attempt_rows
+            (id, session_id, user_id, method, attempt_number, duration_ms, success,
+             error_code_id, error_message_id, error_detail, user_agent_id, timestamp, phases)
+            VALUES (NEW.id, NEW.session_id, NEW.user_id, NEW.method, NEW.attempt_number,
+                    NEW.duration_ms, NEW.success,
+                    (SELECT id FROM error_codes WHERE value = NEW.error_code),
+                    (SELECT id FROM error_messages WHERE value =
+                        CASE WHEN instr(NEW.error_message, ': ') > 0
+                             THEN substr(NEW.error_message, 1, instr(NEW.error_message, ': ') - 1)
+                             ELSE NEW.error_message END),
+                    CASE WHEN instr(NEW.error_message, ': ') > 0
+                         THEN substr(NEW.error_message, instr(NEW.error_message, ': ') + 2) END,
+                    (SELECT id FROM user_agents WHERE value = NEW.user_agent),
+                    COALESCE(NEW.timestamp, CURRENT_TIMESTAMP), NEW.phases);
+        END
+    ''')
+
+def get_schema_version(db):
+    """Return the highest applied migration version, or 0 for a new database."""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP
+        )
+    ''')
+    row = db.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def schema_is_current(db):
+    """Return True when every migration is applied, without issuing any DDL."""
+    try:
+        row = db.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return False
+    return (row[0] or 0) >= MIGRATIONS[-1][0]
+
+def migrate(db):
+    """Apply pending migrations, each in its own write transaction.
+    
+    BEGIN IMMEDIATE takes the write lock before the version is re-read, so
+    several workers starting at once apply each step exactly once.
+    Returns the list of versions applied.
+    """
+    if db.in_transaction:
+        db.commit()
+    
+    applied = []
+    if schema_is_current(db):
+        return applied
+    
+    for version, description, apply in MIGRATIONS:
+        cursor = db.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(db) >= version:
+                db.rollback()
+                continue
+            apply(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                (version, description, datetime.now())
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        applied.append(version)
+    return applied
@@ -1,86 +1,38 @@
 from database.db import get_db
+from database.migrations import migrate
+from telemetry.logger import rebuild_analytics, flush_telemetry
+from auth.password import hash_password
+from telemetry.cache import bump_generation
+from telemetry.events import bus
 from datetime import datetime
-from werkzeug.security import generate_password_hash
+import os
+import sqlite3
 import uuid
+import config
+
+# Callbacks run after clear_all_data() and rotate_study(), e.g. to drop in-process caches
+_clear_hooks = []
+
+def register_clear_hook(hook):
+    """Call `hook()` whenever research data is cleared."""
+    _clear_hooks.append(hook)
+
+def _publish_reset():
+    bus.publish('reset', {})
+
+register_clear_hook(bump_generation)
+register_clear_hook(_publish_reset)
 
 def init_db():
-    """Initialize database tables with enhanced schema."""
+    """Initialize database tables by applying pending schema migrations."""
     db = get_db()
     cursor = db.cursor()
     
-    # Users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password_hash TEXT,
-            wallet_address TEXT UNIQUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Research sessions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS research_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT UNIQUE NOT NULL,
-            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            consent_given BOOLEAN DEFAULT 0,
-            first_method TEXT,
-            status TEXT DEFAULT 'active'
-        )
-    ''')
-    
-    # Auth attempts table (enhanced)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS auth_attempts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            user_id INTEGER,
-            method TEXT,
-            attempt_number INTEGER,
-            duration_ms REAL,
-            success BOOLEAN,
-            error_code TEXT,
-            error_message TEXT,
-            user_agent TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES research_sessions(session_id),
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # Feedback table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS feedback (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            method TEXT,
-            ease_of_use INTEGER,
-            speed_rating INTEGER,
-            security_feeling INTEGER,
-            would_use_again BOOLEAN,
-            comments TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES research_sessions(session_id)
-        )
-    ''')
+    migrate(db)
     
-    # Method education views (track when users see pros/cons)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS education_views (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            method TEXT,
-            duration_seconds REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (session_id) REFERENCES research_sessions(session_id)
-        )
-    ''')
-    
-    db.commit()
-    db.close()
+    # Populate summaries for databases that predate them
+    if not cursor.execute("SELECT 1 FROM stats_counters WHERE name = 'total_sessions'").fetchone():
+        rebuild_analytics()
 
 def create_research_session():
     """Create a new research session and return session_id."""
@@ -93,7 +45,6 @@ def create_research_session():
         (session_id,)
     )
     db.commit()
-    db.close()
     
     return session_id
 
@@ -106,7 +57,6 @@ def update_session_consent(session_id, consent_given):
         (consent_given, session_id)
     )
     db.commit()
-    db.close()
 
 def set_session_first_method(session_id, method):
     """Set the first method used in this session."""
@@ -117,18 +67,19 @@ def set_session_first_method(session_id, method):
         (method, session_id)
     )
     db.commit()
-    db.close()
 
 def complete_session(session_id):
     """Mark session as completed."""
     db = get_db()
     cursor = db.cursor()
+    completed_at = datetime.now()
     cursor.execute(
         'UPDATE research_sessions SET completed_at = ?, status = ? WHERE session_id = ?',
-        (datetime.now(), 'completed', session_id)
+        (completed_at, 'completed', session_id)
     )
     db.commit()
-    db.close()
+    bus.publish('session', {'session_id': session_id, 'status': 'completed',
+                            'completed_at': completed_at})
 
 def get_session_info(session_id):
     """Get session information."""
@@ -136,7 +87,6 @@ def get_session_info(session_id):
     cursor = db.cursor()
     cursor.execute('SELECT * FROM research_sessions WHERE session_id = ?', (session_id,))
     session = cursor.fetchone()
-    db.close()
     return dict(session) if session else None
 
 def create_test_user(username, password):
@@ -144,7 +94,13 @@ def create_test_user(username, password):
     db = get_db()
     cursor = db.cursor()
     
-    password_hash = generate_password_hash(password)
+    # Hashing is deliberately slow, so skip it on restarts where the user exists
+    cursor.execute('SELECT 1 FROM users WHERE username = ?', (username,))
+    if cursor.fetchone():
+        print(f"User '{username}' already exists.")
+        return
+    
+    password_hash = hash_password(password)
     
     try:
         cursor.execute(
@@ -154,20 +110,156 @@ def create_test_user(username, password):
         db.commit()
         print(f"Test user '{username}' created successfully.")
     except Exception as e:
+        db.rollback()
         print(f"User '{username}' already exists or error: {e}")
-    finally:
-        db.close()
 
-def clear_all_data():
-    """Clear all research data (admin function)."""
+# Raw research tables are dropped and recreated on reset, which frees their
+# pages at once instead of deleting row by row; summary tables stay small
+_RESEARCH_TABLES = ['research_sessions', 'auth_attempt_rows', 'education_views', 'feedback',
+                    'users', 'stats_sessions', 'attempt_rollups', 'attempt_latency_rollups',
+                    'attempt_error_rollups', 'attempt_session_rollups', 'education_view_rollups']
+_SUMMARY_TABLES = ['method_stats', 'error_stats', 'feedback_stats', 'latency_buckets',
+                   'latency_stats']
+# Tables that are only appended to, so an archive can be topped up by id.
+# Lookup tables come first: new attempt rows may reference new lookup ids.
+_APPEND_ONLY_TABLES = ['error_codes', 'error_messages', 'user_agents', 'auth_attempt_rows',
+                       'education_views', 'feedback', 'users']
+# Live session state and challenges are never archived
+_UNARCHIVED_TABLES = ['web_sessions', 'auth_nonces']
+
+def _recreate_tables(cursor, tables):
+    """Drop `tables` and create them again, empty, with their indexes.
+    AUTOINCREMENT positions are kept so ids (and export watermarks) are never reused."""
+    placeholders = ', '.join('?' for _ in tables)
+    schema = cursor.execute(f'''
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name IN ({placeholders}) AND sql IS NOT NULL
+        ORDER BY type != 'table'
+    ''', tables).fetchall()
+    sequences = cursor.execute(f'SELECT name, seq FROM sqlite_sequence WHERE name IN ({placeholders})',
+                               tables).fetchall()
+    
+    for table in tables:
+        cursor.execute(f'DROP TABLE {table}')
+    for row in schema:
+        cursor.execute(row[0])
+    cursor.executemany('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                       [tuple(row) for row in sequences])
+
+def _reset_tables(cursor, keep_username):
+    """Empty the research and summary tables, keeping one user row as it was."""
+    kept_users = [dict(row) for row in cursor.execute('SELECT * FROM users WHERE username = ?',
+                                                      (keep_username,))]
+    _recreate_tables(cursor, _RESEARCH_TABLES)
+    for user in kept_users:
+        cursor.execute(f"INSERT INTO users ({', '.join(user)}) VALUES ({', '.join('?' for _ in user)})",
+                       list(user.values()))
+    
+    for table in _SUMMARY_TABLES:
+        cursor.execute(f'DELETE FROM {table}')
+    cursor.execute("UPDATE stats_counters SET value = 0 WHERE name = 'total_sessions'")
+    # Other workers compare this with their cached ids, see auth.crypto
+    cursor.execute('''
+        INSERT INTO stats_counters (name, value) VALUES ('reset_generation', 1)
+        ON CONFLICT(name) DO UPDATE SET value = value + 1
+    ''')
+
+def _top_up_archive(cursor):
+    """Copy rows written since the backup into the attached `archive` database.
+    Returns the number of rows copied."""
+    copied = 0
+    for table in _APPEND_ONLY_TABLES:
+        cursor.execute(f'''
+            INSERT INTO archive.{table}
+            SELECT * FROM main.{table}
+            WHERE id > (SELECT COALESCE(MAX(id), 0) FROM archive.{table})
+        ''')
+        copied += cursor.rowcount
+    
+    # Sessions are also updated in place until they complete
+    cursor.execute('''
+        INSERT OR REPLACE INTO archive.research_sessions
+        SELECT m.* FROM main.research_sessions m
+        LEFT JOIN archive.research_sessions a ON a.id = m.id
+        WHERE a.id IS NULL OR (a.status = 'active' AND (m.status IS NOT a.status
+                                                        OR m.consent_given IS NOT a.consent_given
+                                                        OR m.first_method IS NOT a.first_method
+                                                        OR m.completed_at IS NOT a.completed_at))
+    ''')
+    return copied + cursor.rowcount
+
+def _reset(archive_path=None, keep_username='test', vacuum=False):
     db = get_db()
+    if db.in_transaction:
+        db.commit()
     cursor = db.cursor()
     
-    cursor.execute('DELETE FROM education_views')
-    cursor.execute('DELETE FROM feedback')
-    cursor.execute('DELETE FROM auth_attempts')
-    cursor.execute('DELETE FROM research_sessions')
-    cursor.execute("DELETE FROM users WHERE username != 'test'")
+    # ATTACH is not allowed inside a transaction
+    if archive_path:
+        cursor.execute('ATTACH DATABASE ? AS archive', (archive_path,))
+    copied = 0
+    try:
+        # The only time writers wait: topping up the archive and swapping tables
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if archive_path:
+                copied = _top_up_archive(cursor)
+            _reset_tables(cursor, keep_username)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    finally:
+        if archive_path:
+            cursor.execute('DETACH DATABASE archive')
     
-    db.commit()
-    db.close()
\ No newline at end of file
+    for hook in _clear_hooks:
+        hook()
+    
+    if copied:
+        # The archive's summaries were copied before these rows arrived
+        archive = sqlite3.connect(archive_path)
+        try:
+            rebuild_analytics(archive)
+        finally:
+            archive.close()
+    
+    if vacuum:
+        # Gives the freed pages back, but blocks every writer until it finishes
+        cursor.execute('VACUUM')
+        cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+def clear_all_data(vacuum=False):
+    """Clear all research data (admin function), keeping the test user.
+    Tables are swapped for empty copies in one short write transaction."""
+    _reset(vacuum=vacuum)
+
+def archive_database(path):
+    """Copy the live database to `path` with SQLite's online backup API.
+    The copy reads a snapshot, so participants keep writing meanwhile."""
+    db = get_db()
+    if db.in_transaction:
+        db.commit()
+    target = sqlite3.connect(path)
+    try:
+        db.backup(target)
+        target.execute('PRAGMA journal_mode = DELETE')
+        for table in _UNARCHIVED_TABLES:
+            target.execute(f'DELETE FROM {table}')
+        target.commit()
+    finally:
+        target.close()
+    return path
+
+def rotate_study(directory=None, vacuum=False):
+    """Archive the current study to a timestamped file, then reset the database.
+    Rows written during the backup are added to the archive just before the reset.
+    Returns the archive path."""
+    directory = directory or config.ARCHIVE_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"research-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db")
+    
+    flush_telemetry()
+    archive_database(path)
+    _reset(path, vacuum=vacuum)
+    return path
@@ -0,0 +1,231 @@
+from database.db import get_db
+from database.models import create_test_user
+from telemetry.logger import rebuild_analytics
+from telemetry import lookups
+from datetime import datetime, timedelta
+import contextlib
+import random
+import sys
+import uuid
+
+# Deterministic synthetic research data for benchmarks and capacity planning.
+# The same seed and size always produce the same rows (ids, timestamps and
+# all), so databases seeded on different machines are comparable.
+
+# Bumped whenever the same seed starts producing different rows, so cached
+# seeded databases (see perf.bench) are rebuilt
+SEED_VERSION = 3
+SEED_START = datetime(2024, 1, 1)
+TEST_USERNAME = 'test'
+TEST_PASSWORD = 'test123'
+
+CONSENT_RATE = 0.92
+COMPLETION_RATE = 0.8
+DID_FIRST_SHARE = 0.5  # share of sessions that start with DID (counterbalanced)
+CHUNK_SESSIONS = 5000
+
+# Failure outcomes per method, as (error_code, error_message, weight), using
+# the codes and messages the login routes actually record
+FAILURES = {
+    'TRADITIONAL': [
+        ('INVALID_PASSWORD', 'Incorrect password', 70),
+        ('USER_NOT_FOUND', 'Username not found', 25),
+        ('MISSING_CREDENTIALS', 'Username or password missing', 5),
+    ],
+    'DID': [
+        ('ADDRESS_MISMATCH', 'Signature does not match address', 30),
+        ('SIGNATURE_INVALID', 'Invalid signature format: invalid signature length', 20),
+        ('INVALID_NONCE', 'Nonce mismatch or expired', 25),
+        ('NONCE_EXPIRED', 'Nonce expired', 15),
+        ('MISSING_PARAMS', 'Address, signature, or message missing', 10),
+    ],
+}
+FAILURE_RATE = {'TRADITIONAL': 0.3, 'DID': 0.2}
+# Server-side duration in ms (lognormal mu, sigma): password logins pay for hashing
+DURATION_MS = {'TRADITIONAL': (4.8, 0.35), 'DID': (2.7, 0.5)}
+# Mean ratings per method for (ease_of_use, speed_rating, security_feeling)
+RATING_MEANS = {'TRADITIONAL': (4.1, 3.6, 3.2), 'DID': (3.4, 3.9, 4.2)}
+WOULD_USE_RATE = {'TRADITIONAL': 0.7, 'DID': 0.55}
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148',
+]
+
+_INSERT_SESSION = '''
+    INSERT INTO research_sessions
+    (session_id, started_at, completed_at, consent_given, first_method, status)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+_INSERT_ATTEMPT = '''
+    INSERT INTO auth_attempt_rows
+    (session_id, user_id, method, attempt_number, duration_ms, success,
+     error_code_id, error_message_id, error_detail, user_agent_id, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_INSERT_EDUCATION_VIEW = '''
+    INSERT INTO education_views (session_id, method, duration_seconds, timestamp)
+    VALUES (?, ?, ?, ?)
+'''
+_INSERT_FEEDBACK = '''
+    INSERT INTO feedback
+    (session_id, method, ease_of_use, speed_rating, security_feeling,
+     would_use_again, comments, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_INSERT_WALLET = 'INSERT INTO users (id, wallet_address, created_at) VALUES (?, ?, ?)'
+
+def parse_count(text):
+    """Parse a row count such as '2500', '10k' or '1m'."""
+    text = str(text).strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+def _rating(rng, mean):
+    return min(5, max(1, round(rng.gauss(mean, 0.9))))
+
+def _lookup_ids(cursor):
+    """Return {value: lookup id} for every user agent, error code and message used
+    (a message maps to the id of its prefix, see lookups.split_error_message)."""
+    ids = {agent: lookups.resolve_id(cursor, 'user_agents', agent) for agent in USER_AGENTS}
+    for failures in FAILURES.values():
+        for error_code, error_message, _ in failures:
+            ids[error_code] = lookups.resolve_id(cursor, 'error_codes', error_code)
+            prefix, _ = lookups.split_error_message(error_message)
+            ids[error_message] = lookups.resolve_id(cursor, 'error_messages', prefix)
+    return ids
+
+def _seed_session(rng, rows, started_at, test_user_id, next_wallet_id, ids):
+    """Append one session's rows to `rows`. Returns (attempt_count, next_wallet_id)."""
+    session_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+    user_agent = ids[rng.choice(USER_AGENTS)]
+    
+    if rng.random() >= CONSENT_RATE:
+        rows['sessions'].append((session_id, started_at, None, False, None, 'active'))
+        return 0, next_wallet_id
+    
+    first = 'DID' if rng.random() < DID_FIRST_SHARE else 'TRADITIONAL'
+    methods = [first, 'TRADITIONAL' if first == 'DID' else 'DID']
+    # Abandoned sessions stop after their first method
+    completed = rng.random() < COMPLETION_RATE
+    if not completed:
+        methods = methods[:1]
+    
+    clock = started_at + timedelta(seconds=rng.uniform(5, 40))
+    attempts = 0
+    for method in methods:
+        attempt_number = 0
+        while True:
+            attempt_number += 1
+            attempts += 1
+            clock += timedelta(seconds=rng.uniform(3, 30))
+            duration = rng.lognormvariate(*DURATION_MS[method])
+            if attempt_number < 6 and rng.random() < FAILURE_RATE[method]:
+                codes = FAILURES[method]
+                error_code, error_message, _ = rng.choices(codes, [c[2] for c in codes])[0]
+                _, detail = lookups.split_error_message(error_message)
+                rows['attempts'].append((session_id, None, method, attempt_number, duration, False,
+                                         ids[error_code], ids[error_message], detail, user_agent,
+                                         clock))
+                continue
+            if method == 'DID':
+                user_id = next_wallet_id
+                rows['wallets'].append((user_id, f'0x{rng.getrandbits(160):040x}', clock))
+                next_wallet_id += 1
+            else:
+                user_id = test_user_id
+            rows['attempts'].append((session_id, user_id, method, attempt_number, duration,
+                                     True, None, None, None, user_agent, clock))
+            break
+        
+        clock += timedelta(seconds=rng.lognormvariate(3.2, 0.6))
+        rows['education'].append((session_id, method, rng.lognormvariate(3.2, 0.6), clock))
+        clock += timedelta(seconds=rng.uniform(10, 60))
+        ease, speed, security = (_rating(rng, mean) for mean in RATING_MEANS[method])
+        rows['feedback'].append((session_id, method, ease, speed, security,
+                                 rng.random() < WOULD_USE_RATE[method], '', clock))
+    
+    rows['sessions'].append((session_id, started_at, clock if completed else None, True, first,
+                             'completed' if completed else 'active'))
+    return attempts, next_wallet_id
+
+def _flush_rows(cursor, rows):
+    cursor.executemany(_INSERT_WALLET, rows['wallets'])
+    cursor.executemany(_INSERT_SESSION, rows['sessions'])
+    cursor.executemany(_INSERT_ATTEMPT, rows['attempts'])
+    cursor.executemany(_INSERT_EDUCATION_VIEW, rows['education'])
+    cursor.executemany(_INSERT_FEEDBACK, rows['feedback'])
+    for table in rows.values():
+        table.clear()
+
+def _secondary_indexes(cursor, tables):
+    cursor.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL
+        AND tbl_name IN ({', '.join('?' for _ in tables)})
+    ''', tables)
+    return [(row['name'], row['sql']) for row in cursor.fetchall()]
+
+def seed_database(attempts, seed=1, start=SEED_START, sessions_per_day=500):
+    """Bulk-load synthetic sessions until `attempts` auth attempts exist.
+    
+    Everything is inserted with executemany in one transaction, with the
+    secondary indexes dropped during the load and rebuilt once at the end.
+    The analytics summaries are rebuilt afterwards. Returns row counts.
+    """
+    db = get_db()
+    cursor = db.cursor()
+    rng = random.Random(seed)
+    
+    # Successful password logins belong to the study's shared test account;
+    # create_test_user reports on stdout, which callers may be using for data
+    with contextlib.redirect_stdout(sys.stderr):
+        create_test_user(TEST_USERNAME, TEST_PASSWORD)
+    test_user_id = cursor.execute('SELECT id FROM users WHERE username = ?',
+                                  (TEST_USERNAME,)).fetchone()['id']
+    next_wallet_id = cursor.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM users').fetchone()[0]
+    
+    rows = {'wallets': [], 'sessions': [], 'attempts': [], 'education': [], 'feedback': []}
+    counts = dict.fromkeys(rows, 0)
+    interval = 86400 / sessions_per_day
+    indexes = _secondary_indexes(cursor, ['research_sessions', 'auth_attempt_rows',
+                                          'education_views', 'feedback'])
+    seeded = 0
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        ids = _lookup_ids(cursor)
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {name}')
+        
+        index = 0
+        while seeded < attempts:
+            started_at = start + timedelta(seconds=index * interval + rng.uniform(0, interval))
+            lengths = {table: len(table_rows) for table, table_rows in rows.items()}
+            added, next_id = _seed_session(rng, rows, started_at, test_user_id, next_wallet_id, ids)
+            if seeded + added > attempts:
+                # Drop a session that would overshoot instead of cutting it short,
+                # so every session keeps the rows its status implies; a smaller
+                # one soon follows and the total stays exact
+                for table, length in lengths.items():
+                    del rows[table][length:]
+                continue
+            next_wallet_id = next_id
+            seeded += added
+            index += 1
+            if len(rows['sessions']) >= CHUNK_SESSIONS or seeded >= attempts:
+                for table, table_rows in rows.items():
+                    counts[table] += len(table_rows)
+                _flush_rows(cursor, rows)
+        
+        for _, sql in indexes:
+            cursor.execute(sql)
+        db.commit()
+    except Exception:
+        db.rollback()
+        lookups.discard_pending()
+        raise
+    lookups.commit_pending()
+    
+    rebuild_analytics()
+    return counts
@@ -0,0 +1,270 @@
+from database import db as database_db
+from database.models import init_db, create_research_session
+from database.migrations import MIGRATIONS
+from database.seed import SEED_VERSION, seed_database, parse_count
+from auth.password import verify_credentials
+from auth.crypto import (verify_signature, get_user_by_wallet, clear_wallet_cache,
+                         _recover_address_cached)
+from telemetry.logger import log_auth_attempt, get_analytics, get_all_sessions
+from telemetry.writer import writer
+from eth_account import Account
+from eth_account.messages import encode_defunct
+import contextlib
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import click
+
+# Offline micro-benchmarks for the auth, database and telemetry hot paths.
+# Database benchmarks run against copies of databases seeded with a given
+# number of auth attempts (cached under --data-dir), so they are repeatable.
+#
+#   python -m perf.bench                       # compare with perf/baselines.json
+#   python -m perf.bench --sizes 10k,100k,1m --save-baseline
+#
+# Baselines are only comparable on the machine that recorded them.
+
+DEFAULT_SIZES = '10k,100k'
+# A benchmark regresses when even its fastest round is slower than the
+# baseline's median round by more than the threshold. Comparing best against
+# typical keeps scheduler noise (and a lucky baseline run) from failing runs.
+DEFAULT_THRESHOLD = 0.5
+MIN_REGRESSION_MS = 0.005  # ignore slowdowns smaller than timer and scheduler noise
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+DATA_DIR = os.path.join(os.path.dirname(__file__), '.data')
+SEED = 1
+
+# name -> (setup, number, per_size); setup() returns the callable to time
+BENCHMARKS = {}
+
+def benchmark(name, number=100, per_size=True):
+    """Register a benchmark. `per_size` ones run once per seeded database size."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, number, per_size)
+        return setup
+    return register
+
+# -----------------------------------------------------------------------------
+# Benchmarks
+# -----------------------------------------------------------------------------
+
+@benchmark('verify_credentials', number=3, per_size=False)
+def _bench_verify_credentials():
+    return lambda: verify_credentials('test', 'test123')
+
+@benchmark('verify_credentials_unknown_user', number=3, per_size=False)
+def _bench_verify_credentials_miss():
+    return lambda: verify_credentials('nobody', 'test123')
+
+@benchmark('verify_signature', number=10, per_size=False)
+def _bench_verify_signature():
+    account = Account.from_key('0x' + '22' * 32)
+    signature = Account.sign_message(encode_defunct(text='bench'), private_key=account.key).signature
+
+    def run():
+        _recover_address_cached.cache_clear()
+        verify_signature(account.address, 'bench', signature)
+    return run
+
+@benchmark('verify_signature_cached', number=10000, per_size=False)
+def _bench_verify_signature_cached():
+    account = Account.from_key('0x' + '22' * 32)
+    signature = Account.sign_message(encode_defunct(text='bench'), private_key=account.key).signature
+    return lambda: verify_signature(account.address, 'bench', signature)
+
+@benchmark('get_user_by_wallet_existing')
+def _bench_wallet_existing():
+    address = '0x' + 'ab' * 20
+    get_user_by_wallet(address)
+
+    def run():
+        clear_wallet_cache()
+        get_user_by_wallet(address)
+    return run
+
+@benchmark('get_user_by_wallet_new')
+def _bench_wallet_new():
+    counter = itertools.count()
+    return lambda: get_user_by_wallet(f'0x{next(counter):040x}')
+
+@benchmark('create_research_session')
+def _bench_create_session():
+    return create_research_session
+
+@benchmark('log_auth_attempt')
+def _bench_log_auth_attempt():
+    # The writer is disabled while benchmarking, so this times the INSERT,
+    # summary upserts and commit on the calling thread
+    return lambda: log_auth_attempt('bench-session', None, 'DID', 1, time.time(), True,
+                                    None, None, 'bench')
+
+@benchmark('get_analytics', number=20)
+def _bench_get_analytics():
+    return get_analytics
+
+@benchmark('get_all_sessions', number=20)
+def _bench_get_all_sessions():
+    return get_all_sessions
+
+@benchmark('get_all_sessions_filtered', number=20)
+def _bench_get_all_sessions_filtered():
+    return lambda: get_all_sessions(status='completed', first_method='DID')
+
+# -----------------------------------------------------------------------------
+# Seeded databases
+# -----------------------------------------------------------------------------
+
+def format_size(size):
+    if size >= 1000000 and size % 1000000 == 0:
+        return f'{size // 1000000}m'
+    if size >= 1000 and size % 1000 == 0:
+        return f'{size // 1000}k'
+    return str(size)
+
+def seeded_database(size, data_dir):
+    """Return the path of a database seeded with `size` attempts, building it once."""
+    path = os.path.join(data_dir, f'seeded-{format_size(size)}-{SEED}-s{SEED_VERSION}-v{MIGRATIONS[-1][0]}.db')
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    building = path + '.building'
+    with use_database(building):
+        seed_database(size, SEED)
+        database_db.get_db().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    os.replace(building, path)
+    return path
+
+@contextlib.contextmanager
+def use_database(path):
+    """Point the app at `path` (initialized) for the duration of the block."""
+    previous = database_db.DATABASE_PATH
+    database_db.DATABASE_PATH = path
+    try:
+        init_db()
+        yield path
+    finally:
+        database_db.close_thread_db()
+        database_db.close_pool()
+        database_db.DATABASE_PATH = previous
+
+# -----------------------------------------------------------------------------
+# Running and comparing
+# -----------------------------------------------------------------------------
+
+def measure(fn, number, repeat):
+    """Return the median and minimum milliseconds per call over `repeat` rounds."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) * 1000 / number)
+    return {'median_ms': statistics.median(timings), 'min_ms': min(timings)}
+
+def run_benchmarks(sizes, names=None, repeat=7, data_dir=DATA_DIR):
+    """Run the selected benchmarks. Returns {key: result}, keyed 'name' or 'name@size'."""
+    selected = [name for name in BENCHMARKS if not names or name in names]
+    results = {}
+    enabled = writer.enabled
+    writer.enabled = False
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    try:
+        for index, size in enumerate(sizes):
+            seeded = seeded_database(size, data_dir)
+            for name in selected:
+                setup, number, per_size = BENCHMARKS[name]
+                if not per_size and index > 0:
+                    continue
+                # Each benchmark gets a fresh copy, so rows written by one
+                # (new sessions, attempts) do not slow down the next
+                work_path = os.path.join(workdir, 'work.db')
+                shutil.copyfile(seeded, work_path)
+                with use_database(work_path):
+                    key = f'{name}@{format_size(size)}' if per_size else name
+                    results[key] = measure(setup(), number, repeat)
+                os.remove(work_path)
+    finally:
+        writer.enabled = enabled
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return [(key, min_ms, baseline_median_ms, ratio)] for results slower than the baseline allows."""
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get('results', {}).get(key)
+        if expected is None:
+            continue
+        ratio = result['min_ms'] / expected['median_ms']
+        if ratio > 1 + threshold and result['min_ms'] - expected['median_ms'] > MIN_REGRESSION_MS:
+            regressions.append((key, result['min_ms'], expected['median_ms'], ratio))
+    return regressions
+
+def machine_info():
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'processor': platform.processor() or platform.machine(), 'cpus': os.cpu_count()}
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(path, results):
+    baseline = load_baseline(path)
+    baseline['machine'] = machine_info()
+    baseline.setdefault('results', {}).update(results)
+    baseline['results'] = dict(sorted(baseline['results'].items()))
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+@click.command()
+@click.option('--sizes', default=DEFAULT_SIZES, help='Seeded attempt counts, e.g. 10k,100k,1m.')
+@click.option('--only', 'names', multiple=True, type=click.Choice(sorted(BENCHMARKS)),
+              help='Run only these benchmarks.')
+@click.option('--repeat', default=7, help='Timed rounds per benchmark.')
+@click.option('--baseline', 'baseline_path', default=BASELINE_PATH, help='Baseline JSON file.')
+@click.option('--save-baseline', 'record', is_flag=True, help='Record these results as the new baseline.')
+@click.option('--threshold', default=DEFAULT_THRESHOLD,
+              help='Allowed slowdown over baseline before failing (0.5 = 50%).')
+@click.option('--data-dir', default=DATA_DIR, help='Where seeded databases are cached.')
+@click.option('--json', 'as_json', is_flag=True, help='Print results as JSON.')
+def main(sizes, names, repeat, baseline_path, record, threshold, data_dir, as_json):
+    """Run the micro-benchmarks and compare them with the stored baseline."""
+    sizes = [parse_count(size) for size in sizes.split(',')]
+    results = run_benchmarks(sizes, names, repeat, data_dir)
+    baseline = load_baseline(baseline_path)
+    
+    if as_json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'benchmark':<40}{'median ms':>12}{'min ms':>12}{'baseline':>12}")
+        for key, result in results.items():
+            expected = baseline.get('results', {}).get(key)
+            print(f"{key:<40}{result['median_ms']:>12.3f}{result['min_ms']:>12.3f}"
+                  f"{expected['median_ms'] if expected else float('nan'):>12.3f}")
+    
+    if record:
+        save_baseline(baseline_path, results)
+        print(f"Baseline saved to {baseline_path}", file=sys.stderr)
+        return
+    
+    if baseline.get('machine') and baseline['machine'] != machine_info():
+        print("warning: baseline was recorded on a different machine", file=sys.stderr)
+    regressions = compare(results, baseline, threshold)
+    for key, best, expected, ratio in regressions:
+        print(f"REGRESSION {key}: {best:.3f}ms vs {expected:.3f}ms baseline ({ratio:.2f}x)",
+              file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+from concurrent.futures import ThreadPoolExecutor
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from telemetry import sketch
+import ast
+import contextlib
+import hashlib
+import http.cookiejar
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import click
+import config
+
+# Load generator that replays the full participant journey against the app,
+# either in-process through Flask's test client, through a local threaded
+# WSGI server, or against a running server (--url).
+#
+#   python -m perf.loadtest --participants 200 --concurrency 16
+#   python -m perf.loadtest --mode server --set TELEMETRY_ASYNC=False --json
+#
+# Participants sign DID challenges with locally generated keys; in the local
+# modes that signing shares the CPU with the server under test.
+
+TEST_USERNAME = 'test'
+TEST_PASSWORD = 'test123'
+
+class LoadStats:
+    """Thread-safe per-route latency sketches and error counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+        self.failures = {}
+        self.lock_errors = 0
+        self.server_errors = 0
+        self.completed = 0
+
+    def record(self, route, elapsed_ms, status):
+        with self._lock:
+            entry = self.routes.setdefault(route, {'count': 0, 'errors': 0, 'max_ms': 0.0,
+                                                   'sketch': {}})
+            entry['count'] += 1
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            index = sketch.bucket_index(elapsed_ms)
+            entry['sketch'][index] = entry['sketch'].get(index, 0) + 1
+            if status >= 500:
+                entry['errors'] += 1
+                self.server_errors += 1
+
+    def record_lock_error(self):
+        with self._lock:
+            self.lock_errors += 1
+
+    def record_journey(self, failed_step=None):
+        with self._lock:
+            if failed_step is None:
+                self.completed += 1
+            else:
+                self.failures[failed_step] = self.failures.get(failed_step, 0) + 1
+
+    def route_summary(self):
+        summary = {}
+        with self._lock:
+            for route, entry in sorted(self.routes.items()):
+                p50, p90, p99 = sketch.quantiles(entry['sketch'], [0.5, 0.9, 0.99], entry['max_ms'])
+                summary[route] = {'count': entry['count'], 'errors': entry['errors'],
+                                  'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99,
+                                  'max_ms': entry['max_ms']}
+        return summary
+
+class FlaskClientTransport:
+    """Drive the app in-process; each participant gets its own cookie jar."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, payload=None, form=None):
+        response = self.client.open(path, method=method, json=payload, data=form)
+        return response.status_code, response.get_json(silent=True)
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HttpTransport:
+    """Drive a server over HTTP, keeping the session cookie between requests."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, payload=None, form=None):
+        headers = {}
+        data = None
+        if payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers,
+                                     method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                status, headers, body = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            status, headers, body = e.code, e.headers, e.read()
+        if headers.get_content_type() == 'application/json':
+            return status, json.loads(body)
+        return status, None
+
+class JourneyError(Exception):
+    """A step returned something other than what a real participant would see."""
+
+    def __init__(self, step, status):
+        super().__init__(f'{step} returned {status}')
+        self.step = step
+
+def participant_key(seed, index):
+    """Deterministic signing key for participant `index`, so runs are repeatable."""
+    return Account.from_key(hashlib.sha256(f'{seed}:{index}'.encode()).digest())
+
+def run_journey(transport, stats, account, failed_logins=0, think_ms=0):
+    """Walk one participant through consent, both methods, feedback and completion."""
+
+    def step(route, method, path, expect, payload=None, form=None):
+        start = time.perf_counter()
+        status, body = transport.request(method, path, payload, form)
+        stats.record(route, (time.perf_counter() - start) * 1000, status)
+        if status != expect:
+            raise JourneyError(route, status)
+        if think_ms:
+            time.sleep(think_ms / 1000)
+        return body
+
+    def feedback(method):
+        step('/education/<method>', 'GET', f'/education/{method}', 200)
+        step('/api/education/complete', 'POST', '/api/education/complete', 200,
+             payload={'method': method})
+        step('/feedback/<method>', 'GET', f'/feedback/{method}', 200)
+        return step('/api/feedback/submit', 'POST', '/api/feedback/submit', 200,
+                    payload={'method': method, 'ease_of_use': 4, 'speed_rating': 3,
+                             'security_feeling': 4, 'would_use_again': True,
+                             'comments': 'load test'})
+    
+    step('/', 'GET', '/', 200)
+    step('/consent', 'POST', '/consent', 302, form={'consent': 'yes'})
+    
+    step('/authenticate', 'GET', '/authenticate', 200)
+    for _ in range(failed_logins):
+        step('/api/login/traditional', 'POST', '/api/login/traditional', 401,
+             payload={'username': TEST_USERNAME, 'password': 'wrong-password'})
+    step('/api/login/traditional', 'POST', '/api/login/traditional', 200,
+         payload={'username': TEST_USERNAME, 'password': TEST_PASSWORD})
+    feedback('TRADITIONAL')
+    
+    step('/authenticate', 'GET', '/authenticate', 200)
+    nonce = step('/api/nonce', 'GET', '/api/nonce', 200)['nonce']
+    signed = Account.sign_message(encode_defunct(text=nonce), private_key=account.key)
+    step('/api/login/did', 'POST', '/api/login/did', 200,
+         payload={'address': account.address, 'signature': signed.signature.hex(),
+                  'message': nonce})
+    body = feedback('DID')
+    if body['redirect'] != '/final-feedback':
+        raise JourneyError('/api/feedback/submit', body['redirect'])
+    
+    step('/final-feedback', 'GET', '/final-feedback', 200)
+    step('/api/final-feedback/submit', 'POST', '/api/final-feedback/submit', 200)
+    step('/thank-you', 'GET', '/thank-you', 200)
+
+def run_load_test(make_transport, participants, concurrency, failed_logins=0, think_ms=0,
+                  seed='loadtest', stats=None):
+    """Run `participants` journeys on `concurrency` threads. Returns a report dict."""
+    stats = stats or LoadStats()
+
+    def participant(index):
+        try:
+            run_journey(make_transport(), stats, participant_key(seed, index),
+                        failed_logins, think_ms)
+        except JourneyError as e:
+            stats.record_journey(e.step)
+        except Exception as e:
+            stats.record_journey(type(e).__name__)
+        else:
+            stats.record_journey()
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(participant, range(participants)))
+    elapsed = time.perf_counter() - start
+    
+    routes = stats.route_summary()
+    requests = sum(route['count'] for route in routes.values())
+    return {
+        'participants': participants,
+        'concurrency': concurrency,
+        'completed': stats.completed,
+        'failed': sum(stats.failures.values()),
+        'failures': stats.failures,
+        'elapsed_s': elapsed,
+        'requests': requests,
+        'requests_per_s': requests / elapsed if elapsed else 0.0,
+        'journeys_per_s': stats.completed / elapsed if elapsed else 0.0,
+        'lock_errors': stats.lock_errors,
+        'server_errors': stats.server_errors,
+        'routes': routes,
+    }
+
+def is_lock_error(error):
+    """True for SQLite 'database is locked' / 'database table is locked' errors."""
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+def watch_lock_errors(app, stats):
+    """Count unhandled SQLite lock errors raised while the app serves requests."""
+    from flask import got_request_exception
+
+    def on_exception(sender, exception, **extra):
+        if is_lock_error(exception):
+            stats.record_lock_error()
+    
+    got_request_exception.connect(on_exception, app, weak=False)
+    return on_exception
+
+def apply_overrides(pairs):
+    """Set config attributes from NAME=VALUE strings (values parsed as Python literals)."""
+    for pair in pairs:
+        name, _, value = pair.partition('=')
+        if not hasattr(config, name):
+            raise click.BadParameter(f'Unknown config setting {name}', param_hint='--set')
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+        setattr(config, name, value)
+
+def print_report(report, out=sys.stdout):
+    """Print a human-readable summary of a run_load_test() report."""
+    print(f"{report['completed']}/{report['participants']} journeys completed "
+          f"({report['concurrency']} concurrent) in {report['elapsed_s']:.2f}s", file=out)
+    print(f"{report['requests']} requests, {report['requests_per_s']:.1f} req/s, "
+          f"{report['journeys_per_s']:.2f} journeys/s", file=out)
+    print(f"lock errors: {report['lock_errors']}  server errors: {report['server_errors']}",
+          file=out)
+    for step, count in sorted(report['failures'].items()):
+        print(f"  failed at {step}: {count}", file=out)
+    if 'telemetry' in report:
+        telemetry = report['telemetry']
+        print(f"telemetry: {telemetry['written']} rows, {telemetry['failed']} failed, "
+              f"{telemetry['sync_fallbacks']} sync fallbacks", file=out)
+    
+    print(f"\n{'route':<28}{'count':>7}{'errors':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}",
+          file=out)
+    for route, entry in report['routes'].items():
+        print(f"{route:<28}{entry['count']:>7}{entry['errors']:>8}"
+              f"{entry['p50_ms']:>9.1f}{entry['p90_ms']:>9.1f}{entry['p99_ms']:>9.1f}"
+              f"{entry['max_ms']:>9.1f}", file=out)
+
+@click.command()
+@click.option('--participants', default=100, help='Number of simulated participants.')
+@click.option('--concurrency', default=8, help='Participants in flight at once.')
+@click.option('--mode', type=click.Choice(['client', 'server']), default='client',
+              help='In-process test client, or a local threaded WSGI server.')
+@click.option('--url', help='Drive an already running server instead (ignores --mode).')
+@click.option('--database', help='Database file for local modes (default: a fresh temp file).')
+@click.option('--failed-logins', default=0, help='Wrong-password attempts before each password login.')
+@click.option('--think-ms', default=0.0, help='Pause after each request.')
+@click.option('--seed', default='loadtest', help='Seed for participant wallet keys.')
+@click.option('--set', 'overrides', multiple=True, metavar='NAME=VALUE',
+              help='Override a config setting for local modes, e.g. DB_POOL_SIZE=2.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON.')
+def main(participants, concurrency, mode, url, database, failed_logins, think_ms, seed,
+         overrides, as_json):
+    """Replay the participant journey with many concurrent participants."""
+    stats = LoadStats()
+    options = dict(participants=participants, concurrency=concurrency,
+                   failed_logins=failed_logins, think_ms=think_ms, seed=seed, stats=stats)
+    
+    if url:
+        report = run_load_test(lambda: HttpTransport(url), **options)
+        report['mode'] = 'url'
+    else:
+        # Settings are read at import time by some modules, so apply them first
+        apply_overrides(overrides)
+        from database import db as database_db
+        if database is None:
+            fd, database = tempfile.mkstemp(suffix='.db')
+            os.close(fd)
+        database_db.DATABASE_PATH = database
+        from app import create_app
+        from database.models import init_db, create_test_user
+        from auth.crypto import warm_up_signature_verification
+        from telemetry.logger import flush_telemetry, get_writer_stats
+        
+        init_db()
+        with contextlib.redirect_stdout(sys.stderr):
+            create_test_user(TEST_USERNAME, TEST_PASSWORD)
+        warm_up_signature_verification()
+        app = create_app()
+        watch_lock_errors(app, stats)
+        
+        if mode == 'server':
+            from werkzeug.serving import make_server
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+            try:
+                report = run_load_test(lambda: HttpTransport(base_url), **options)
+            finally:
+                server.shutdown()
+        else:
+            report = run_load_test(lambda: FlaskClientTransport(app), **options)
+        
+        flush_telemetry()
+        report['mode'] = mode
+        report['database'] = database_db.DATABASE_PATH
+        report['overrides'] = list(overrides)
+        report['telemetry'] = get_writer_stats()
+    
+    if as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import click
+
+# Startup profile: what importing the app costs, module by module, and how
+# long a fresh process takes to serve its first request, both against a new
+# database and on a restart against an existing one.
+#
+#   python -m perf.startup
+#   python -m perf.startup --top 25 --max-import-ms 500
+#
+# Every measurement runs in a fresh interpreter, so nothing is already imported.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a child interpreter: boot the way `python app.py` does, then time
+# one request through the test client (app creation counts toward it)
+_BOOT_SCRIPT = '''
+import time
+start = time.perf_counter()
+import json, sys
+from database import db as database_db
+database_db.DATABASE_PATH = sys.argv[1]
+import app
+imported = time.perf_counter()
+app.init_db()
+app.create_test_user('test', 'test123')
+ready = time.perf_counter()
+status = app.create_app().test_client().get(sys.argv[2]).status_code
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'init_ms': (ready - imported) * 1000,
+                  'first_request_ms': (served - ready) * 1000, 'total_ms': (served - start) * 1000,
+                  'status': status, 'eth_account_loaded': 'eth_account' in sys.modules}))
+'''
+
+def parse_importtime(output):
+    """Parse `python -X importtime` output into [(module, self_us, cumulative_us, depth)]."""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+def profile_import(module='app'):
+    """Import `module` in a fresh interpreter and return its parsed import times."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return parse_importtime(result.stderr)
+
+def summarize_imports(entries, module='app', top=15):
+    """Return the total for `module` and its heaviest imports by cumulative time.
+    
+    Nested imports are listed before the module that triggered them, so the
+    imports attributed to `module` are the ones preceding its own entry.
+    """
+    for end, (name, _, cumulative, depth) in enumerate(entries):
+        if name == module and depth == 0:
+            break
+    else:
+        raise ValueError(f"'{module}' not found in import profile")
+    
+    # Everything nested under `module` directly precedes it
+    start = end
+    while start > 0 and entries[start - 1][3] > 0:
+        start -= 1
+    direct = [(name, cumulative) for name, _, cumulative, depth in entries[start:end] if depth == 1]
+    packages = {}
+    for name, self_us, _, _ in entries[start:end]:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return {
+        'total_ms': entries[end][2] / 1000,
+        'imports': [{'module': name, 'cumulative_ms': us / 1000}
+                    for name, us in sorted(direct, key=lambda item: -item[1])[:top]],
+        'packages': [{'package': name, 'self_ms': us / 1000}
+                     for name, us in sorted(packages.items(), key=lambda item: -item[1])[:top]],
+    }
+
+def time_boot(database, path='/'):
+    """Boot the app in a fresh interpreter against `database` and time its first request."""
+    result = subprocess.run([sys.executable, '-c', _BOOT_SCRIPT, database, path],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def profile_startup(top=15, path='/'):
+    """Return the import profile and cold/restart boot timings."""
+    report = {'imports': summarize_imports(profile_import(), top=top)}
+    fd, database = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.remove(database)
+    try:
+        # The first boot creates the schema and hashes the test user's password;
+        # a restart should find both in place and skip that work
+        report['cold'] = time_boot(database, path)
+        report['restart'] = time_boot(database, path)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+    return report
+
+def print_report(report, out=sys.stdout):
+    imports = report['imports']
+    print(f"import app: {imports['total_ms']:.1f}ms", file=out)
+    print(f"\n{'direct import':<40}{'cumulative ms':>15}", file=out)
+    for entry in imports['imports']:
+        print(f"{entry['module']:<40}{entry['cumulative_ms']:>15.1f}", file=out)
+    print(f"\n{'package':<40}{'self ms':>15}", file=out)
+    for entry in imports['packages']:
+        print(f"{entry['package']:<40}{entry['self_ms']:>15.1f}", file=out)
+    print(f"\n{'boot':<10}{'import ms':>12}{'init ms':>12}{'request ms':>12}{'total ms':>12}", file=out)
+    for name in ('cold', 'restart'):
+        boot = report[name]
+        print(f"{name:<10}{boot['import_ms']:>12.1f}{boot['init_ms']:>12.1f}"
+              f"{boot['first_request_ms']:>12.1f}{boot['total_ms']:>12.1f}", file=out)
+    if report['restart']['eth_account_loaded']:
+        print("\nwarning: eth_account was imported before the first DID login", file=out)
+
+@click.command()
+@click.option('--top', default=15, help='Modules and packages to list.')
+@click.option('--path', default='/', help='Route to request first.')
+@click.option('--max-import-ms', type=float, help='Fail if importing the app takes longer.')
+@click.option('--json', 'as_json', is_flag=True, help='Print the report as JSON.')
+def main(top, path, max_import_ms, as_json):
+    """Profile app import time and time to first request."""
+    report = profile_startup(top, path)
+    if as_json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    
+    if max_import_ms is not None and report['imports']['total_ms'] > max_import_ms:
+        print(f"import app took {report['imports']['total_ms']:.1f}ms "
+              f"(budget {max_import_ms:.1f}ms)", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
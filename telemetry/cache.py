@@ -0,0 +1,60 @@
+import threading
+import time
+import config
+
+# Bumped whenever telemetry rows are committed or research data is cleared.
+# Cached entries from an older generation are never served.
+_generation = 0
+_entries = {}
+_lock = threading.Lock()
+
+MAX_ENTRIES = 256
+
+def bump_generation():
+    """Invalidate every cached analytics result."""
+    global _generation
+    with _lock:
+        _generation += 1
+
+def get_generation():
+    """Return the current cache generation."""
+    return _generation
+
+def get_cached(key):
+    """Return the cached value for `key` if it is current and within its TTL, else None."""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        generation, expires_at, value = entry
+        if generation != _generation or expires_at < time.monotonic():
+            del _entries[key]
+            return None
+        return value
+
+def set_cached(key, value, generation):
+    """Store `value` computed at `generation` (read before computing it)."""
+    with _lock:
+        if generation != _generation:
+            return
+        if len(_entries) >= MAX_ENTRIES:
+            _entries.pop(next(iter(_entries)))
+        _entries[key] = (generation, time.monotonic() + config.DASHBOARD_CACHE_TTL_SECONDS, value)
+
+def cached(key, compute):
+    """Return the cached value for `key`, computing and storing it on a miss.
+    
+    Session-lifecycle writes (new sessions, consent, completion) do not bump
+    the generation, so they show up after at most DASHBOARD_CACHE_TTL_SECONDS.
+    """
+    value = get_cached(key)
+    if value is None:
+        generation = get_generation()
+        value = compute()
+        set_cached(key, value, generation)
+    return value
+
+def clear_cache():
+    """Drop all cached entries."""
+    with _lock:
+        _entries.clear()
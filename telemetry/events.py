@@ -0,0 +1,99 @@
+from collections import deque
+import json
+import queue
+import threading
+import time
+import config
+
+# In-process publish/subscribe feeding the live admin dashboard. Each worker
+# process has its own bus, so a stream only carries events handled by the
+# worker serving it; the dashboard snapshot still comes from the database.
+
+class EventBus:
+    """Fan events out to listeners, keeping a short history for reconnects."""
+
+    def __init__(self, history_size, queue_size):
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history_size)
+        self._published_at = deque(maxlen=history_size)  # time.time() per history event
+        self._listeners = set()
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def publish(self, event_type, data):
+        """Send an event to every listener. Never blocks the publisher."""
+        with self._lock:
+            self._last_id += 1
+            event = (self._last_id, event_type, data)
+            self._history.append(event)
+            self._published_at.append(time.time())
+            for listener in list(self._listeners):
+                try:
+                    listener.put_nowait(event)
+                except queue.Full:
+                    # A stalled client is dropped; it resumes from the history
+                    # (or reloads) when it reconnects with Last-Event-ID
+                    self._listeners.discard(listener)
+
+    def listen(self, last_event_id=None, timeout=15):
+        """Yield (id, type, data) events as they are published, and None after
+        `timeout` seconds of silence so the caller can send a keep-alive.
+        
+        Events after `last_event_id` are replayed from the history first. If
+        some of them are no longer retained, a single 'reset' event is sent
+        instead. The generator ends if the listener falls too far behind.
+        """
+        listener = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            backlog = []
+            if last_event_id is not None:
+                backlog = [event for event in self._history if event[0] > last_event_id]
+                if len(backlog) != self._last_id - last_event_id:
+                    backlog = [(self._last_id, 'reset', {})]
+            self._listeners.add(listener)
+        
+        try:
+            yield from backlog
+            while True:
+                try:
+                    yield listener.get(timeout=timeout)
+                except queue.Empty:
+                    with self._lock:
+                        if listener not in self._listeners:
+                            return
+                    yield None
+        finally:
+            with self._lock:
+                self._listeners.discard(listener)
+
+    def last_event_id(self, before=None):
+        """Return the id of the latest event, or of the latest one published at
+        or before the time `before` (seconds since the epoch)."""
+        with self._lock:
+            if before is None:
+                return self._last_id
+            # Ids are consecutive, so the newest retained event has _last_id
+            last_id = self._last_id - len(self._history)
+            for published_at in self._published_at:
+                if published_at > before:
+                    break
+                last_id += 1
+            return last_id
+
+    def listener_count(self):
+        with self._lock:
+            return len(self._listeners)
+
+bus = EventBus(config.EVENTS_HISTORY_SIZE, config.EVENTS_QUEUE_SIZE)
+
+def stream_events(last_event_id=None):
+    """Yield Server-Sent Events frames from the bus until the client goes away."""
+    for event in bus.listen(last_event_id, config.EVENTS_KEEPALIVE_SECONDS):
+        yield format_sse(event)
+
+def format_sse(event):
+    """Encode an event (or None for a keep-alive) as a Server-Sent Events frame."""
+    if event is None:
+        return ': keep-alive\n\n'
+    event_id, event_type, data = event
+    return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n'
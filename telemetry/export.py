@@ -0,0 +1,81 @@
+from database.db import get_db
+import csv
+import io
+import json
+
+# Tables that can be exported, with their columns in output order
+EXPORT_TABLES = {
+    'research_sessions': ['id', 'session_id', 'started_at', 'completed_at',
+                          'consent_given', 'first_method', 'status'],
+    'auth_attempts': ['id', 'session_id', 'user_id', 'method', 'attempt_number',
+                      'duration_ms', 'success', 'error_code', 'error_message',
+                      'user_agent', 'timestamp', 'phases'],
+    'feedback': ['id', 'session_id', 'method', 'ease_of_use', 'speed_rating',
+                 'security_feeling', 'would_use_again', 'comments', 'timestamp'],
+    'education_views': ['id', 'session_id', 'method', 'duration_seconds', 'timestamp'],
+}
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+def get_export_watermark(table):
+    """Return the highest row id currently in `table` (0 if empty)."""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table '{table}'")
+    db = get_db()
+    row = db.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()
+    return row[0]
+
+def iter_rows(table, since=0, until=None, chunk_size=1000):
+    """Yield lists of row tuples with since < id <= until, in id order.
+
+    Each chunk is a separate keyset query, so memory stays flat and no read
+    transaction is held open while the caller streams. Rows are selected by
+    id: later updates to already exported research_sessions rows (status,
+    completed_at) are not re-sent.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table '{table}'")
+    if until is None:
+        until = get_export_watermark(table)
+
+    columns = ', '.join(EXPORT_TABLES[table])
+    last_id = since or 0
+    while last_id < until:
+        db = get_db()
+        rows = db.execute(
+            f'SELECT {columns} FROM {table} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?',
+            (last_id, until, chunk_size)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        yield [tuple(row) for row in rows]
+
+def export_csv(table, since=0, until=None, chunk_size=1000):
+    """Yield CSV text for `table`, header first, one chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_TABLES[table])
+    for rows in iter_rows(table, since, until, chunk_size):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_jsonl(table, since=0, until=None, chunk_size=1000):
+    """Yield JSON Lines text for `table`, one chunk of rows at a time."""
+    columns = EXPORT_TABLES[table]
+    for rows in iter_rows(table, since, until, chunk_size):
+        yield ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+
+def export_table(table, fmt, since=0, until=None, chunk_size=1000):
+    """Return a generator of text chunks for `table` in `fmt` ('csv' or 'jsonl')."""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table '{table}'")
+    if fmt == 'csv':
+        return export_csv(table, since, until, chunk_size)
+    if fmt == 'jsonl':
+        return export_jsonl(table, since, until, chunk_size)
+    raise ValueError(f"Unknown export format '{fmt}'")
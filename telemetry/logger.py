@@ -1,55 +1,325 @@
-from database.db import get_db
+from database.db import get_db, get_read_db, snapshot_time
+from telemetry.writer import writer
+from telemetry import sketch
+from telemetry.cache import bump_generation
+from telemetry.events import bus
+from telemetry import lookups
+from telemetry.retention import fold_rollups
+from telemetry.metrics import request_phase_ms
 from datetime import datetime
+import json
 import time
+import config
+
+# Strings are stored as lookup table ids, resolved by the writer in its own
+# transaction; read them back through the auth_attempts view
+_INSERT_AUTH_ATTEMPT = '''
+    INSERT INTO auth_attempt_rows 
+    (session_id, user_id, method, attempt_number, duration_ms, success, 
+     error_code_id, error_message_id, error_detail, user_agent_id, timestamp, phases)
+    VALUES (:session_id, :user_id, :method, :attempt_number, :duration_ms, :success,
+            :error_code_id, :error_message_id, :error_detail, :user_agent_id, :timestamp, :phases)
+'''
+
+_INSERT_EDUCATION_VIEW = '''
+    INSERT INTO education_views (session_id, method, duration_seconds, timestamp)
+    VALUES (:session_id, :method, :duration_seconds, :timestamp)
+'''
+
+_INSERT_FEEDBACK = '''
+    INSERT INTO feedback 
+    (session_id, method, ease_of_use, speed_rating, security_feeling, 
+     would_use_again, comments, timestamp)
+    VALUES (:session_id, :method, :ease_of_use, :speed_rating, :security_feeling,
+            :would_use_again, :comments, :timestamp)
+'''
+
+# Fields pushed to the live dashboard (no user ids, agents or free text)
+_ATTEMPT_EVENT_FIELDS = ('session_id', 'method', 'attempt_number', 'duration_ms',
+                         'success', 'error_code', 'timestamp')
+_FEEDBACK_EVENT_FIELDS = ('session_id', 'method', 'ease_of_use', 'speed_rating',
+                          'security_feeling', 'would_use_again')
 
 def log_auth_attempt(session_id, user_id, method, attempt_number, start_time, success, 
                     error_code=None, error_message=None, user_agent=None):
     """Log an authentication attempt with comprehensive data."""
-    db = get_db()
-    cursor = db.cursor()
-    
     duration_ms = (time.time() - start_time) * 1000
     
-    cursor.execute('''
-        INSERT INTO auth_attempts 
-        (session_id, user_id, method, attempt_number, duration_ms, success, 
-         error_code, error_message, user_agent, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (session_id, user_id, method, attempt_number, duration_ms, success, 
-          error_code, error_message, user_agent, datetime.now()))
-    
-    db.commit()
-    db.close()
+    row = {
+        'session_id': session_id,
+        'user_id': user_id,
+        'method': method,
+        'attempt_number': attempt_number,
+        'duration_ms': duration_ms,
+        'success': success,
+        'error_code': error_code,
+        'error_message': error_message,
+        'user_agent': user_agent,
+        # Filled in by _resolve_attempt_lookups when the row is written
+        'error_code_id': None,
+        'error_message_id': None,
+        'error_detail': None,
+        'user_agent_id': None,
+        'timestamp': datetime.now(),
+        'phases': json.dumps(request_phase_ms()) if config.STORE_AUTH_PHASES else None
+    }
+    writer.submit(_INSERT_AUTH_ATTEMPT, row)
 
 def log_education_view(session_id, method, duration_seconds):
     """Log when user views educational content about a method."""
-    db = get_db()
-    cursor = db.cursor()
-    
-    cursor.execute('''
-        INSERT INTO education_views (session_id, method, duration_seconds, timestamp)
-        VALUES (?, ?, ?, ?)
-    ''', (session_id, method, duration_seconds, datetime.now()))
-    
-    db.commit()
-    db.close()
+    writer.submit(_INSERT_EDUCATION_VIEW, {
+        'session_id': session_id,
+        'method': method,
+        'duration_seconds': duration_seconds,
+        'timestamp': datetime.now()
+    })
 
 def save_feedback(session_id, method, ease_of_use, speed_rating, security_feeling, 
                  would_use_again, comments):
     """Save user feedback for a specific method."""
-    db = get_db()
+    row = {
+        'session_id': session_id,
+        'method': method,
+        'ease_of_use': ease_of_use,
+        'speed_rating': speed_rating,
+        'security_feeling': security_feeling,
+        'would_use_again': would_use_again,
+        'comments': comments,
+        'timestamp': datetime.now()
+    }
+    writer.submit(_INSERT_FEEDBACK, row)
+
+def _publish_attempts(rows):
+    """Send committed auth_attempts rows to the live dashboard."""
+    for row in rows:
+        bus.publish('attempt', {key: row[key] for key in _ATTEMPT_EVENT_FIELDS})
+
+def _publish_feedback(rows):
+    """Send committed feedback rows to the live dashboard."""
+    for row in rows:
+        bus.publish('feedback', {key: row[key] for key in _FEEDBACK_EVENT_FIELDS})
+
+def _resolve_attempt_lookups(cursor, rows):
+    """Fill in the lookup table ids for a batch of auth_attempts rows."""
+    for row in rows:
+        row['error_code_id'] = lookups.resolve_id(cursor, 'error_codes', row['error_code'])
+        prefix, row['error_detail'] = lookups.split_error_message(row['error_message'])
+        row['error_message_id'] = lookups.resolve_id(cursor, 'error_messages', prefix)
+        row['user_agent_id'] = lookups.resolve_id(cursor, 'user_agents', row['user_agent'])
+
+# =============================================================================
+# ANALYTICS SUMMARIES
+# =============================================================================
+
+def _update_attempt_stats(cursor, rows):
+    """Fold a batch of auth_attempts rows into the summary tables."""
+    cursor.executemany('''
+        INSERT INTO method_stats 
+        (method, attempts, successes, duration_sum, success_duration_sum, failure_duration_sum)
+        VALUES (:method, 1,
+                CASE WHEN :success = 1 THEN 1 ELSE 0 END,
+                :duration_ms,
+                CASE WHEN :success = 1 THEN :duration_ms ELSE 0 END,
+                CASE WHEN :success = 0 THEN :duration_ms ELSE 0 END)
+        ON CONFLICT(method) DO UPDATE SET
+            attempts = attempts + 1,
+            successes = successes + excluded.successes,
+            duration_sum = duration_sum + excluded.duration_sum,
+            success_duration_sum = success_duration_sum + excluded.success_duration_sum,
+            failure_duration_sum = failure_duration_sum + excluded.failure_duration_sum
+    ''', rows)
+    
+    cursor.executemany('''
+        INSERT INTO error_stats (method, error_code, count)
+        VALUES (:method, :error_code, 1)
+        ON CONFLICT(method, error_code) DO UPDATE SET count = count + 1
+    ''', [row for row in rows if not row['success'] and row['error_code'] is not None])
+    
+    # Unique session counts, overall and per method
+    for session_id, method in dict.fromkeys((row['session_id'], row['method']) for row in rows):
+        if session_id is None:
+            continue
+        cursor.execute('SELECT 1 FROM stats_sessions WHERE session_id = ? LIMIT 1', (session_id,))
+        seen_before = cursor.fetchone() is not None
+        
+        cursor.execute('INSERT OR IGNORE INTO stats_sessions (session_id, method) VALUES (?, ?)',
+                       (session_id, method))
+        if cursor.rowcount:
+            cursor.execute('UPDATE method_stats SET unique_sessions = unique_sessions + 1 WHERE method = ?',
+                           (method,))
+        if not seen_before:
+            cursor.execute('''
+                INSERT INTO stats_counters (name, value) VALUES ('total_sessions', 1)
+                ON CONFLICT(name) DO UPDATE SET value = value + 1
+            ''')
+
+def _update_feedback_stats(cursor, rows):
+    """Fold a batch of feedback rows into the summary tables."""
+    cursor.executemany('''
+        INSERT INTO feedback_stats 
+        (method, feedback_count, ease_sum, ease_count, speed_sum, speed_count,
+         security_sum, security_count, would_use_count)
+        VALUES (:method, 1,
+                COALESCE(:ease_of_use, 0), :ease_of_use IS NOT NULL,
+                COALESCE(:speed_rating, 0), :speed_rating IS NOT NULL,
+                COALESCE(:security_feeling, 0), :security_feeling IS NOT NULL,
+                CASE WHEN :would_use_again = 1 THEN 1 ELSE 0 END)
+        ON CONFLICT(method) DO UPDATE SET
+            feedback_count = feedback_count + 1,
+            ease_sum = ease_sum + excluded.ease_sum,
+            ease_count = ease_count + excluded.ease_count,
+            speed_sum = speed_sum + excluded.speed_sum,
+            speed_count = speed_count + excluded.speed_count,
+            security_sum = security_sum + excluded.security_sum,
+            security_count = security_count + excluded.security_count,
+            would_use_count = would_use_count + excluded.would_use_count
+    ''', rows)
+
+def _update_latency_stats(cursor, rows):
+    """Fold a batch of auth_attempts durations into the latency sketches."""
+    buckets = {}
+    extremes = {}
+    for row in rows:
+        key = (row['method'], 1 if row['success'] else 0)
+        bucket_key = key + (sketch.bucket_index(row['duration_ms']),)
+        buckets[bucket_key] = buckets.get(bucket_key, 0) + 1
+        count, max_ms = extremes.get(key, (0, row['duration_ms']))
+        extremes[key] = (count + 1, max(max_ms, row['duration_ms']))
+    
+    cursor.executemany('''
+        INSERT INTO latency_buckets (method, success, bucket, count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(method, success, bucket) DO UPDATE SET count = count + excluded.count
+    ''', [key + (count,) for key, count in buckets.items()])
+    
+    cursor.executemany('''
+        INSERT INTO latency_stats (method, success, count, max_ms)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(method, success) DO UPDATE SET
+            count = count + excluded.count,
+            max_ms = MAX(max_ms, excluded.max_ms)
+    ''', [key + value for key, value in extremes.items()])
+
+def rebuild_latency_sketches(cursor, table=None):
+    """Recompute latency_buckets and latency_stats from the attempts in `table`:
+    auth_attempt_rows by default, or the raw auth_attempts table on schemas
+    from before the lookups (migration 4 runs against those)."""
+    if table is None:
+        has_rows = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'auth_attempt_rows'"
+        ).fetchone()
+        table = 'auth_attempt_rows' if has_rows else 'auth_attempts'
+    cursor.connection.create_function('latency_bucket', 1, sketch.bucket_index, deterministic=True)
+    cursor.execute('DELETE FROM latency_buckets')
+    cursor.execute('DELETE FROM latency_stats')
+    cursor.execute(f'''
+        INSERT INTO latency_buckets (method, success, bucket, count)
+        SELECT method, CASE WHEN success = 1 THEN 1 ELSE 0 END, latency_bucket(duration_ms), COUNT(*)
+        FROM {table}
+        WHERE method IS NOT NULL
+        GROUP BY 1, 2, 3
+    ''')
+    cursor.execute(f'''
+        INSERT INTO latency_stats (method, success, count, max_ms)
+        SELECT method, CASE WHEN success = 1 THEN 1 ELSE 0 END, COUNT(*), MAX(duration_ms)
+        FROM {table}
+        WHERE method IS NOT NULL
+        GROUP BY 1, 2
+    ''')
+
+writer.add_prepare_hook(_INSERT_AUTH_ATTEMPT, _resolve_attempt_lookups)
+writer.add_flush_hook(_INSERT_AUTH_ATTEMPT, _update_attempt_stats)
+writer.add_flush_hook(_INSERT_AUTH_ATTEMPT, _update_latency_stats)
+writer.add_commit_hook(lookups.commit_pending)
+writer.add_commit_hook(bump_generation)
+writer.add_rollback_hook(lookups.discard_pending)
+writer.add_flush_hook(_INSERT_FEEDBACK, _update_feedback_stats)
+# Only committed rows are published, so live counts never include rolled-back ones
+writer.add_row_commit_hook(_INSERT_AUTH_ATTEMPT, _publish_attempts)
+writer.add_row_commit_hook(_INSERT_FEEDBACK, _publish_feedback)
+
+def rebuild_analytics(db=None):
+    """Recompute the analytics summary tables from the raw telemetry tables
+    (of `db` when given, e.g. an archived study)."""
+    db = db or get_db()
     cursor = db.cursor()
     
+    cursor.execute('DELETE FROM method_stats')
+    cursor.execute('DELETE FROM error_stats')
+    cursor.execute('DELETE FROM feedback_stats')
+    cursor.execute('DELETE FROM stats_sessions')
+    
+    cursor.execute('''
+        INSERT INTO method_stats 
+        (method, attempts, successes, duration_sum, success_duration_sum,
+         failure_duration_sum)
+        SELECT 
+            method,
+            COUNT(*),
+            SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END),
+            TOTAL(duration_ms),
+            TOTAL(CASE WHEN success = 1 THEN duration_ms END),
+            TOTAL(CASE WHEN success = 0 THEN duration_ms END)
+        FROM auth_attempt_rows
+        GROUP BY method
+    ''')
+    
     cursor.execute('''
-        INSERT INTO feedback 
-        (session_id, method, ease_of_use, speed_rating, security_feeling, 
-         would_use_again, comments, timestamp)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (session_id, method, ease_of_use, speed_rating, security_feeling,
-          would_use_again, comments, datetime.now()))
+        INSERT INTO error_stats (method, error_code, count)
+        SELECT a.method, c.value, COUNT(*)
+        FROM auth_attempt_rows a
+        JOIN error_codes c ON c.id = a.error_code_id
+        WHERE a.success = 0
+        GROUP BY a.method, a.error_code_id
+    ''')
+    
+    cursor.execute('''
+        INSERT INTO feedback_stats 
+        (method, feedback_count, ease_sum, ease_count, speed_sum, speed_count,
+         security_sum, security_count, would_use_count)
+        SELECT 
+            method,
+            COUNT(*),
+            TOTAL(ease_of_use), COUNT(ease_of_use),
+            TOTAL(speed_rating), COUNT(speed_rating),
+            TOTAL(security_feeling), COUNT(security_feeling),
+            SUM(CASE WHEN would_use_again = 1 THEN 1 ELSE 0 END)
+        FROM feedback
+        GROUP BY method
+    ''')
+    
+    cursor.execute('''
+        INSERT INTO stats_sessions (session_id, method)
+        SELECT DISTINCT session_id, method
+        FROM auth_attempt_rows
+        WHERE session_id IS NOT NULL AND method IS NOT NULL
+    ''')
+    
+    rebuild_latency_sketches(cursor)
+    
+    # Rows removed by the retention job only survive in the rollups
+    fold_rollups(cursor)
+    
+    cursor.execute('''
+        UPDATE method_stats SET unique_sessions = (
+            SELECT COUNT(*) FROM stats_sessions s WHERE s.method = method_stats.method
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO stats_counters (name, value)
+        SELECT 'total_sessions', COUNT(DISTINCT session_id) FROM stats_sessions
+    ''')
     
     db.commit()
-    db.close()
+    bump_generation()
+
+def flush_telemetry():
+    """Wait until all queued telemetry rows have been written."""
+    writer.flush()
+
+def get_writer_stats():
+    """Get queue depth and flush latency counters for the telemetry writer."""
+    return writer.stats()
 
 def get_session_attempts(session_id):
     """Get all auth attempts for a session."""
@@ -63,45 +333,106 @@ def get_session_attempts(session_id):
     ''', (session_id,))
     
     attempts = [dict(row) for row in cursor.fetchall()]
-    db.close()
     return attempts
 
-def get_all_sessions():
-    """Get all research sessions with stats."""
-    db = get_db()
-    cursor = db.cursor()
+def _parse_session_cursor(cursor_token):
+    """Split an 'id:started_at' cursor into (started_at, id), or None if malformed."""
+    try:
+        session_pk, started_at = cursor_token.split(':', 1)
+        return started_at, int(session_pk)
+    except (AttributeError, ValueError):
+        return None
+
+def get_all_sessions(limit=None, cursor=None, status=None, first_method=None):
+    """Get one page of research sessions with stats, newest first.
+    Returns (sessions, next_cursor); next_cursor is None on the last page."""
+    db = get_read_db()
+    db_cursor = db.cursor()
     
-    cursor.execute('''
+    limit = limit or config.SESSIONS_PAGE_SIZE
+    conditions = []
+    params = []
+    
+    position = _parse_session_cursor(cursor) if cursor else None
+    if position:
+        conditions.append('(started_at < ? OR (started_at = ? AND id < ?))')
+        params.extend([position[0], position[0], position[1]])
+    if status:
+        conditions.append('status = ?')
+        params.append(status)
+    if first_method:
+        conditions.append('first_method = ?')
+        params.append(first_method)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    # Page first, then count per session with correlated subqueries so
+    # attempts and feedback rows never multiply each other; compacted
+    # attempts are counted from their per-session rollups
+    db_cursor.execute(f'''
+        WITH page AS (
+            SELECT * FROM research_sessions
+            {where}
+            ORDER BY started_at DESC, id DESC
+            LIMIT ?
+        )
         SELECT 
-            rs.*,
-            COUNT(DISTINCT aa.id) as total_attempts,
-            SUM(CASE WHEN aa.success = 1 THEN 1 ELSE 0 END) as successful_attempts,
-            COUNT(DISTINCT f.id) as feedback_count
-        FROM research_sessions rs
-        LEFT JOIN auth_attempts aa ON rs.session_id = aa.session_id
-        LEFT JOIN feedback f ON rs.session_id = f.session_id
-        GROUP BY rs.id
-        ORDER BY rs.started_at DESC
-    ''')
+            page.*,
+            (SELECT COUNT(*) FROM auth_attempt_rows aa
+             WHERE aa.session_id = page.session_id)
+            + (SELECT COALESCE(SUM(r.attempts), 0) FROM attempt_session_rollups r
+               WHERE r.session_id = page.session_id) as total_attempts,
+            (SELECT COUNT(*) FROM auth_attempt_rows aa
+             WHERE aa.session_id = page.session_id AND aa.success = 1)
+            + (SELECT COALESCE(SUM(r.successes), 0) FROM attempt_session_rollups r
+               WHERE r.session_id = page.session_id) as successful_attempts,
+            (SELECT COUNT(*) FROM feedback f
+             WHERE f.session_id = page.session_id) as feedback_count
+        FROM page
+        ORDER BY started_at DESC, id DESC
+    ''', params + [limit + 1])
     
-    sessions = [dict(row) for row in cursor.fetchall()]
-    db.close()
-    return sessions
+    sessions = [dict(row) for row in db_cursor.fetchall()]
+    
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        last = sessions[-1]
+        next_cursor = f"{last['id']}:{last['started_at']}"
+    return sessions, next_cursor
+
+def get_data_version():
+    """Return a tuple that changes whenever the dashboard data may have changed:
+    the newest row ids of the research tables and the reset generation. Unlike
+    the in-process cache generation, every worker reads the same values."""
+    return tuple(get_read_db().execute('''
+        SELECT (SELECT MAX(id) FROM research_sessions),
+               (SELECT MAX(id) FROM auth_attempt_rows),
+               (SELECT MAX(id) FROM education_views),
+               (SELECT MAX(id) FROM feedback),
+               (SELECT value FROM stats_counters WHERE name = 'reset_generation')
+    ''').fetchone())
 
 def get_analytics():
-    """Get comprehensive analytics for admin dashboard."""
-    db = get_db()
+    """Get comprehensive analytics for admin dashboard (from the read-only
+    analytics connection; snapshot_time is None unless it reads a snapshot)."""
+    db = get_read_db()
     cursor = db.cursor()
     
+    # One read transaction, so every panel sees the same committed state
+    if db.in_transaction:
+        db.rollback()
+    cursor.execute('BEGIN')
+    
     # Overall stats
     cursor.execute('''
         SELECT 
-            COUNT(DISTINCT session_id) as total_sessions,
-            COUNT(*) as total_attempts,
-            SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successful_attempts,
-            AVG(CASE WHEN success = 1 THEN duration_ms END) as avg_success_duration,
-            AVG(CASE WHEN success = 0 THEN duration_ms END) as avg_failure_duration
-        FROM auth_attempts
+            COALESCE((SELECT value FROM stats_counters WHERE name = 'total_sessions'), 0) as total_sessions,
+            COALESCE(SUM(attempts), 0) as total_attempts,
+            COALESCE(SUM(successes), 0) as successful_attempts,
+            SUM(success_duration_sum) / NULLIF(SUM(successes), 0) as avg_success_duration,
+            SUM(failure_duration_sum) / NULLIF(SUM(attempts - successes), 0) as avg_failure_duration
+        FROM method_stats
     ''')
     overall = dict(cursor.fetchone())
     
@@ -109,13 +440,14 @@ def get_analytics():
     cursor.execute('''
         SELECT 
             method,
-            COUNT(*) as attempts,
-            SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) as successes,
-            AVG(duration_ms) as avg_duration,
-            AVG(CASE WHEN success = 1 THEN duration_ms END) as avg_success_duration,
-            COUNT(DISTINCT session_id) as unique_sessions
-        FROM auth_attempts
-        GROUP BY method
+            attempts,
+            successes,
+            duration_sum / attempts as avg_duration,
+            success_duration_sum / NULLIF(successes, 0) as avg_success_duration,
+            unique_sessions
+        FROM method_stats
+        WHERE attempts > 0
+        ORDER BY method
     ''')
     method_stats = [dict(row) for row in cursor.fetchall()]
     
@@ -123,29 +455,48 @@ def get_analytics():
     cursor.execute('''
         SELECT 
             method,
-            AVG(ease_of_use) as avg_ease,
-            AVG(speed_rating) as avg_speed,
-            AVG(security_feeling) as avg_security,
-            SUM(CASE WHEN would_use_again = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as would_use_percent,
-            COUNT(*) as feedback_count
-        FROM feedback
-        GROUP BY method
+            ease_sum / NULLIF(ease_count, 0) as avg_ease,
+            speed_sum / NULLIF(speed_count, 0) as avg_speed,
+            security_sum / NULLIF(security_count, 0) as avg_security,
+            would_use_count * 100.0 / feedback_count as would_use_percent,
+            feedback_count,
+            ease_count,
+            speed_count,
+            security_count
+        FROM feedback_stats
+        WHERE feedback_count > 0
+        ORDER BY method
     ''')
     feedback_stats = [dict(row) for row in cursor.fetchall()]
     
     # Error analysis
     cursor.execute('''
-        SELECT 
-            method,
-            error_code,
-            COUNT(*) as count
-        FROM auth_attempts
-        WHERE success = 0 AND error_code IS NOT NULL
-        GROUP BY method, error_code
-        ORDER BY count DESC
+        SELECT method, error_code, count
+        FROM error_stats
+        WHERE count > 0
+        ORDER BY count DESC, method, error_code
     ''')
     errors = [dict(row) for row in cursor.fetchall()]
     
+    # Latency percentiles and histogram per method and outcome
+    cursor.execute('''
+        SELECT method, success, count, max_ms
+        FROM latency_stats
+        WHERE count > 0
+        ORDER BY method, success DESC
+    ''')
+    latency = [dict(row) for row in cursor.fetchall()]
+    
+    cursor.execute('SELECT method, success, bucket, count FROM latency_buckets')
+    sketches = {}
+    for row in cursor.fetchall():
+        sketches.setdefault((row['method'], row['success']), {})[row['bucket']] = row['count']
+    for entry in latency:
+        entry_sketch = sketches.get((entry['method'], entry['success']), {})
+        entry['p50'], entry['p90'], entry['p99'] = sketch.quantiles(entry_sketch, (0.5, 0.9, 0.99),
+                                                                     entry['max_ms'])
+        entry['histogram'] = sketch.histogram(entry_sketch)
+    
     # Recent activity
     cursor.execute('''
         SELECT 
@@ -157,13 +508,14 @@ def get_analytics():
         LIMIT 50
     ''')
     recent = [dict(row) for row in cursor.fetchall()]
-    
-    db.close()
+    db.commit()
     
     return {
         'overall': overall,
         'by_method': method_stats,
         'feedback': feedback_stats,
         'errors': errors,
-        'recent_activity': recent
+        'latency': latency,
+        'recent_activity': recent,
+        'snapshot_time': snapshot_time()
     }
\ No newline at end of file
@@ -0,0 +1,71 @@
+from database import db as database_db
+import threading
+
+# Dictionary encoding for the repeated strings in auth_attempts: each lookup
+# table maps a value to a small integer id. Error messages are interned up to
+# the first ': ', with any exception detail kept in auth_attempt_rows.error_detail.
+# Ids are resolved inside the telemetry writer's transaction and cached per
+# database file once that transaction commits; lookup rows are never deleted,
+# so a cached id stays valid.
+
+LOOKUP_TABLES = ('error_codes', 'error_messages', 'user_agents')
+MAX_CACHED_IDS = 4096
+
+_ids = {}
+_ids_lock = threading.Lock()
+# Ids resolved in a transaction that has not committed yet, per thread
+_local = threading.local()
+
+def split_error_message(message):
+    """Split `message` at the first ': ' into (prefix, detail), so only the
+    fixed prefix is interned; detail is None when there is no separator."""
+    if message is None:
+        return None, None
+    prefix, separator, detail = message.partition(': ')
+    return prefix, detail if separator else None
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = {}
+    return _local.pending
+
+def resolve_id(cursor, table, value):
+    """Return the id of `value` in lookup `table`, adding it in the cursor's
+    transaction if needed (None stays None). Nothing is committed here; call
+    commit_pending() after the transaction commits so the id gets cached."""
+    if value is None:
+        return None
+    if table not in LOOKUP_TABLES:
+        raise ValueError(f"Unknown lookup table '{table}'")
+    
+    key = (database_db.DATABASE_PATH, table, value)
+    value_id = _ids.get(key) or _pending().get(key)
+    if value_id is not None:
+        return value_id
+    
+    row = cursor.execute(f'SELECT id FROM {table} WHERE value = ?', (value,)).fetchone()
+    if row is None:
+        # The no-op update makes RETURNING report the id when another
+        # worker inserted the same value first
+        row = cursor.execute(f'''
+            INSERT INTO {table} (value) VALUES (?)
+            ON CONFLICT(value) DO UPDATE SET value = excluded.value
+            RETURNING id
+        ''', (value,)).fetchone()
+    _pending()[key] = row[0]
+    return row[0]
+
+def commit_pending():
+    """Cache the ids resolved by this thread's transaction, which has committed."""
+    pending = _pending()
+    with _ids_lock:
+        # Values come from request headers, so bound the cache
+        if len(_ids) + len(pending) > MAX_CACHED_IDS:
+            _ids.clear()
+        _ids.update(pending)
+    pending.clear()
+
+def discard_pending():
+    """Forget the ids resolved by this thread's transaction, which rolled back
+    (its new rows are gone and their ids may be reused)."""
+    _pending().clear()
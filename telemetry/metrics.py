@@ -0,0 +1,262 @@
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context, request
+import sqlite3
+import threading
+import time
+import config
+
+# In-process request metrics rendered in the Prometheus text format.
+# Each worker process keeps its own counters; scrape every worker (or sum
+# them) when running more than one.
+
+# Histogram upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, values)} {total}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class Histogram:
+    """Cumulative-bucket histogram of observations in seconds."""
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def observe(self, seconds, *label_values):
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            entry[1] += 1
+            entry[2] += seconds
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for values, (counts, total, seconds) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = _format_labels(self.labels, values, [('le', bound)])
+                    lines.append(f'{self.name}_bucket{labels} {cumulative}')
+                labels = _format_labels(self.labels, values, [('le', '+Inf')])
+                lines.append(f'{self.name}_bucket{labels} {total}')
+                labels = _format_labels(self.labels, values)
+                lines.append(f'{self.name}_sum{labels} {seconds}')
+                lines.append(f'{self.name}_count{labels} {total}')
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests by route, method and status.',
+                   ('route', 'method', 'status'))
+REQUEST_SECONDS = Histogram('http_request_duration_seconds',
+                            'Time to produce a response (excludes streamed bodies).', ('route',))
+PHASE_SECONDS = Histogram('request_phase_seconds',
+                          'Time spent per request in each phase (db, hash, signature).',
+                          ('route', 'phase'))
+DB_QUERY_SECONDS = Histogram('db_query_duration_seconds',
+                             'Time spent in individual SQLite calls.', ('operation',))
+HASH_SECONDS = Histogram('password_hash_duration_seconds',
+                         'Password hash and verification time, including queueing.')
+SIGNATURE_SECONDS = Histogram('signature_verification_duration_seconds',
+                              'DID signature verification time, including recovery.')
+
+_PHASE_HISTOGRAMS = {'db': DB_QUERY_SECONDS, 'hash': HASH_SECONDS, 'signature': SIGNATURE_SECONDS}
+
+def record_phase(phase, seconds, operation=None):
+    """Add time to the current request's `phase` total and the phase histogram."""
+    if phase == 'db':
+        DB_QUERY_SECONDS.observe(seconds, operation or 'execute')
+    else:
+        _PHASE_HISTOGRAMS[phase].observe(seconds)
+    if has_app_context():
+        phases = g.setdefault('metric_phases', {})
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+@contextmanager
+def timed(phase):
+    """Time the enclosed block as `phase` (see record_phase)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, time.perf_counter() - start)
+
+def timed_call(phase):
+    """Decorator form of timed()."""
+    def decorate(fn):
+        # Inlined rather than `with timed(phase)`: the generator context manager
+        # costs more than a cached call it wraps (see verify_signature)
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_phase(phase, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def request_phase_ms():
+    """Return the current request's phase totals in milliseconds ({} outside a request)."""
+    if not has_app_context():
+        return {}
+    return {phase: round(seconds * 1000, 3)
+            for phase, seconds in g.get('metric_phases', {}).items()}
+
+# -----------------------------------------------------------------------------
+# SQLite instrumentation
+# -----------------------------------------------------------------------------
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that records execute and fetch time as the 'db' phase."""
+
+    def execute(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            record_phase('db', time.perf_counter() - start, 'execute')
+
+    def executemany(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            record_phase('db', time.perf_counter() - start, 'executemany')
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            record_phase('db', time.perf_counter() - start, 'fetch')
+
+    def fetchmany(self, *args):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(*args)
+        finally:
+            record_phase('db', time.perf_counter() - start, 'fetch')
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            record_phase('db', time.perf_counter() - start, 'fetch')
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (and shortcut execute calls) are timed."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def executemany(self, *args):
+        return self.cursor().executemany(*args)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            record_phase('db', time.perf_counter() - start, 'commit')
+
+# -----------------------------------------------------------------------------
+# Flask integration
+# -----------------------------------------------------------------------------
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def _start_request_timer():
+    g.metric_start = time.perf_counter()
+    g.metric_phases = {}
+
+def _observe_request(response):
+    start = g.pop('metric_start', None)
+    if start is None:
+        return response
+    route = _route_label()
+    REQUESTS.inc(route, request.method, str(response.status_code))
+    REQUEST_SECONDS.observe(time.perf_counter() - start, route)
+    for phase, seconds in g.get('metric_phases', {}).items():
+        PHASE_SECONDS.observe(seconds, route, phase)
+    return response
+
+def init_metrics(app):
+    """Time every request of `app` when config.METRICS_ENABLED is set."""
+    if config.METRICS_ENABLED:
+        app.before_request(_start_request_timer)
+        app.after_request(_observe_request)
+
+def render_metrics(extra_gauges=()):
+    """Return every registered metric, plus (name, description, value) gauges, as text."""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        lines.extend(metric.render())
+    for name, description, value in extra_gauges:
+        lines.extend([f'# HELP {name} {description}', f'# TYPE {name} gauge', f'{name} {value}'])
+    return '\n'.join(lines) + '\n'
+
+def reset_metrics():
+    """Zero every registered metric."""
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        metric.reset()
@@ -0,0 +1,182 @@
+from database.db import get_db
+from telemetry import sketch
+from datetime import date, timedelta
+import config
+
+# Retention for the raw telemetry tables. Rows older than the retention
+# window are folded into daily per-method rollups and deleted, one bounded
+# batch per transaction so participant writes never wait long. The summary
+# tables already count every row, so the dashboard does not change;
+# rebuild_analytics() adds the rollups back in with fold_rollups().
+
+# Only rows the app writes are compacted; anything else is left raw
+_OLD_ATTEMPTS = '''
+    timestamp < :cutoff AND method IS NOT NULL AND success IN (0, 1)
+    AND duration_ms IS NOT NULL
+'''
+_OLD_EDUCATION_VIEWS = 'timestamp < :cutoff AND method IS NOT NULL'
+
+def _next_batch(cursor, table, condition, params):
+    """Return the highest id in the next batch of `table` rows matching `condition`."""
+    return cursor.execute(f'''
+        SELECT MAX(id) FROM (
+            SELECT id FROM {table}
+            WHERE id > :after AND {condition}
+            ORDER BY id
+            LIMIT :batch_size
+        )
+    ''', params).fetchone()[0]
+
+def _compact_attempts(cursor, params):
+    where = f'id > :after AND id <= :last_id AND {_OLD_ATTEMPTS}'
+    cursor.execute(f'''
+        INSERT INTO attempt_rollups (day, method, success, attempts, duration_sum, max_ms)
+        SELECT date(timestamp), method, success, COUNT(*), TOTAL(duration_ms), MAX(duration_ms)
+        FROM auth_attempt_rows
+        WHERE {where}
+        GROUP BY 1, 2, 3
+        ON CONFLICT(day, method, success) DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            duration_sum = duration_sum + excluded.duration_sum,
+            max_ms = MAX(max_ms, excluded.max_ms)
+    ''', params)
+    cursor.execute(f'''
+        INSERT INTO attempt_latency_rollups (day, method, success, bucket, count)
+        SELECT date(timestamp), method, success, latency_bucket(duration_ms), COUNT(*)
+        FROM auth_attempt_rows
+        WHERE {where}
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT(day, method, success, bucket) DO UPDATE SET count = count + excluded.count
+    ''', params)
+    cursor.execute(f'''
+        INSERT INTO attempt_error_rollups (day, method, error_code_id, count)
+        SELECT date(timestamp), method, error_code_id, COUNT(*)
+        FROM auth_attempt_rows
+        WHERE {where} AND success = 0 AND error_code_id IS NOT NULL
+        GROUP BY 1, 2, 3
+        ON CONFLICT(day, method, error_code_id) DO UPDATE SET count = count + excluded.count
+    ''', params)
+    cursor.execute(f'''
+        INSERT INTO attempt_session_rollups (session_id, method, attempts, successes)
+        SELECT session_id, method, COUNT(*), SUM(success)
+        FROM auth_attempt_rows
+        WHERE {where} AND session_id IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT(session_id, method) DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            successes = successes + excluded.successes
+    ''', params)
+    cursor.execute(f'DELETE FROM auth_attempt_rows WHERE {where}', params)
+    return cursor.rowcount
+
+def _compact_education_views(cursor, params):
+    where = f'id > :after AND id <= :last_id AND {_OLD_EDUCATION_VIEWS}'
+    cursor.execute(f'''
+        INSERT INTO education_view_rollups (day, method, views, duration_sum)
+        SELECT date(timestamp), method, COUNT(*), TOTAL(duration_seconds)
+        FROM education_views
+        WHERE {where}
+        GROUP BY 1, 2
+        ON CONFLICT(day, method) DO UPDATE SET
+            views = views + excluded.views,
+            duration_sum = duration_sum + excluded.duration_sum
+    ''', params)
+    cursor.execute(f'DELETE FROM education_views WHERE {where}', params)
+    return cursor.rowcount
+
+_COMPACTIONS = [
+    ('auth_attempt_rows', _OLD_ATTEMPTS, _compact_attempts),
+    ('education_views', _OLD_EDUCATION_VIEWS, _compact_education_views),
+]
+
+def compact_telemetry(days=None, batch_size=None, today=None):
+    """Roll up and delete raw telemetry older than `days` whole days.
+    Returns the number of rows removed per table."""
+    days = config.RETENTION_DAYS if days is None else days
+    if days is None:
+        raise ValueError('No retention window: pass days or set config.RETENTION_DAYS')
+    batch_size = batch_size or config.RETENTION_BATCH_SIZE
+    # Timestamps are stored as local 'YYYY-MM-DD HH:MM:SS', so this compares as text
+    cutoff = ((today or date.today()) - timedelta(days=days)).isoformat()
+    
+    db = get_db()
+    if db.in_transaction:
+        db.commit()
+    db.create_function('latency_bucket', 1, sketch.bucket_index, deterministic=True)
+    cursor = db.cursor()
+    
+    removed = {}
+    for table, condition, compact in _COMPACTIONS:
+        removed[table] = 0
+        params = {'cutoff': cutoff, 'after': 0, 'batch_size': batch_size}
+        while True:
+            # Each batch is its own short write transaction
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                params['last_id'] = _next_batch(cursor, table, condition, params)
+                if params['last_id'] is not None:
+                    removed[table] += compact(cursor, params)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            if params['last_id'] is None:
+                break
+            params['after'] = params['last_id']
+    return removed
+
+def fold_rollups(cursor):
+    """Add the rollups of compacted rows to freshly rebuilt summary tables."""
+    cursor.execute('''
+        INSERT INTO method_stats
+        (method, attempts, successes, duration_sum, success_duration_sum, failure_duration_sum)
+        SELECT method, SUM(attempts),
+               SUM(CASE WHEN success = 1 THEN attempts ELSE 0 END),
+               TOTAL(duration_sum),
+               TOTAL(CASE WHEN success = 1 THEN duration_sum END),
+               TOTAL(CASE WHEN success = 0 THEN duration_sum END)
+        FROM attempt_rollups
+        WHERE true
+        GROUP BY method
+        ON CONFLICT(method) DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            successes = successes + excluded.successes,
+            duration_sum = duration_sum + excluded.duration_sum,
+            success_duration_sum = success_duration_sum + excluded.success_duration_sum,
+            failure_duration_sum = failure_duration_sum + excluded.failure_duration_sum
+    ''')
+    cursor.execute('''
+        INSERT INTO error_stats (method, error_code, count)
+        SELECT r.method, c.value, SUM(r.count)
+        FROM attempt_error_rollups r
+        JOIN error_codes c ON c.id = r.error_code_id
+        WHERE true
+        GROUP BY r.method, r.error_code_id
+        ON CONFLICT(method, error_code) DO UPDATE SET count = count + excluded.count
+    ''')
+    fold_latency_rollups(cursor)
+    cursor.execute('''
+        INSERT OR IGNORE INTO stats_sessions (session_id, method)
+        SELECT session_id, method FROM attempt_session_rollups
+    ''')
+
+def fold_latency_rollups(cursor):
+    """Add the rollups of compacted rows to freshly rebuilt latency sketches."""
+    cursor.execute('''
+        INSERT INTO latency_buckets (method, success, bucket, count)
+        SELECT method, success, bucket, SUM(count)
+        FROM attempt_latency_rollups
+        WHERE true
+        GROUP BY 1, 2, 3
+        ON CONFLICT(method, success, bucket) DO UPDATE SET count = count + excluded.count
+    ''')
+    cursor.execute('''
+        INSERT INTO latency_stats (method, success, count, max_ms)
+        SELECT method, success, SUM(attempts), MAX(max_ms)
+        FROM attempt_rollups
+        WHERE true
+        GROUP BY 1, 2
+        ON CONFLICT(method, success) DO UPDATE SET
+            count = count + excluded.count,
+            max_ms = MAX(max_ms, excluded.max_ms)
+    ''')
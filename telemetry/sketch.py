@@ -0,0 +1,80 @@
+import math
+
+# Mergeable latency sketch with log-spaced buckets (DDSketch style).
+# A duration of v ms falls in bucket ceil(log(v) / log(gamma)); every value
+# in a bucket is within RELATIVE_ACCURACY of the bucket's representative
+# value, so quantiles read from bucket counts carry that relative error.
+# Sketches merge by adding counts per bucket, so they are stored as
+# (bucket, count) rows and updated with upserts.
+
+RELATIVE_ACCURACY = 0.02
+MIN_VALUE_MS = 0.01
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+_MIN_BUCKET = math.ceil(math.log(MIN_VALUE_MS) / _LOG_GAMMA)
+
+# Coarse bins for the dashboard histogram (upper edges in milliseconds)
+HISTOGRAM_EDGES_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+def bucket_index(value_ms):
+    """Return the bucket holding a duration in milliseconds."""
+    if value_ms is None or value_ms <= MIN_VALUE_MS:
+        return _MIN_BUCKET
+    return math.ceil(math.log(value_ms) / _LOG_GAMMA)
+
+def bucket_value(index):
+    """Return the representative duration of a bucket."""
+    return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+def merge(*sketches):
+    """Add several {bucket: count} sketches together."""
+    merged = {}
+    for sketch in sketches:
+        for index, count in sketch.items():
+            merged[index] = merged.get(index, 0) + count
+    return merged
+
+def quantiles(sketch, fractions, max_value=None):
+    """Return the nearest-rank value at each fraction (0..1) of a {bucket: count} sketch.
+    A bucket's representative value can lie above the largest duration recorded
+    in it, so results are capped at `max_value` when it is given."""
+    total = sum(sketch.values())
+    if not total:
+        return [None for _ in fractions]
+
+    ordered = sorted(sketch.items())
+    results = []
+    for fraction in fractions:
+        rank = max(1, math.ceil(fraction * total))
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            if seen >= rank:
+                value = bucket_value(index)
+                results.append(value if max_value is None else min(value, max_value))
+                break
+    return results
+
+def histogram(sketch):
+    """Fold a sketch into HISTOGRAM_EDGES_MS bins.
+    Returns [{'label', 'count', 'percent'}] with an open-ended last bin."""
+    counts = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+    for index, count in sketch.items():
+        value = bucket_value(index)
+        position = next((i for i, edge in enumerate(HISTOGRAM_EDGES_MS) if value <= edge),
+                        len(HISTOGRAM_EDGES_MS))
+        counts[position] += count
+
+    total = sum(counts) or 1
+    bins = []
+    lower = 0
+    for position, count in enumerate(counts):
+        if position < len(HISTOGRAM_EDGES_MS):
+            upper = HISTOGRAM_EDGES_MS[position]
+            label = f'{lower}-{upper}ms'
+            lower = upper
+        else:
+            label = f'>{lower}ms'
+        bins.append({'label': label, 'count': count, 'percent': count * 100.0 / total})
+    return bins
@@ -0,0 +1,211 @@
+from database.db import get_db
+from itertools import groupby
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import config
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class TelemetryWriter:
+    """Background writer that batches telemetry INSERTs into one transaction.
+
+    Rows are queued by the request thread and written by a dedicated thread
+    with executemany every `batch_size` rows or `flush_interval_ms`,
+    whichever comes first. A full queue blocks the caller (backpressure); if
+    it stays full past `enqueue_timeout` the row is written synchronously.
+    """
+
+    def __init__(self, batch_size=100, flush_interval_ms=200, max_queue=10000,
+                 enqueue_timeout=2.0, enabled=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.enqueue_timeout = enqueue_timeout
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._prepare_hooks = {}
+        self._hooks = {}
+        self._commit_hooks = []
+        self._row_commit_hooks = {}
+        self._rollback_hooks = []
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'failed': 0,
+            'sync_fallbacks': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    def submit(self, sql, params):
+        """Queue one row for `sql`, or write it now if the writer is disabled."""
+        if not self.enabled:
+            self._write([(sql, params)])
+            return
+
+        self._ensure_started()
+        try:
+            self._queue.put((sql, params), timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._bump('sync_fallbacks')
+            self._write([(sql, params)])
+            return
+        self._bump('enqueued')
+
+    def add_prepare_hook(self, sql, hook):
+        """Call `hook(cursor, rows)` before rows for `sql` are inserted, in the same
+        transaction; it may fill in row values."""
+        self._prepare_hooks.setdefault(sql, []).append(hook)
+
+    def add_flush_hook(self, sql, hook):
+        """Call `hook(cursor, rows)` after rows for `sql` are inserted, in the same transaction."""
+        self._hooks.setdefault(sql, []).append(hook)
+
+    def add_commit_hook(self, hook):
+        """Call `hook()` after each batch has been committed."""
+        self._commit_hooks.append(hook)
+
+    def add_row_commit_hook(self, sql, hook):
+        """Call `hook(rows)` with the rows for `sql` once their batch has been committed."""
+        self._row_commit_hooks.setdefault(sql, []).append(hook)
+
+    def add_rollback_hook(self, hook):
+        """Call `hook()` after a failed batch has been rolled back."""
+        self._rollback_hooks.append(hook)
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Flush remaining rows and stop the writer thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def stats(self):
+        """Return a snapshot of the writer counters."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_flush_ms'] = (stats['total_flush_ms'] / stats['batches']
+                                 if stats['batches'] else 0.0)
+        return stats
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so restart in each worker process, and
+        # replace a thread that died rather than let the queue fill up
+        if self._running():
+            return
+        with self._start_lock:
+            if self._running():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='telemetry-writer',
+                                            daemon=True)
+            self._thread.start()
+
+    def _running(self):
+        return (self._thread is not None and self._pid == os.getpid()
+                and self._thread.is_alive())
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        """Write a batch in one transaction, grouping consecutive rows by statement."""
+        start = time.perf_counter()
+        db = None
+        written = []
+        try:
+            db = get_db()
+            cursor = db.cursor()
+            for sql, items in groupby(batch, key=lambda item: item[0]):
+                rows = [params for _, params in items]
+                written.append((sql, rows))
+                for hook in self._prepare_hooks.get(sql, ()):
+                    hook(cursor, rows)
+                cursor.executemany(sql, rows)
+                for hook in self._hooks.get(sql, ()):
+                    hook(cursor, rows)
+            db.commit()
+        except Exception:
+            if db is not None:
+                db.rollback()
+            self._bump('failed', len(batch))
+            logger.exception('Failed to write %d telemetry rows', len(batch))
+            for hook in self._rollback_hooks:
+                hook()
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = elapsed_ms
+            self._stats['total_flush_ms'] += elapsed_ms
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], elapsed_ms)
+
+        # The rows are already committed; a failing hook must not stop the writer
+        calls = [(hook, ()) for hook in self._commit_hooks]
+        calls += [(hook, (rows,)) for sql, rows in written
+                  for hook in self._row_commit_hooks.get(sql, ())]
+        for hook, args in calls:
+            try:
+                hook(*args)
+            except Exception:
+                logger.exception('Telemetry commit hook %r failed', hook)
+
+    def _bump(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+writer = TelemetryWriter(
+    batch_size=config.TELEMETRY_BATCH_SIZE,
+    flush_interval_ms=config.TELEMETRY_FLUSH_INTERVAL_MS,
+    max_queue=config.TELEMETRY_QUEUE_SIZE,
+    enqueue_timeout=config.TELEMETRY_ENQUEUE_TIMEOUT,
+    enabled=config.TELEMETRY_ASYNC,
+)
+atexit.register(writer.close)
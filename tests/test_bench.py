@@ -0,0 +1,33 @@
+import sqlite3
+from database.seed import parse_count
+from perf.bench import compare, format_size, run_benchmarks, seeded_database
+
+
+def test_size_round_trip():
+    assert [parse_count(text) for text in ('10k', '100K', '1m', '2500')] == [10000, 100000, 1000000, 2500]
+    assert [format_size(size) for size in (10000, 1000000, 2500)] == ['10k', '1m', '2500']
+
+
+def test_seeded_database_is_built_once(tmp_path):
+    path = seeded_database(400, str(tmp_path))
+    assert seeded_database(400, str(tmp_path)) == path
+
+    db = sqlite3.connect(path)
+    assert db.execute('SELECT COUNT(*) FROM auth_attempts').fetchone()[0] == 400
+    assert db.execute("SELECT value FROM stats_counters WHERE name = 'total_sessions'").fetchone()[0] == \
+        db.execute('SELECT COUNT(DISTINCT session_id) FROM auth_attempts').fetchone()[0]
+    db.close()
+
+
+def test_run_benchmarks_keys_results_by_size(tmp_path):
+    results = run_benchmarks([400], names=['get_analytics', 'verify_signature_cached'],
+                             repeat=1, data_dir=str(tmp_path))
+    assert set(results) == {'get_analytics@400', 'verify_signature_cached'}
+    assert results['get_analytics@400']['median_ms'] > 0
+
+
+def test_compare_flags_only_real_slowdowns():
+    baseline = {'results': {'a@10k': {'median_ms': 1.0}, 'b': {'median_ms': 0.001}}}
+    results = {'a@10k': {'min_ms': 2.0}, 'b': {'min_ms': 0.003}, 'new': {'min_ms': 5.0}}
+    assert [key for key, *_ in compare(results, baseline, threshold=0.5)] == ['a@10k']
+    assert compare(results, baseline, threshold=1.5) == []
@@ -0,0 +1,89 @@
+import sqlite3
+import time
+import pytest
+import config
+import app as app_module
+from app import create_app
+from database.models import clear_all_data
+from telemetry.cache import cached, clear_cache, get_generation
+from telemetry.logger import get_analytics, log_auth_attempt
+
+app = create_app()
+
+
+@pytest.fixture
+def steady_etag(monkeypatch):
+    """Keep the dashboard ETag's time window from rolling over mid-test."""
+    monkeypatch.setattr(config, 'DASHBOARD_CACHE_TTL_SECONDS', 3600)
+
+
+def admin_client():
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['is_admin'] = True
+    return client
+
+
+def test_telemetry_writes_invalidate_cached_analytics(db_path):
+    first = cached('analytics', get_analytics)
+    assert cached('analytics', get_analytics) is first
+
+    generation = get_generation()
+    log_auth_attempt('s1', None, 'DID', 1, time.time(), True)
+    assert get_generation() > generation
+
+    fresh = cached('analytics', get_analytics)
+    assert fresh is not first
+    assert fresh['overall']['total_attempts'] == 1
+
+
+def test_clear_all_data_invalidates_cache(db_path):
+    log_auth_attempt('s1', None, 'DID', 1, time.time(), True)
+    assert cached('analytics', get_analytics)['overall']['total_attempts'] == 1
+
+    clear_all_data()
+    assert cached('analytics', get_analytics)['overall']['total_attempts'] == 0
+
+
+def test_dashboard_answers_304_until_data_changes(db_path, steady_etag):
+    client = admin_client()
+    response = client.get('/admin')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    response = client.get('/admin', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    log_auth_attempt('s1', None, 'DID', 1, time.time(), True)
+    response = client.get('/admin', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_dashboard_304_skips_analytics_queries(db_path, steady_etag, monkeypatch):
+    client = admin_client()
+    etag = client.get('/admin').headers['ETag']
+
+    def no_analytics():
+        raise AssertionError('analytics queried for an unchanged dashboard')
+    monkeypatch.setattr(app_module, 'get_analytics', no_analytics)
+    monkeypatch.setattr(app_module, 'get_all_sessions', no_analytics)
+    clear_cache()  # as after the TTL, or in another worker
+    assert client.get('/admin', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_writes_by_another_worker_change_the_dashboard(db_path, steady_etag):
+    client = admin_client()
+    response = client.get('/admin')
+    etag = response.headers['ETag']
+
+    # Written outside this process's telemetry writer, so no cache is bumped
+    other = sqlite3.connect(db_path)
+    other.execute("INSERT INTO auth_attempts (session_id, method, success) VALUES ('s1', 'DID', 1)")
+    other.commit()
+    other.close()
+
+    response = client.get('/admin', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,132 @@
+import threading
+import time
+import pytest
+import config
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from auth import crypto
+from auth.crypto import get_user_by_wallet, verify_signature
+from database import models
+from database.db import close_thread_db
+from database.models import clear_all_data
+
+
+def sign(account, text):
+    return account.sign_message(encode_defunct(text=text)).signature.hex()
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    crypto._recover_address_cached.cache_clear()
+    yield
+    crypto._reset_recovery_pool()
+
+
+@pytest.fixture
+def inline_recovery(monkeypatch):
+    monkeypatch.setattr(config, 'SIGNATURE_WORKERS', 0)
+
+
+def test_verify_signature_outcomes(inline_recovery):
+    account = Account.create()
+    other = Account.create()
+    signature = sign(account, 'nonce-1')
+
+    assert verify_signature(account.address, 'nonce-1', signature) == (True, None, None)
+    assert verify_signature(account.address.lower(), 'nonce-1', signature)[0]
+    assert verify_signature(other.address, 'nonce-1', signature)[1] == 'ADDRESS_MISMATCH'
+    assert verify_signature(account.address, 'nonce-1', '0xdeadbeef')[1] == 'SIGNATURE_INVALID'
+
+
+def test_retried_signature_is_served_from_cache(inline_recovery):
+    account = Account.create()
+    signature = sign(account, 'nonce-2')
+
+    verify_signature(account.address, 'nonce-2', signature)
+    verify_signature(account.address, 'nonce-2', signature)
+    info = crypto._recover_address_cached.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
+
+
+def test_recovery_in_worker_process(monkeypatch):
+    monkeypatch.setattr(config, 'SIGNATURE_WORKERS', 1)
+    account = Account.create()
+
+    crypto.warm_up_signature_verification()
+    assert verify_signature(account.address, 'nonce-3', sign(account, 'nonce-3')) == (True, None, None)
+    assert verify_signature(account.address, 'nonce-3', '0x00')[1] == 'SIGNATURE_INVALID'
+
+
+@pytest.fixture
+def empty_wallet_cache():
+    crypto.clear_wallet_cache()
+    yield
+    crypto.clear_wallet_cache()
+
+
+def test_get_user_by_wallet_registers_once(db_path, empty_wallet_cache):
+    address = Account.create().address
+    user_id, is_new = get_user_by_wallet(address)
+    assert is_new
+    assert get_user_by_wallet(address.lower()) == (user_id, False)
+
+    crypto.clear_wallet_cache()
+    assert get_user_by_wallet(address) == (user_id, False)
+
+
+def test_cached_wallet_skips_database(db_path, empty_wallet_cache, monkeypatch):
+    address = Account.create().address
+    user_id, _ = get_user_by_wallet(address)
+
+    def no_database():
+        raise AssertionError('database used for a cached wallet')
+    monkeypatch.setattr(crypto, 'get_db', no_database)
+    assert get_user_by_wallet(address) == (user_id, False)
+
+
+def test_concurrent_first_logins_share_one_user(db_path, empty_wallet_cache):
+    address = Account.create().address
+    barrier = threading.Barrier(8)
+    results = []
+
+    def login():
+        barrier.wait()
+        results.append(get_user_by_wallet(address))
+        close_thread_db()
+
+    threads = [threading.Thread(target=login) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({user_id for user_id, _ in results}) == 1
+    assert sum(is_new for _, is_new in results) == 1
+
+
+def test_clear_all_data_drops_cached_wallets(db_path, empty_wallet_cache):
+    address = Account.create().address
+    old_id, _ = get_user_by_wallet(address)
+    clear_all_data()
+
+    new_id, is_new = get_user_by_wallet(address)
+    assert is_new
+    assert new_id != old_id
+
+
+def test_reset_by_another_worker_invalidates_cached_wallets(db_path, empty_wallet_cache, monkeypatch):
+    address = Account.create().address
+    old_id, _ = get_user_by_wallet(address)
+
+    # Another worker resets the database; this process never runs its hooks
+    monkeypatch.setattr(models, '_clear_hooks', [])
+    clear_all_data()
+    # Noticed at the next generation check
+    assert get_user_by_wallet(address) == (old_id, False)
+    clock = time.monotonic() + config.WALLET_GENERATION_CHECK_SECONDS
+    monkeypatch.setattr(time, 'monotonic', lambda: clock)
+
+    new_id, is_new = get_user_by_wallet(address)
+    assert is_new
+    assert new_id != old_id
+    assert get_user_by_wallet(address) == (new_id, False)
@@ -0,0 +1,300 @@
+import os
+import sqlite3
+import threading
+import time
+import pytest
+from flask import Flask
+from database import db as database_db
+from database.db import get_db, init_app
+from database.migrations import MIGRATIONS, get_schema_version, migrate, schema_is_current
+from database import models
+from telemetry.logger import get_analytics, log_auth_attempt, save_feedback
+import config
+
+
+def test_connection_pragmas(db_path):
+    db = get_db()
+    assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert db.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    assert db.execute('PRAGMA busy_timeout').fetchone()[0] > 0
+
+
+def test_thread_connection_is_reused(db_path):
+    assert get_db() is get_db()
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(get_db()))
+    thread.start()
+    thread.join()
+    assert other[0] is not get_db()
+
+
+def test_app_context_shares_pooled_connection(db_path):
+    app = Flask(__name__)
+    init_app(app)
+
+    with app.app_context():
+        first = get_db()
+        assert get_db() is first
+    assert first is not database_db._local.db
+
+    # Released to the pool on teardown and handed out again
+    with app.app_context():
+        assert get_db() is first
+
+
+def test_teardown_rolls_back_open_transaction(db_path):
+    app = Flask(__name__)
+    init_app(app)
+
+    with app.app_context():
+        db = get_db()
+        db.execute("INSERT INTO users (username) VALUES ('pending')")
+        assert db.in_transaction
+
+    assert not db.in_transaction
+    row = get_db().execute("SELECT id FROM users WHERE username = 'pending'").fetchone()
+    assert row is None
+
+
+def test_migrations_record_schema_version(db_path):
+    db = get_db()
+    assert get_schema_version(db) == MIGRATIONS[-1][0]
+    assert schema_is_current(db)
+    assert migrate(db) == []
+
+    indexes = {row['name'] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_auth_attempts_session' in indexes
+    assert 'idx_research_sessions_started' in indexes
+
+
+def test_migrations_upgrade_unversioned_database(tmp_path, monkeypatch):
+    path = str(tmp_path / 'legacy.db')
+    monkeypatch.setattr(database_db, 'DATABASE_PATH', path)
+    legacy = sqlite3.connect(path)
+    legacy.execute('CREATE TABLE research_sessions (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                   "session_id TEXT UNIQUE NOT NULL, started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, "
+                   "completed_at TIMESTAMP, consent_given BOOLEAN DEFAULT 0, first_method TEXT, "
+                   "status TEXT DEFAULT 'active')")
+    legacy.execute("INSERT INTO research_sessions (session_id) VALUES ('legacy')")
+    legacy.commit()
+    legacy.close()
+
+    db = get_db()
+    assert migrate(db) == [version for version, _, _ in MIGRATIONS]
+    assert db.execute('SELECT session_id FROM research_sessions').fetchone()[0] == 'legacy'
+    database_db.close_thread_db()
+
+
+def test_init_db_skips_ddl_when_schema_is_current(db_path):
+    statements = []
+    db = get_db()
+    db.set_trace_callback(statements.append)
+    models.init_db()
+    db.set_trace_callback(None)
+    assert statements
+    assert not [sql for sql in statements if sql.lstrip().upper().startswith(('CREATE', 'ALTER', 'BEGIN'))]
+
+
+def test_create_test_user_hashes_only_when_missing(db_path, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(models, 'hash_password', lambda password: hashed.append(password) or 'hash')
+    models.create_test_user('test', 'test123')
+    models.create_test_user('test', 'test123')
+    assert hashed == ['test123']
+    assert get_db().execute("SELECT COUNT(*) FROM users WHERE username = 'test'").fetchone()[0] == 1
+
+
+def test_forked_child_opens_its_own_connections(db_path):
+    parent = get_db()
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            child = get_db()
+            ok = child is not parent and child.execute('SELECT COUNT(*) FROM users').fetchone() is not None
+            os.write(write, b'1' if ok else b'0')
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read, 1) == b'1'
+    assert parent.execute('SELECT 1').fetchone()[0] == 1
+
+
+def test_attempt_lookup_migration_keeps_rows_and_ids(tmp_path, monkeypatch):
+    path = str(tmp_path / 'v6.db')
+    monkeypatch.setattr(database_db, 'DATABASE_PATH', path)
+    db = get_db()
+    for version, _, apply in MIGRATIONS:
+        if version < 7:
+            apply(db.cursor())
+    db.executemany('INSERT INTO auth_attempts (session_id, method, success, error_code, user_agent) '
+                   'VALUES (?, ?, ?, ?, ?)',
+                   [('a', 'DID', 0, 'ADDRESS_MISMATCH', 'ua'), ('b', 'DID', 1, None, 'ua'),
+                    ('c', 'DID', 0, 'ADDRESS_MISMATCH', None)])
+    db.execute('DELETE FROM auth_attempts WHERE id = 3')
+    db.commit()
+
+    assert 7 in migrate(db)
+    rows = db.execute('SELECT id, session_id, error_code, user_agent FROM auth_attempts').fetchall()
+    assert [tuple(row) for row in rows] == [(1, 'a', 'ADDRESS_MISMATCH', 'ua'), (2, 'b', None, 'ua')]
+    # Deleted ids are not handed out again
+    db.execute("INSERT INTO auth_attempts (session_id) VALUES ('d')")
+    assert db.execute("SELECT id FROM auth_attempts WHERE session_id = 'd'").fetchone()[0] == 4
+    database_db.close_thread_db()
+
+
+def test_latency_sketch_migration_counts_rows_and_rollups(tmp_path, monkeypatch):
+    path = str(tmp_path / 'v8.db')
+    monkeypatch.setattr(database_db, 'DATABASE_PATH', path)
+    db = get_db()
+    get_schema_version(db)
+    for version, description, apply in MIGRATIONS:
+        if version < 9:
+            apply(db.cursor())
+            db.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                       (version, description))
+    db.executemany('INSERT INTO auth_attempts (session_id, method, duration_ms, success) VALUES (?, ?, ?, ?)',
+                   [('a', 'DID', 120.0, 1), ('b', 'DID', 80.0, 1)])
+    db.execute("INSERT INTO attempt_rollups VALUES ('2024-01-01', 'DID', 1, 3, 900.0, 400.0)")
+    db.execute("INSERT INTO attempt_latency_rollups VALUES ('2024-01-01', 'DID', 1, 40, 3)")
+    db.execute('DELETE FROM latency_stats')
+    db.commit()
+
+    assert migrate(db) == [version for version, _, _ in MIGRATIONS if version >= 9]
+    stats = db.execute("SELECT count, max_ms FROM latency_stats WHERE method = 'DID'").fetchone()
+    assert tuple(stats) == (5, 400.0)
+    assert db.execute('SELECT SUM(count) FROM latency_buckets').fetchone()[0] == 5
+    database_db.close_thread_db()
+
+
+def test_error_detail_migration_interns_message_prefixes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'v9.db')
+    monkeypatch.setattr(database_db, 'DATABASE_PATH', path)
+    db = get_db()
+    get_schema_version(db)
+    for version, description, apply in MIGRATIONS:
+        if version < 10:
+            apply(db.cursor())
+            db.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                       (version, description))
+    db.executemany('INSERT INTO auth_attempts (session_id, error_message) VALUES (?, ?)',
+                   [('a', 'Invalid signature format: odd-length string'), ('b', 'Invalid signature format'),
+                    ('c', 'Nonce expired'), ('d', None)])
+    db.commit()
+
+    assert migrate(db) == [10]
+    rows = db.execute('SELECT error_message FROM auth_attempts ORDER BY id').fetchall()
+    assert [row[0] for row in rows] == ['Invalid signature format: odd-length string',
+                                        'Invalid signature format', 'Nonce expired', None]
+    assert db.execute('SELECT COUNT(DISTINCT error_message_id) FROM auth_attempt_rows').fetchone()[0] == 2
+    database_db.close_thread_db()
+
+
+def add_study_data(session_id, error_code='ADDRESS_MISMATCH', user_agent=None):
+    log_auth_attempt(session_id, None, 'DID', 1, time.time(), False, error_code, 'Mismatch', user_agent)
+    save_feedback(session_id, 'DID', 4, 4, 4, True, '')
+    db = get_db()
+    db.execute('INSERT INTO research_sessions (session_id) VALUES (?)', (session_id,))
+    db.execute('INSERT INTO users (username) VALUES (?)', (session_id,))
+    db.execute("INSERT INTO web_sessions (sid, data, version, expires_at) VALUES (?, '{}', 1, 0)",
+               (session_id,))
+    db.commit()
+
+
+def test_clear_all_data_keeps_test_user_and_ids(db_path):
+    models.create_test_user('test', 'test123')
+    add_study_data('s1')
+    db = get_db()
+    test_user = tuple(db.execute("SELECT * FROM users WHERE username = 'test'").fetchone())
+
+    models.clear_all_data(vacuum=True)
+    assert [tuple(row) for row in db.execute('SELECT * FROM users')] == [test_user]
+    for table in ('research_sessions', 'auth_attempts', 'feedback', 'method_stats', 'stats_sessions'):
+        assert db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] == 0
+    # Indexes, the view's insert trigger and AUTOINCREMENT positions survive
+    assert db.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_auth_attempts_session'").fetchone()
+    add_study_data('s2')
+    assert tuple(db.execute('SELECT id, error_code FROM auth_attempts').fetchone()) == (2, 'ADDRESS_MISMATCH')
+    assert db.execute("SELECT id FROM users WHERE username = 's2'").fetchone()[0] == test_user[0] + 2
+
+
+def test_rotate_study_archives_then_resets(db_path, tmp_path):
+    models.create_test_user('test', 'test123')
+    add_study_data('s1')
+
+    path = models.rotate_study(str(tmp_path / 'archives'))
+    assert os.path.basename(path).startswith('research-')
+    archive = sqlite3.connect(path)
+    assert archive.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    assert archive.execute("SELECT session_id FROM auth_attempts").fetchall() == [('s1',)]
+    assert archive.execute('SELECT attempts FROM method_stats').fetchall() == [(1,)]
+    assert archive.execute('SELECT COUNT(*) FROM web_sessions').fetchone()[0] == 0
+    archive.close()
+
+    db = get_db()
+    assert db.execute('SELECT COUNT(*) FROM auth_attempts').fetchone()[0] == 0
+    assert db.execute('SELECT COUNT(*) FROM web_sessions').fetchone()[0] == 1
+    assert db.execute("SELECT username FROM users").fetchall()[0][0] == 'test'
+
+
+def test_rotate_study_tops_up_rows_written_during_backup(db_path, tmp_path):
+    add_study_data('s1')
+    path = models.archive_database(str(tmp_path / 'archive.db'))
+    # Written after the backup, before the reset, with strings the archive has not seen
+    add_study_data('s2', 'NONCE_EXPIRED', 'new-agent')
+    get_db().execute("UPDATE research_sessions SET status = 'completed' WHERE session_id = 's1'")
+    get_db().commit()
+
+    models._reset(path)
+    archive = sqlite3.connect(path)
+    rows = archive.execute('SELECT session_id, error_code, user_agent FROM auth_attempts ORDER BY id')
+    assert rows.fetchall() == [('s1', 'ADDRESS_MISMATCH', None), ('s2', 'NONCE_EXPIRED', 'new-agent')]
+    errors = archive.execute('SELECT error_code, count FROM error_stats ORDER BY error_code').fetchall()
+    assert errors == [('ADDRESS_MISMATCH', 1), ('NONCE_EXPIRED', 1)]
+    assert archive.execute("SELECT status FROM research_sessions WHERE session_id = 's1'").fetchone()[0] == 'completed'
+    assert archive.execute('SELECT attempts FROM method_stats').fetchall() == [(2,)]
+    assert archive.execute('SELECT COUNT(*) FROM feedback').fetchone()[0] == 2
+    archive.close()
+
+
+def test_read_db_is_read_only_and_not_blocked_by_writers(db_path):
+    read_db = database_db.get_read_db()
+    assert read_db is not get_db()
+    with pytest.raises(sqlite3.OperationalError, match='readonly'):
+        read_db.execute("INSERT INTO users (username) VALUES ('nope')")
+
+    # A participant write holding the write lock neither blocks nor leaks into analytics
+    writer_db = get_db()
+    writer_db.execute('BEGIN IMMEDIATE')
+    writer_db.execute("INSERT INTO auth_attempts (session_id, method, success, duration_ms) "
+                      "VALUES ('s1', 'DID', 1, 5.0)")
+    writer_db.execute("UPDATE stats_counters SET value = 99 WHERE name = 'total_sessions'")
+    analytics = get_analytics()
+    assert analytics['overall']['total_sessions'] == 0
+    assert analytics['snapshot_time'] is None
+    writer_db.commit()
+    assert get_analytics()['overall']['total_sessions'] == 99
+
+
+def test_analytics_snapshot_refreshes_after_max_age(db_path, monkeypatch):
+    monkeypatch.setattr(config, 'ANALYTICS_SNAPSHOT_SECONDS', 60)
+    before = get_analytics()
+    first = before['snapshot_time']
+    assert first is not None
+    snapshot = database_db.refresh_snapshot(60)[0]
+    assert os.path.exists(snapshot)
+
+    get_db().execute("UPDATE stats_counters SET value = 7 WHERE name = 'total_sessions'")
+    get_db().commit()
+    # Served from the same snapshot until it is older than the limit
+    assert get_analytics()['overall']['total_sessions'] == 0
+
+    monkeypatch.setattr(config, 'ANALYTICS_SNAPSHOT_SECONDS', 0.001)
+    time.sleep(0.01)
+    after = get_analytics()
+    assert after['overall']['total_sessions'] == 7
+    assert after['snapshot_time'] > first
+    assert not os.path.exists(snapshot)
+    database_db._remove_snapshots()
+    database_db._snapshots.clear()
@@ -0,0 +1,118 @@
+import re
+import time
+import config
+from app import create_app
+from telemetry.events import EventBus, bus, format_sse
+from telemetry.logger import _INSERT_AUTH_ATTEMPT, log_auth_attempt
+from telemetry.writer import writer
+
+app = create_app()
+
+
+def test_listen_replays_history_after_last_event_id():
+    events = EventBus(history_size=10, queue_size=10)
+    for i in range(3):
+        events.publish('attempt', {'n': i})
+
+    stream = events.listen(last_event_id=1, timeout=0.01)
+    assert [event[2]['n'] for event in (next(stream), next(stream))] == [1, 2]
+    assert next(stream) is None  # keep-alive
+
+    events.publish('attempt', {'n': 3})
+    assert next(stream) == (4, 'attempt', {'n': 3})
+    stream.close()
+    assert events.listener_count() == 0
+
+
+def test_listen_sends_reset_when_history_was_truncated():
+    events = EventBus(history_size=2, queue_size=10)
+    for i in range(5):
+        events.publish('attempt', {'n': i})
+
+    assert next(events.listen(last_event_id=1, timeout=0.01)) == (5, 'reset', {})
+    # Ids from before a restart are ahead of this process's counter
+    assert next(events.listen(last_event_id=99, timeout=0.01))[1] == 'reset'
+
+
+def test_stalled_listener_is_dropped():
+    events = EventBus(history_size=10, queue_size=2)
+    stream = events.listen(timeout=0.01)
+    assert next(stream) is None
+    for i in range(3):
+        events.publish('attempt', {'n': i})
+
+    assert events.listener_count() == 0
+    assert list(stream) == [(1, 'attempt', {'n': 0}), (2, 'attempt', {'n': 1})]
+
+
+def test_log_auth_attempt_publishes_without_private_fields(db_path):
+    since = bus.last_event_id()
+    log_auth_attempt('s1', 7, 'DID', 1, time.time(), False, 'ADDRESS_MISMATCH', 'detail', 'agent')
+
+    event_id, event_type, data = next(bus.listen(last_event_id=since, timeout=0.01))
+    assert event_type == 'attempt'
+    assert data['session_id'] == 's1' and data['error_code'] == 'ADDRESS_MISMATCH'
+    assert not {'user_id', 'error_message', 'user_agent'} & set(data)
+    assert format_sse((event_id, event_type, data)).startswith(f'id: {event_id}\nevent: attempt\ndata: {{')
+
+
+def test_attempts_are_published_only_once_committed(db_path, monkeypatch):
+    since = bus.last_event_id()
+
+    def unpublished(cursor, rows):
+        assert bus.last_event_id() == since
+
+    def fail(cursor, rows):
+        raise RuntimeError('disk full')
+    with monkeypatch.context() as patch:
+        patch.setitem(writer._hooks, _INSERT_AUTH_ATTEMPT, [fail])
+        log_auth_attempt('s1', None, 'DID', 1, time.time(), True)
+    assert bus.last_event_id() == since
+
+    hooks = writer._hooks[_INSERT_AUTH_ATTEMPT] + [unpublished]
+    monkeypatch.setitem(writer._hooks, _INSERT_AUTH_ATTEMPT, hooks)
+    log_auth_attempt('s1', None, 'DID', 2, time.time(), True)
+    assert bus.last_event_id() == since + 1
+
+
+def test_last_event_id_before_a_time(monkeypatch):
+    events = EventBus(history_size=3, queue_size=10)
+    for i in range(5):
+        monkeypatch.setattr(time, 'time', lambda: 100.0 + i)
+        events.publish('attempt', {'n': i})
+
+    assert events.last_event_id() == 5
+    assert events.last_event_id(before=103.5) == 4
+    assert events.last_event_id(before=200.0) == 5
+    # Older than the retained history: replay everything still retained
+    assert events.last_event_id(before=100.5) == 2
+
+
+def test_events_endpoint_requires_admin_and_streams(db_path):
+    client = app.test_client()
+    assert client.get('/admin/events').status_code == 401
+
+    with client.session_transaction() as flask_session:
+        flask_session['is_admin'] = True
+    since = bus.last_event_id()
+    bus.publish('session', {'session_id': 's1', 'status': 'completed'})
+
+    response = client.get(f'/admin/events?since={since}', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    frame = next(response.response).decode()
+    assert 'event: session' in frame and '"status": "completed"' in frame
+    response.close()
+
+
+def test_dashboard_replays_events_newer_than_its_snapshot(db_path, monkeypatch):
+    monkeypatch.setattr(config, 'ANALYTICS_SNAPSHOT_SECONDS', 3600)
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['is_admin'] = True
+    client.get('/admin')
+    since = bus.last_event_id()
+
+    # Not in the hour-old snapshot, so the page must replay its event
+    log_auth_attempt('s1', None, 'DID', 1, time.time(), True)
+    page = client.get('/admin').get_data(as_text=True)
+    assert int(re.search(r'/admin/events\?since=(\d+)', page).group(1)) == since
@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+import time
+import pytest
+from telemetry.export import export_table, get_export_watermark, iter_rows
+from telemetry.logger import log_auth_attempt, log_education_view
+
+
+def seed_attempts(count):
+    for i in range(count):
+        log_auth_attempt(f's{i % 3}', None, 'TRADITIONAL', i, time.time(), i % 2 == 0,
+                         None if i % 2 == 0 else 'INVALID_PASSWORD', None, 'agent')
+
+
+def test_iter_rows_chunks_by_id(db_path):
+    seed_attempts(25)
+    chunks = list(iter_rows('auth_attempts', chunk_size=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert [row[0] for chunk in chunks for row in chunk] == list(range(1, 26))
+
+
+def test_since_watermark_returns_only_new_rows(db_path):
+    seed_attempts(5)
+    watermark = get_export_watermark('auth_attempts')
+    seed_attempts(3)
+
+    rows = [row for chunk in iter_rows('auth_attempts', since=watermark) for row in chunk]
+    assert [row[0] for row in rows] == [6, 7, 8]
+    assert list(iter_rows('auth_attempts', since=get_export_watermark('auth_attempts'))) == []
+
+
+def test_csv_and_jsonl_output(db_path):
+    log_education_view('s1', 'DID', 12.5)
+    log_education_view('s2', 'TRADITIONAL', 3.0)
+
+    reader = csv.DictReader(io.StringIO(''.join(export_table('education_views', 'csv', chunk_size=1))))
+    rows = list(reader)
+    assert [row['session_id'] for row in rows] == ['s1', 's2']
+    assert rows[0]['duration_seconds'] == '12.5'
+
+    lines = ''.join(export_table('education_views', 'jsonl')).splitlines()
+    assert json.loads(lines[1])['method'] == 'TRADITIONAL'
+
+
+def test_empty_table_csv_has_header_only(db_path):
+    assert ''.join(export_table('feedback', 'csv')).startswith('id,session_id,method')
+
+
+def test_unknown_table_is_rejected(db_path):
+    with pytest.raises(ValueError):
+        export_table('users', 'csv')
+    with pytest.raises(ValueError):
+        export_table('feedback', 'parquet')
@@ -0,0 +1,43 @@
+import sqlite3
+from flask import got_request_exception
+from app import create_app
+from database.db import get_db
+from database.models import create_test_user
+from perf.loadtest import (LoadStats, FlaskClientTransport, is_lock_error, run_load_test,
+                           watch_lock_errors)
+
+app = create_app()
+
+
+def test_load_test_completes_full_journeys(db_path):
+    create_test_user('test', 'test123')
+
+    report = run_load_test(lambda: FlaskClientTransport(app), participants=3, concurrency=2,
+                           failed_logins=1)
+    assert report['completed'] == 3 and report['failed'] == 0
+    assert report['lock_errors'] == 0 and report['server_errors'] == 0
+    assert report['routes']['/api/login/traditional']['count'] == 6
+    assert report['routes']['/api/login/did']['count'] == 3
+    assert report['routes']['/api/login/did']['p99_ms'] > 0
+
+    completed = get_db().execute(
+        "SELECT COUNT(*) FROM research_sessions WHERE status = 'completed'").fetchone()[0]
+    assert completed == 3
+
+
+def test_failed_step_is_reported(db_path):
+    # No test user, so the password login fails for every participant
+    report = run_load_test(lambda: FlaskClientTransport(app), participants=2, concurrency=2)
+    assert report['completed'] == 0
+    assert report['failures'] == {'/api/login/traditional': 2}
+
+
+def test_lock_errors_are_counted():
+    assert is_lock_error(sqlite3.OperationalError('database is locked'))
+    assert not is_lock_error(sqlite3.OperationalError('no such table: x'))
+
+    stats = LoadStats()
+    handler = watch_lock_errors(app, stats)
+    handler(app, sqlite3.OperationalError('database is locked'))
+    assert stats.lock_errors == 1
+    got_request_exception.disconnect(handler, app)
@@ -0,0 +1,75 @@
+import json
+import pytest
+import config
+from app import create_app
+from database.db import get_db
+from database.models import create_test_user
+from telemetry import metrics
+from telemetry.metrics import Histogram, reset_metrics
+
+app = create_app()
+
+FAST_METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def client(db_path, monkeypatch):
+    monkeypatch.setattr(config, 'PASSWORD_HASH_METHOD', FAST_METHOD)
+    create_test_user('test', 'test123')
+    reset_metrics()
+    client = app.test_client()
+    client.get('/')
+    client.post('/consent', data={'consent': 'yes'})
+    client.get('/authenticate')
+    return client
+
+
+def sample(text, line_prefix):
+    return [line for line in text.splitlines() if line.startswith(line_prefix)]
+
+
+def test_histogram_renders_cumulative_buckets(monkeypatch):
+    monkeypatch.setattr(metrics, '_registry', [])  # keep it out of /metrics
+    histogram = Histogram('test_seconds', 'Test histogram.', ('route',), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        histogram.observe(seconds, '/x')
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{route="/x",le="0.1"} 1',
+        'test_seconds_bucket{route="/x",le="1.0"} 2',
+        'test_seconds_bucket{route="/x",le="+Inf"} 3',
+        'test_seconds_sum{route="/x"} 5.55',
+        'test_seconds_count{route="/x"} 3',
+    ]
+
+
+def test_metrics_report_routes_and_phases(client):
+    client.post('/api/login/traditional', json={'username': 'test', 'password': 'test123'})
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert sample(text, 'http_requests_total{route="/api/login/traditional",method="POST",status="200"} 1')
+    assert sample(text, 'http_request_duration_seconds_count{route="/authenticate"} 1')
+    assert sample(text, 'request_phase_seconds_count{route="/api/login/traditional",phase="hash"} 1')
+    assert sample(text, 'request_phase_seconds_count{route="/api/login/traditional",phase="db"} 1')
+    assert sample(text, 'password_hash_duration_seconds_count 1')
+    assert sample(text, 'telemetry_queue_depth ')
+
+
+def test_metrics_endpoint_access(client, monkeypatch):
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.8'}).status_code == 403
+
+    monkeypatch.setattr(config, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'},
+                          environ_base={'REMOTE_ADDR': '10.0.0.8'})
+    assert response.status_code == 200
+
+
+def test_auth_phases_stored_when_enabled(client, monkeypatch):
+    client.post('/api/login/traditional', json={'username': 'test', 'password': 'wrong-pass'})
+    monkeypatch.setattr(config, 'STORE_AUTH_PHASES', True)
+    client.post('/api/login/traditional', json={'username': 'test', 'password': 'test123'})
+
+    rows = get_db().execute('SELECT phases FROM auth_attempts ORDER BY id').fetchall()
+    assert rows[0]['phases'] is None
+    phases = json.loads(rows[1]['phases'])
+    assert phases['hash'] > 0 and phases['db'] > 0
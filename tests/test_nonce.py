@@ -0,0 +1,63 @@
+import time
+import pytest
+from auth.nonce import (MemoryNonceStore, SQLiteNonceStore, NONCE_EXPIRED, NONCE_INVALID,
+                        NONCE_OK)
+from app import create_app
+from database.db import get_db
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, db_path):
+    stores = {'memory': MemoryNonceStore, 'sqlite': SQLiteNonceStore}
+    return stores[request.param](ttl_seconds=60)
+
+
+def test_nonce_is_consumed_once(store):
+    nonce = store.issue('session-a')
+    assert store.consume(nonce, 'session-a') == NONCE_OK
+    assert store.consume(nonce, 'session-a') == NONCE_INVALID
+
+
+def test_nonce_is_bound_to_its_owner(store):
+    nonce = store.issue('session-a')
+    assert store.consume(nonce, 'session-b') == NONCE_INVALID
+    assert store.consume('not-a-nonce', 'session-a') == NONCE_INVALID
+    assert store.consume(nonce, 'session-a') == NONCE_OK
+
+
+def test_expired_nonce_is_reported_and_swept(store):
+    store.ttl = -1
+    expired = store.issue('session-a')
+    stale = store.issue('session-a')
+    store.ttl = 60
+    fresh = store.issue('session-a')
+
+    assert store.consume(expired, 'session-a') == NONCE_EXPIRED
+    assert store.sweep() == 1
+    assert store.consume(stale, 'session-a') == NONCE_INVALID
+    assert store.consume(fresh, 'session-a') == NONCE_OK
+
+
+def test_sqlite_nonce_is_persisted_with_expiry(db_path):
+    issuer = SQLiteNonceStore(ttl_seconds=60)
+    nonce = issuer.issue('session-a')
+
+    row = get_db().execute('SELECT owner, expires_at FROM auth_nonces WHERE nonce = ?',
+                           (nonce,)).fetchone()
+    assert row['owner'] == 'session-a'
+    assert row['expires_at'] > time.time()
+
+
+def test_nonce_endpoint_creates_no_research_session(db_path):
+    client = create_app().test_client()
+    for _ in range(3):
+        assert client.get('/api/nonce').status_code == 200
+    assert get_db().execute('SELECT COUNT(*) FROM research_sessions').fetchone()[0] == 0
+
+    # The nonce is still bound to the client that requested it
+    nonce = client.get('/api/nonce').json['nonce']
+    login = {'address': '0x' + '0' * 40, 'signature': '0x00', 'message': nonce}
+    other = create_app().test_client().post('/api/login/did', json=login)
+    assert other.json['error'] == 'Invalid or expired nonce'
+    own = client.post('/api/login/did', json=login)
+    assert own.json['error'] != 'Invalid or expired nonce'
@@ -0,0 +1,103 @@
+import statistics
+import time
+import pytest
+import config
+from database.db import get_db
+from auth.password import (calibrate_hash_method, needs_rehash, register_user,
+                           verify_credentials)
+
+FAST_METHOD = 'pbkdf2:sha256:1000'
+# Allowed relative gap between the wrong-password and unknown-user latencies
+TIMING_TOLERANCE = 0.3
+
+
+@pytest.fixture(autouse=True)
+def fast_hashing(monkeypatch):
+    monkeypatch.setattr(config, 'PASSWORD_HASH_METHOD', FAST_METHOD)
+
+
+def stored_hash(username):
+    row = get_db().execute('SELECT password_hash FROM users WHERE username = ?', (username,)).fetchone()
+    return row['password_hash']
+
+
+def test_verify_credentials_outcomes(db_path):
+    assert register_user('alice', 'secret123') == (True, "User registered successfully")
+    user_id, error_code, _ = verify_credentials('alice', 'secret123')
+    assert user_id and error_code is None
+
+    assert verify_credentials('alice', 'wrong-pass')[1] == 'INVALID_PASSWORD'
+    assert verify_credentials('nobody', 'secret123')[1] == 'USER_NOT_FOUND'
+
+
+def test_register_user_rejects_duplicates_and_short_passwords(db_path):
+    assert register_user('bob', 'short')[0] is False
+    assert register_user('bob', 'secret123')[0] is True
+    assert register_user('bob', 'secret123') == (False, "Username already exists")
+
+
+def test_successful_login_upgrades_outdated_hash(db_path, monkeypatch):
+    register_user('carol', 'secret123')
+    assert stored_hash('carol').startswith(FAST_METHOD + '$')
+
+    monkeypatch.setattr(config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:2000')
+    assert needs_rehash(stored_hash('carol'))
+
+    # A failed login must not touch the stored hash
+    verify_credentials('carol', 'wrong-pass')
+    assert stored_hash('carol').startswith(FAST_METHOD + '$')
+
+    assert verify_credentials('carol', 'secret123')[0]
+    assert stored_hash('carol').startswith('pbkdf2:sha256:2000$')
+    assert not needs_rehash(stored_hash('carol'))
+    assert verify_credentials('carol', 'secret123')[0]
+
+
+def test_calibrate_hash_method_returns_usable_method():
+    method, elapsed = calibrate_hash_method(5, algorithm='pbkdf2')
+    assert method.startswith('pbkdf2:sha256:')
+    assert elapsed > 0
+
+    with pytest.raises(ValueError):
+        calibrate_hash_method(5, algorithm='md5')
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def time_login(username, password, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        verify_credentials(username, password)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+@pytest.mark.timing
+def test_unknown_user_costs_the_same_as_wrong_password(db_path, monkeypatch):
+    # Costly enough that hashing dominates the database lookup
+    monkeypatch.setattr(config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:50000')
+    register_user('dave', 'secret123')
+    time_login('dave', 'warm-up', 3)
+    time_login('nobody', 'warm-up', 3)
+
+    known = time_login('dave', 'wrong-pass', 25)
+    unknown = time_login('nobody', 'wrong-pass', 25)
+
+    for fraction in (0.5, 0.9):
+        ratio = percentile(unknown, fraction) / percentile(known, fraction)
+        assert 1 - TIMING_TOLERANCE < ratio < 1 + TIMING_TOLERANCE, (fraction, ratio)
+
+
+@pytest.mark.timing
+def test_unknown_user_skips_hash_when_constant_time_disabled(db_path, monkeypatch):
+    monkeypatch.setattr(config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:50000')
+    monkeypatch.setattr(config, 'PASSWORD_CONSTANT_TIME_MISS', False)
+    register_user('erin', 'secret123')
+
+    known = statistics.median(time_login('erin', 'wrong-pass', 5))
+    unknown = statistics.median(time_login('nobody', 'wrong-pass', 5))
+    assert unknown < known * (1 - TIMING_TOLERANCE)
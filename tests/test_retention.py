@@ -0,0 +1,77 @@
+from datetime import date
+import pytest
+from database.db import get_db
+from telemetry.logger import get_all_sessions, get_analytics, rebuild_analytics
+from telemetry.retention import compact_telemetry
+
+TODAY = date(2024, 3, 31)
+
+
+def add_attempts():
+    # Durations are exact in binary, so sums match whatever order they are added in
+    rows = [
+        ('s1', 'TRADITIONAL', 0, 120.5, 'INVALID_PASSWORD', '2024-01-01 09:00:00'),
+        ('s1', 'TRADITIONAL', 1, 80.25, None, '2024-01-01 09:01:00'),
+        ('s1', 'DID', 0, 300.0, 'SIGNATURE_INVALID', '2024-01-02 10:00:00'),
+        ('s2', 'DID', 1, 950.75, None, '2024-01-02 11:00:00'),
+        ('s2', 'DID', 1, 410.5, None, '2024-03-30 11:00:00'),
+        ('s3', 'TRADITIONAL', 0, 60.0, 'USER_NOT_FOUND', '2024-03-30 12:00:00'),
+    ]
+    db = get_db()
+    db.executemany('INSERT INTO auth_attempts (session_id, method, success, duration_ms, error_code, timestamp) '
+                   'VALUES (?, ?, ?, ?, ?, ?)', rows)
+    db.executemany('INSERT INTO research_sessions (session_id, started_at) VALUES (?, ?)',
+                   [('s1', '2024-01-01 09:00:00'), ('s2', '2024-01-02 11:00:00'),
+                    ('s3', '2024-03-30 12:00:00')])
+    db.executemany('INSERT INTO education_views (session_id, method, duration_seconds, timestamp) '
+                   'VALUES (?, ?, ?, ?)',
+                   [('s1', 'DID', 30.0, '2024-01-01 08:59:00'), ('s1', 'DID', 12.5, '2024-01-01 09:30:00'),
+                    ('s3', 'DID', 8.0, '2024-03-30 11:59:00')])
+    db.commit()
+    rebuild_analytics()
+
+
+def dashboard():
+    analytics = get_analytics()
+    del analytics['recent_activity']
+    sessions, _ = get_all_sessions()
+    return analytics, [(s['session_id'], s['total_attempts'], s['successful_attempts']) for s in sessions]
+
+
+def test_compaction_keeps_dashboard_numbers(db_path):
+    add_attempts()
+    before = dashboard()
+
+    removed = compact_telemetry(days=30, batch_size=2, today=TODAY)
+    assert removed == {'auth_attempt_rows': 4, 'education_views': 2}
+    db = get_db()
+    assert db.execute('SELECT COUNT(*) FROM auth_attempt_rows').fetchone()[0] == 2
+    assert dashboard() == before
+
+    # Rebuilding from raw rows plus rollups gives the same summaries
+    rebuild_analytics()
+    assert dashboard() == before
+
+
+def test_rollups_are_daily_per_method(db_path):
+    add_attempts()
+    compact_telemetry(days=30, today=TODAY)
+    db = get_db()
+    rows = db.execute('SELECT day, method, success, attempts, duration_sum FROM attempt_rollups '
+                      'ORDER BY day, method, success').fetchall()
+    assert [tuple(row) for row in rows] == [
+        ('2024-01-01', 'TRADITIONAL', 0, 1, 120.5),
+        ('2024-01-01', 'TRADITIONAL', 1, 1, 80.25),
+        ('2024-01-02', 'DID', 0, 1, 300.0),
+        ('2024-01-02', 'DID', 1, 1, 950.75),
+    ]
+    views = db.execute('SELECT day, method, views, duration_sum FROM education_view_rollups').fetchall()
+    assert [tuple(row) for row in views] == [('2024-01-01', 'DID', 2, 42.5)]
+
+    # Running again finds nothing older than the window
+    assert compact_telemetry(days=30, today=TODAY) == {'auth_attempt_rows': 0, 'education_views': 0}
+
+
+def test_compaction_needs_a_retention_window(db_path):
+    with pytest.raises(ValueError):
+        compact_telemetry()
@@ -0,0 +1,91 @@
+from database import db as database_db
+from database.db import get_db
+from database.models import init_db
+from database.seed import FAILURES, seed_database
+from telemetry.logger import get_analytics, rebuild_analytics
+
+TABLES = ['users', 'research_sessions', 'auth_attempts', 'education_views', 'feedback']
+
+
+def dump(db):
+    return {table: [tuple(row) for row in db.execute(f'SELECT * FROM {table} ORDER BY id')]
+            for table in TABLES}
+
+
+def without_hashes(users):
+    # The test user's hash is salted and its created_at is the wall clock
+    return [row[:2] if row[2] else row[:2] + row[3:] for row in users]
+
+
+def test_seed_is_deterministic_and_exact(db_path, tmp_path, monkeypatch):
+    counts = seed_database(2000, seed=7)
+    assert counts['attempts'] == 2000
+    first = dump(get_db())
+
+    database_db.close_thread_db()
+    monkeypatch.setattr(database_db, 'DATABASE_PATH', str(tmp_path / 'again.db'))
+    init_db()
+    seed_database(2000, seed=7)
+    second = dump(get_db())
+
+    # Apart from the test user, everything matches row for row
+    assert without_hashes(first.pop('users')) == without_hashes(second.pop('users'))
+    assert first == second
+
+
+def test_seeded_rows_look_like_real_traffic(db_path):
+    seed_database(3000, seed=3)
+    db = get_db()
+
+    codes = {row[0]: row[1] for row in db.execute(
+        'SELECT DISTINCT error_code, method FROM auth_attempts WHERE error_code IS NOT NULL')}
+    assert set(codes) <= {code for method in FAILURES for code, _, _ in FAILURES[method]}
+    assert all(code in [c for c, _, _ in FAILURES[method]] for code, method in codes.items())
+
+    first_methods = dict(db.execute(
+        'SELECT first_method, COUNT(*) FROM research_sessions WHERE consent_given GROUP BY first_method'
+    ).fetchall())
+    assert first_methods['TRADITIONAL'] > 0 and first_methods['DID'] > 0
+    assert db.execute('SELECT COUNT(*) FROM research_sessions WHERE NOT consent_given').fetchone()[0] > 0
+    assert db.execute('SELECT COUNT(*) FROM feedback').fetchone()[0] > 0
+    assert db.execute('SELECT COUNT(*) FROM education_views').fetchone()[0] > 0
+
+
+def test_seed_restores_indexes_and_summaries(db_path):
+    db = get_db()
+    indexes = sorted(row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"))
+    seed_database(1000)
+
+    assert sorted(row[0] for row in db.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")) == indexes
+    assert db.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+
+    seeded = get_analytics()
+    rebuild_analytics()
+    assert get_analytics()['overall'] == seeded['overall']
+
+
+def test_seeded_sessions_follow_the_completion_rules(db_path, monkeypatch):
+    for size in (997, 1000, 1003):
+        database_db.close_thread_db()
+        monkeypatch.setattr(database_db, 'DATABASE_PATH', db_path + f'.{size}')
+        init_db()
+        assert seed_database(size, seed=size)['attempts'] == size
+        db = get_db()
+
+        # Completed sessions succeeded with both methods, active ones with their first
+        assert db.execute('''
+            SELECT COUNT(*) FROM research_sessions s
+            WHERE s.consent_given AND (
+                SELECT COUNT(DISTINCT method) FROM auth_attempts a
+                WHERE a.session_id = s.session_id AND a.success
+            ) != CASE s.status WHEN 'completed' THEN 2 ELSE 1 END
+        ''').fetchone()[0] == 0
+        # Every wallet user logged in successfully
+        assert db.execute('''
+            SELECT COUNT(*) FROM users u
+            WHERE u.wallet_address IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM auth_attempts a WHERE a.user_id = u.id AND a.success
+            )
+        ''').fetchone()[0] == 0
@@ -0,0 +1,80 @@
+import time
+from app import create_app
+from auth.sessions import SessionCache
+from database.db import get_db
+
+app = create_app()
+
+
+def session_row(sid):
+    return get_db().execute('SELECT * FROM web_sessions WHERE sid = ?', (sid,)).fetchone()
+
+
+def test_cookie_carries_only_an_opaque_id(db_path):
+    client = app.test_client()
+    client.get('/')
+    sid = client.get_cookie('session').value
+    assert 'research_session_id' not in sid
+    row = session_row(sid)
+    assert 'research_session_id' in row['data']
+    assert row['expires_at'] > time.time()
+
+
+def test_unchanged_session_is_not_written_back(db_path):
+    client = app.test_client()
+    client.get('/')
+    sid = client.get_cookie('session').value
+    version = session_row(sid)['version']
+
+    # Redirects without modifying the session
+    assert client.get('/final-feedback').status_code == 302
+    assert session_row(sid)['version'] == version
+
+    client.post('/consent', data={'consent': 'yes'})
+    assert session_row(sid)['version'] == version + 1
+
+
+def test_workers_see_each_others_writes(db_path):
+    first, second = app.test_client(), create_app().test_client()
+    first.get('/')
+    sid = first.get_cookie('session').value
+    second.set_cookie('session', sid)
+    with second.session_transaction() as flask_session:
+        assert flask_session['current_step'] == 'intro'
+
+    first.post('/consent', data={'consent': 'yes'})
+    with second.session_transaction() as flask_session:
+        assert flask_session['current_step'] == 'auth'
+
+
+def test_admin_login_rotates_session_id(db_path):
+    client = app.test_client()
+    client.get('/')
+    planted = client.get_cookie('session').value
+    client.post('/admin/auth', data={'password': 'admin123'})
+    sid = client.get_cookie('session').value
+    assert sid != planted
+    assert session_row(planted) is None
+    assert client.get('/admin').status_code == 200
+
+
+def test_expired_session_starts_empty(db_path):
+    client = app.test_client()
+    client.get('/')
+    sid = client.get_cookie('session').value
+    get_db().execute('UPDATE web_sessions SET expires_at = 0 WHERE sid = ?', (sid,))
+    get_db().commit()
+    with client.session_transaction() as flask_session:
+        assert 'research_session_id' not in flask_session
+
+
+def test_cache_is_bounded_and_drops_idle_entries(monkeypatch):
+    cache = SessionCache(max_entries=2, idle_seconds=60)
+    for sid in 'abc':
+        cache.put(sid, 1, '{}', 0)
+    assert len(cache) == 2 and cache.get('a') is None
+
+    clock = time.monotonic() + 120
+    monkeypatch.setattr(time, 'monotonic', lambda: clock)
+    cache.put('d', 1, '{}', 0)
+    assert len(cache) == 1 and cache.get('d') == (1, '{}', 0)
@@ -0,0 +1,42 @@
+import subprocess
+import sys
+from perf.startup import ROOT, parse_importtime, summarize_imports, time_boot
+
+SAMPLE = '''import time: self [us] | cumulative | imported package
+import time:       100 |        100 | encodings
+import time:       300 |        300 |     jinja2.utils
+import time:       500 |        800 |   jinja2
+import time:      1000 |       1800 | flask
+import time:        50 |         50 |     database.db
+import time:       200 |        250 |   database.models
+import time:        40 |       2090 | app
+'''
+
+
+def test_parse_importtime_reads_depth():
+    entries = parse_importtime(SAMPLE)
+    assert entries[0] == ('encodings', 100, 100, 0)
+    assert entries[1] == ('jinja2.utils', 300, 300, 2)
+    assert entries[-1] == ('app', 40, 2090, 0)
+
+
+def test_summarize_imports_attributes_to_module():
+    # flask is imported at the top level here, so only database counts toward app
+    summary = summarize_imports(parse_importtime(SAMPLE))
+    assert summary['total_ms'] == 2.09
+    assert summary['imports'] == [{'module': 'database.models', 'cumulative_ms': 0.25}]
+    assert summary['packages'] == [{'package': 'database', 'self_ms': 0.25}]
+
+
+def test_importing_app_defers_eth_account():
+    result = subprocess.run([sys.executable, '-c', "import app, sys; print('eth_account' in sys.modules)"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
+
+
+def test_restart_boot_serves_first_request(tmp_path):
+    database = str(tmp_path / 'boot.db')
+    time_boot(database)
+    restart = time_boot(database)
+    assert restart['status'] == 200
+    assert not restart['eth_account_loaded']
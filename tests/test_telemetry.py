@@ -0,0 +1,345 @@
+import re
+import threading
+import time
+import pytest
+from database import db as database_db
+from database.db import get_db
+from database.models import complete_session, create_research_session, set_session_first_method
+from telemetry.logger import (get_all_sessions, get_analytics, get_session_attempts,
+                              log_auth_attempt, rebuild_analytics, save_feedback)
+from telemetry import lookups, sketch
+from telemetry.logger import _INSERT_AUTH_ATTEMPT as INSERT_AUTH_ATTEMPT
+from telemetry.writer import TelemetryWriter, writer
+
+INSERT_VIEW = 'INSERT INTO education_views (session_id, method, duration_seconds) VALUES (?, ?, ?)'
+
+
+def count_views():
+    return get_db().execute('SELECT COUNT(*) FROM education_views').fetchone()[0]
+
+
+def test_writer_batches_rows(db_path):
+    writer = TelemetryWriter(batch_size=50, flush_interval_ms=1000)
+    for i in range(120):
+        writer.submit(INSERT_VIEW, ('s', 'DID', float(i)))
+    writer.flush()
+
+    assert count_views() == 120
+    stats = writer.stats()
+    assert stats['written'] == 120
+    assert stats['batches'] < 120
+    assert stats['queue_depth'] == 0
+    writer.close()
+
+
+def test_writer_flushes_on_close(db_path):
+    writer = TelemetryWriter(batch_size=1000, flush_interval_ms=60000)
+    writer.submit(INSERT_VIEW, ('s', 'DID', 1.0))
+    writer.close()
+    assert count_views() == 1
+
+
+def test_full_queue_falls_back_to_synchronous_write(db_path):
+    writer = TelemetryWriter(max_queue=1, enqueue_timeout=0.01)
+    writer._ensure_started = lambda: None  # no consumer drains the queue
+    writer._queue.put((INSERT_VIEW, ('s', 'DID', 0.0)))
+
+    writer.submit(INSERT_VIEW, ('s', 'DID', 1.0))
+
+    assert writer.stats()['sync_fallbacks'] == 1
+    assert count_views() == 1
+
+
+def test_disabled_writer_writes_inline(db_path):
+    writer = TelemetryWriter(enabled=False)
+    writer.submit(INSERT_VIEW, ('s', 'TRADITIONAL', 2.0))
+    assert count_views() == 1
+    assert writer.stats()['batches'] == 1
+
+
+def test_writer_survives_connection_errors(db_path, monkeypatch):
+    from telemetry import writer as writer_module
+    writer = TelemetryWriter(flush_interval_ms=10)
+    connect = writer_module.get_db
+    failures = [RuntimeError('database is locked')]
+
+    def flaky_get_db():
+        if failures:
+            raise failures.pop()
+        return connect()
+    monkeypatch.setattr(writer_module, 'get_db', flaky_get_db)
+    writer.add_commit_hook(lambda: 1 / 0)
+
+    writer.submit(INSERT_VIEW, ('s', 'DID', 1.0))
+    writer.flush()
+    writer.submit(INSERT_VIEW, ('s', 'DID', 2.0))
+    writer.flush()
+
+    assert writer._thread.is_alive()
+    assert writer.stats()['failed'] == 1
+    assert count_views() == 1
+    writer.close()
+
+
+def test_dead_writer_thread_is_restarted(db_path):
+    writer = TelemetryWriter(flush_interval_ms=10)
+    writer._ensure_started()
+    writer.close()
+    # A thread that died in this process, e.g. on an unexpected error
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    writer._thread = dead
+
+    writer.submit(INSERT_VIEW, ('s', 'DID', 1.0))
+    writer.flush()
+    assert count_views() == 1
+    writer.close()
+
+
+def seed_telemetry():
+    now = time.time()
+    log_auth_attempt('s1', None, 'TRADITIONAL', 1, now - 0.5, False, 'INVALID_PASSWORD', 'Incorrect password')
+    log_auth_attempt('s1', 1, 'TRADITIONAL', 2, now - 0.25, True)
+    log_auth_attempt('s1', None, 'DID', 1, now - 1.0, False, 'SIGNATURE_INVALID', 'Invalid signature format')
+    log_auth_attempt('s1', 2, 'DID', 2, now - 0.1, True)
+    log_auth_attempt('s2', None, 'TRADITIONAL', 1, now - 0.2, False, 'USER_NOT_FOUND', 'Username not found')
+    save_feedback('s1', 'TRADITIONAL', 4, 3, 2, True, '')
+    save_feedback('s1', 'DID', 5, None, 4, False, 'nice')
+    save_feedback('s2', 'TRADITIONAL', 2, 2, 2, False, '')
+
+
+def test_analytics_summaries_track_writes(db_path):
+    seed_telemetry()
+    analytics = get_analytics()
+
+    assert analytics['overall']['total_sessions'] == 2
+    assert analytics['overall']['total_attempts'] == 5
+    assert analytics['overall']['successful_attempts'] == 2
+
+    by_method = {row['method']: row for row in analytics['by_method']}
+    assert by_method['TRADITIONAL']['attempts'] == 3
+    assert by_method['TRADITIONAL']['successes'] == 1
+    assert by_method['TRADITIONAL']['unique_sessions'] == 2
+    assert by_method['DID']['unique_sessions'] == 1
+
+    feedback = {row['method']: row for row in analytics['feedback']}
+    assert feedback['TRADITIONAL']['avg_ease'] == 3
+    assert feedback['TRADITIONAL']['would_use_percent'] == 50
+    assert feedback['DID']['avg_speed'] is None
+
+    errors = {(row['method'], row['error_code']): row['count'] for row in analytics['errors']}
+    assert errors == {('TRADITIONAL', 'INVALID_PASSWORD'): 1,
+                      ('TRADITIONAL', 'USER_NOT_FOUND'): 1,
+                      ('DID', 'SIGNATURE_INVALID'): 1}
+
+
+def test_rebuild_matches_incremental_summaries(db_path):
+    seed_telemetry()
+    incremental = get_analytics()
+    rebuild_analytics()
+    rebuilt = get_analytics()
+
+    assert rebuilt['overall'] == incremental['overall']
+    assert rebuilt['by_method'] == incremental['by_method']
+    assert rebuilt['feedback'] == incremental['feedback']
+    assert sorted(rebuilt['errors'], key=str) == sorted(incremental['errors'], key=str)
+
+
+def test_session_stats_are_not_multiplied_by_feedback(db_path):
+    session_id = create_research_session()
+    start = time.time()
+    log_auth_attempt(session_id, None, 'TRADITIONAL', 1, start, False, 'INVALID_PASSWORD', 'Incorrect password')
+    log_auth_attempt(session_id, 1, 'TRADITIONAL', 2, start, True)
+    save_feedback(session_id, 'TRADITIONAL', 4, 4, 4, True, '')
+    save_feedback(session_id, 'DID', 3, 3, 3, False, '')
+
+    sessions, next_cursor = get_all_sessions()
+    assert next_cursor is None
+    assert sessions[0]['total_attempts'] == 2
+    assert sessions[0]['successful_attempts'] == 1
+    assert sessions[0]['feedback_count'] == 2
+
+
+def test_session_list_keyset_pagination_and_filters(db_path):
+    created = [create_research_session() for _ in range(7)]
+    complete_session(created[0])
+    set_session_first_method(created[1], 'DID')
+
+    seen = []
+    sessions, cursor = get_all_sessions(limit=3)
+    seen.extend(sessions)
+    while cursor:
+        sessions, cursor = get_all_sessions(limit=3, cursor=cursor)
+        seen.extend(sessions)
+    assert sorted(s['session_id'] for s in seen) == sorted(created)
+    assert [s['id'] for s in seen] == sorted((s['id'] for s in seen), reverse=True)
+
+    completed, _ = get_all_sessions(status='completed')
+    assert [s['session_id'] for s in completed] == [created[0]]
+    did_first, _ = get_all_sessions(first_method='DID')
+    assert [s['session_id'] for s in did_first] == [created[1]]
+
+
+# Summary tables hold one row per method, error code or latency bucket, so
+# scanning them is fine however many attempts are stored
+SMALL_TABLES = {'method_stats', 'error_stats', 'feedback_stats', 'latency_stats',
+                'latency_buckets', 'page'}
+
+
+def test_logger_queries_use_indexes(db_path):
+    seed_telemetry()
+    session_id = create_research_session()
+    db = get_db()
+    # Analytics and the session list run on the read-only connection
+    read_db = database_db.get_read_db()
+    statements = []
+    db.set_trace_callback(statements.append)
+    read_db.set_trace_callback(statements.append)
+    try:
+        get_all_sessions()
+        get_all_sessions(cursor='999:2999-01-01', status='active', first_method='DID')
+        get_session_attempts(session_id)
+        get_analytics()
+        log_auth_attempt(session_id, None, 'DID', 3, time.time(), False, 'NONCE_EXPIRED', 'Nonce expired')
+        save_feedback(session_id, 'DID', 1, 1, 1, False, '')
+    finally:
+        db.set_trace_callback(None)
+        read_db.set_trace_callback(None)
+
+    queries = [sql for sql in statements if sql.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE'))]
+    assert any('FROM method_stats' in sql for sql in queries)
+    assert any('FROM latency_buckets' in sql for sql in queries)
+    assert any('WITH page AS' in sql and 'started_at < ' in sql for sql in queries)
+    for sql in queries:
+        plan = [row['detail'] for row in db.execute('EXPLAIN QUERY PLAN ' + sql)]
+        for detail in plan:
+            match = re.match(r'SCAN (\w+)$', detail)
+            assert not match or match.group(1) in SMALL_TABLES, (sql, plan)
+
+
+def test_latency_sketch_quantiles_are_accurate():
+    values = [float(v) for v in range(1, 1001)]
+    counts = {}
+    for value in values:
+        index = sketch.bucket_index(value)
+        counts[index] = counts.get(index, 0) + 1
+
+    p50, p90, p99 = sketch.quantiles(counts, (0.5, 0.9, 0.99))
+    assert p50 == pytest.approx(500, rel=sketch.RELATIVE_ACCURACY)
+    assert p90 == pytest.approx(900, rel=sketch.RELATIVE_ACCURACY)
+    assert p99 == pytest.approx(990, rel=sketch.RELATIVE_ACCURACY)
+
+    half = len(values) // 2
+    left = {}
+    right = {}
+    for value in values[:half]:
+        left[sketch.bucket_index(value)] = left.get(sketch.bucket_index(value), 0) + 1
+    for value in values[half:]:
+        right[sketch.bucket_index(value)] = right.get(sketch.bucket_index(value), 0) + 1
+    assert sketch.merge(left, right) == counts
+
+    # Nearest rank: the tail of a tiny sample is its largest value
+    two = {sketch.bucket_index(100.0): 1, sketch.bucket_index(300.0): 1}
+    assert sketch.quantiles(two, (0.5, 0.99)) == pytest.approx([100, 300], rel=sketch.RELATIVE_ACCURACY)
+
+
+def test_latency_quantiles_never_exceed_the_maximum(db_path, monkeypatch):
+    # 144.5 ms lies below its bucket's representative value
+    assert sketch.bucket_value(sketch.bucket_index(144.5)) > 144.5
+    assert sketch.quantiles({sketch.bucket_index(144.5): 10}, (0.5, 0.99), 144.5) == [144.5, 144.5]
+
+    # The same duration, recorded over and over
+    monkeypatch.setattr(time, 'time', lambda: 1000.0)
+    for _ in range(20):
+        log_auth_attempt('s1', None, 'DID', 1, 1000.0 - 0.1445, False, 'NONCE_EXPIRED', 'Nonce expired')
+    entry = get_analytics()['latency'][0]
+    assert entry['max_ms'] == pytest.approx(144.5)
+    assert entry['p50'] == entry['p90'] == entry['p99'] == entry['max_ms']
+
+
+def test_analytics_latency_matches_rebuild(db_path):
+    seed_telemetry()
+    latency = {(row['method'], row['success']): row for row in get_analytics()['latency']}
+    assert latency[('TRADITIONAL', 0)]['count'] == 2
+    assert latency[('DID', 0)]['max_ms'] == pytest.approx(1000, rel=0.2)
+    assert sum(b['count'] for b in latency[('DID', 0)]['histogram']) == 1
+
+    rebuild_analytics()
+    assert get_analytics()['latency'] == list(latency.values())
+
+
+def test_attempt_strings_are_dictionary_encoded(db_path):
+    for _ in range(3):
+        log_auth_attempt('s1', None, 'TRADITIONAL', 1, time.time(), False,
+                         'INVALID_PASSWORD', 'Incorrect password', 'Mozilla/5.0')
+    db = get_db()
+    assert db.execute('SELECT COUNT(*) FROM user_agents').fetchone()[0] == 1
+    assert db.execute('SELECT COUNT(DISTINCT error_message_id) FROM auth_attempt_rows').fetchone()[0] == 1
+
+    row = db.execute('SELECT error_code, error_message, user_agent FROM auth_attempts').fetchone()
+    assert tuple(row) == ('INVALID_PASSWORD', 'Incorrect password', 'Mozilla/5.0')
+    assert get_analytics()['errors'] == [{'method': 'TRADITIONAL', 'error_code': 'INVALID_PASSWORD', 'count': 3}]
+    rebuild_analytics()
+    assert get_analytics()['errors'][0]['count'] == 3
+
+
+def test_attempt_lookups_are_resolved_by_the_writer(db_path, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(writer, 'submit', lambda sql, row: submitted.append(row))
+    db = get_db()
+    statements = []
+    db.set_trace_callback(statements.append)
+    try:
+        log_auth_attempt('s1', None, 'DID', 1, time.time(), False,
+                         'SIGNATURE_INVALID', 'Invalid signature format: odd-length string', 'curl/8')
+    finally:
+        db.set_trace_callback(None)
+
+    # Nothing is written, or committed, on the caller's connection
+    assert statements == []
+    assert submitted[0]['error_message'] == 'Invalid signature format: odd-length string'
+    assert submitted[0]['error_code_id'] is None
+    assert submitted[0]['error_detail'] is None
+
+
+def test_error_message_detail_is_kept_outside_the_lookup_table(db_path):
+    messages = ['Invalid signature format: odd-length string', 'Invalid signature format: Non-hexadecimal digit found',
+                'Invalid signature format', 'Nonce expired']
+    for message in messages:
+        log_auth_attempt('s1', None, 'DID', 1, time.time(), False, 'SIGNATURE_INVALID', message)
+    db = get_db()
+    db.execute("INSERT INTO auth_attempts (session_id, error_message) VALUES ('s2', 'Incorrect password: x: y')")
+    assert [row[0] for row in db.execute('SELECT value FROM error_messages ORDER BY id')] == [
+        'Invalid signature format', 'Nonce expired', 'Incorrect password']
+    assert [row[0] for row in db.execute('SELECT error_message FROM auth_attempts ORDER BY id')] == [
+        *messages, 'Incorrect password: x: y']
+    db.rollback()
+
+
+def test_rolled_back_lookup_ids_are_not_cached(db_path, monkeypatch):
+    def fail(cursor, rows):
+        raise RuntimeError('disk full')
+    with monkeypatch.context() as patch:
+        patch.setitem(writer._hooks, INSERT_AUTH_ATTEMPT, [fail])
+        log_auth_attempt('s1', None, 'DID', 1, time.time(), False, 'NONCE_EXPIRED', 'Nonce expired',
+                         'curl/8')
+    db = get_db()
+    assert db.execute('SELECT COUNT(*) FROM user_agents').fetchone()[0] == 0
+    assert (database_db.DATABASE_PATH, 'user_agents', 'curl/8') not in lookups._ids
+
+    # The rolled-back id is reused for a different agent, so a cached one would be wrong
+    log_auth_attempt('s1', None, 'DID', 1, time.time(), False, None, None, 'Mozilla/5.0')
+    log_auth_attempt('s1', None, 'DID', 1, time.time(), False, None, None, 'curl/8')
+    agents = [row[0] for row in db.execute('SELECT user_agent FROM auth_attempts ORDER BY id')]
+    assert agents == ['Mozilla/5.0', 'curl/8']
+
+
+def test_inserts_through_the_view_are_encoded(db_path):
+    db = get_db()
+    db.execute("INSERT INTO auth_attempts (session_id, method, success, error_code, user_agent) "
+               "VALUES ('s1', 'DID', 0, 'NONCE_EXPIRED', 'curl/8')")
+    db.commit()
+    row = db.execute('SELECT * FROM auth_attempts').fetchone()
+    assert (row['error_code'], row['error_message'], row['user_agent']) == ('NONCE_EXPIRED', None, 'curl/8')
+    assert row['timestamp'] is not None
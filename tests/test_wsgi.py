@@ -0,0 +1,35 @@
+import importlib
+import config
+from app import create_app, load_secret_key
+from database.db import get_db
+
+
+def test_secret_key_file_is_shared(tmp_path, monkeypatch):
+    path = str(tmp_path / 'instance' / 'secret_key')
+    key = load_secret_key(path)
+    assert len(key) == 64
+    assert load_secret_key(path) == key
+
+    monkeypatch.setattr(config, 'SECRET_KEY', None)
+    monkeypatch.setattr(config, 'SECRET_KEY_FILE', path)
+    assert create_app().secret_key == create_app().secret_key == key
+
+
+def test_session_cookie_valid_across_apps(db_path, monkeypatch):
+    monkeypatch.setattr(config, 'SECRET_KEY', 'shared')
+    first, second = create_app(), create_app()
+    client = first.test_client()
+    client.get('/')
+    cookie = client.get_cookie('session')
+
+    other = second.test_client()
+    other.set_cookie('session', cookie.value)
+    with other.session_transaction() as flask_session:
+        assert flask_session['research_session_id']
+
+
+def test_wsgi_module_prepares_database(db_path, monkeypatch):
+    monkeypatch.setattr(config, 'SIGNATURE_WORKERS', 0)
+    wsgi = importlib.import_module('wsgi')
+    assert get_db().execute("SELECT 1 FROM users WHERE username = 'test'").fetchone()
+    assert wsgi.app.test_client().get('/').status_code == 200
@@ -0,0 +1,34 @@
+from app import create_app
+from auth.crypto import warm_up_signature_verification
+from database.db import close_thread_db, close_pool
+from database.models import init_db, create_test_user
+import os
+
+# Production entry point for a pre-forking WSGI server, e.g.
+#
+#   gunicorn --preload --workers 4 --threads 8 wsgi:app
+#
+# With --preload this module is imported once in the master, so migrations,
+# the test user and the secret key are settled before any worker forks.
+# Without it every worker runs the same setup; migrations take the write
+# lock and the secret key file is created atomically, so that is safe too.
+# Connections, the telemetry writer thread and the hashing and recovery
+# pools are all created lazily in each worker process.
+
+init_db()
+create_test_user('test', 'test123')
+# SQLite connections must not cross fork, so release the ones setup used
+close_thread_db()
+close_pool()
+
+app = create_app()
+
+_warmed_up_pid = None
+
+@app.before_request
+def _warm_up_worker():
+    """Start this worker's signature recovery processes on its first request."""
+    global _warmed_up_pid
+    if _warmed_up_pid != os.getpid():
+        _warmed_up_pid = os.getpid()
+        warm_up_signature_verification()